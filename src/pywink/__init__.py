@@ -6,7 +6,7 @@ from pywink.api import set_bearer_token, refresh_access_token, \
     set_wink_credentials, set_user_agent, wink_api_fetch, get_devices, \
     get_subscription_details, get_user, get_authorization_url, \
     request_token, legacy_set_wink_credentials, get_current_oauth_credentials, \
-    disable_local_control, post_session
+    disable_local_control, set_up_local_control, post_session
 
 from pywink.api import get_light_bulbs, get_garage_doors, get_locks, \
     get_powerstrips, get_shades, get_sirens, \
@@ -19,3 +19,35 @@ from pywink.api import get_all_devices, get_eggtrays, get_sensors, \
     get_keys, get_piggy_banks, get_smoke_and_co_detectors, \
     get_hubs, get_door_bells, get_remotes, get_sprinklers, get_buttons, \
     get_gangs, get_cameras
+
+from pywink.instrumentation import add_request_hook, remove_request_hook, \
+    get_stats, reset_stats
+
+from pywink.api import enable_optimistic_state, disable_optimistic_state, \
+    enable_noop_suppression, disable_noop_suppression, \
+    set_coalescing_window, enable_rate_limiting, disable_rate_limiting, \
+    set_timeouts, enable_hedged_reads, disable_hedged_reads, \
+    enable_route_selection, disable_route_selection, set_route_override, \
+    enable_conditional_requests, disable_conditional_requests, get_cache_stats
+
+from pywink.optimistic import wait_for_confirmations
+
+from pywink.executor import CommandExecutor, LaneExecutor
+
+from pywink.reconciler import Reconciler
+
+from pywink.scheduler import PollingScheduler
+
+from pywink.history import History
+
+from pywink.snapshot import FleetSnapshot, snapshot as fleet_snapshot
+
+from pywink.journal import Journal, JournalReader
+
+from pywink.query import DeviceIndex
+
+from pywink.api import WinkAccount, use_account
+
+from pywink.fleet import FleetManager
+
+from pywink.ratelimit import RateLimiter
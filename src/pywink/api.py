@@ -1,4 +1,7 @@
+import contextlib
+import functools
 import json
+import threading
 import time
 import logging
 import urllib.parse
@@ -6,6 +9,9 @@ import random
 
 import requests
 
+from . import conditional, events, executor, hedging, instrumentation, optimistic, ratelimit, routing, streaming, \
+    timeouts
+from .reconciler import mismatched_fields
 from .devices import types as device_types
 from .devices.factory import build_device, get_object_type
 
@@ -28,15 +34,265 @@ LOCAL_API_HEADERS = {}
 HUBS = {}
 SUPPORTS_LOCAL_CONTROL = ["wink_hub", "wink_hub2"]
 ALLOW_LOCAL_CONTROL = True
+OPTIMISTIC_STATE = False
+# Coalescing windows in seconds keyed by (object_type, object_id), object_type or None for all devices.
+COALESCING_WINDOWS = {}
+# Skip writes that match a reading no older than this many seconds, None to always write.
+NOOP_SUPPRESSION_MAX_AGE = None
+# Limits cloud requests per endpoint class, see enable_rate_limiting.
+RATE_LIMITER = None
+# Validators and bodies of GET responses, see enable_conditional_requests.
+RESPONSE_CACHE = None
+# Times a request answered with 429 is sent again before the 429 is returned.
+MAX_RATE_LIMITED_RETRIES = 5
+# Percentile of a hub's recent read latency after which a local read is
+# also sent to the cloud, None to wait for the hub, see enable_hedged_reads.
+HEDGE_PERCENTILE = None
+# The hedge delay while a hub has too few reads to take a percentile from.
+HEDGE_INITIAL_DELAY = 0.5
+# Recent latencies of the requests to each hub, keyed by hub_id.
+HUB_LATENCY = hedging.LatencyTracker()
+# Picks the hub or the cloud per request by latency, see enable_route_selection.
+ROUTE_SELECTOR = None
+# Forced routes keyed by (hub_id, object_type), hub_id or object_type.
+ROUTE_OVERRIDES = {}
+# Seconds to wait for a response from the cloud and from a hub.
+CLOUD_TIMEOUT = 10
+LOCAL_TIMEOUT = 3
+# Seconds allowed for a whole call, including fallbacks and retries.
+DEADLINE = 30
+# Cloud reads that fail or get one of RETRY_STATUSES are sent again up to
+# READ_RETRIES times, after a random wait of up to RETRY_BACKOFF * 2 ** attempt.
+READ_RETRIES = 2
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (500, 502, 503, 504)
+# Object types the hub's local API can serve, mapped to the desired_state
+# fields it accepts. None means every field can be set locally.
+LOCAL_CONTROL_SUPPORT = {
+    device_types.LIGHT_BULB: None,
+    device_types.BINARY_SWITCH: None,
+    device_types.LOCK: ["locked"],
+    device_types.FAN: None,
+    device_types.SHADE: None,
+    device_types.SIREN: None,
+    device_types.THERMOSTAT: None,
+    device_types.GARAGE_DOOR: None,
+    device_types.SENSOR_POD: None,
+    device_types.WATER_HEATER: None
+}
 
 _LOGGER = logging.getLogger(__name__)
 
+_CURRENT = threading.local()
+
+
+class WinkAccount:
+    """
+    The credentials, inventory cache and hubs of one Wink account.
+
+    The api functions use the module globals unless an account is made
+    current with use_account(). Devices keep the account they were loaded
+    for, so their requests are made for it from any thread.
+
+    Args:
+        client_id, client_secret, access_token, refresh_token (String, optional):
+            The account's OAuth credentials.
+        name (String, optional): Identifies the account, defaults to client_id.
+        base_url (String, optional): Overrides WinkApiInterface.BASE_URL.
+        local_base_url (String, optional): Overrides WinkApiInterface.LOCAL_BASE_URL.
+        session (requests.Session, optional): Sends the account's requests,
+            share one between accounts to share its connection pool.
+        budget (RateBudget, optional): Acquired before every request of the account.
+        rate_limiter (RateLimiter, optional): Limits the account's cloud
+            requests per endpoint class.
+        response_cache (ResponseCache, optional): Makes the account's
+            inventory and object reads conditional.
+        allow_local_control (Bool, optional): Send the account's requests to
+            its hubs where possible. Turned off for the account alone when
+            it has no credentials for a local control token.
+    """
+
+    # pylint: disable=too-many-arguments, too-many-instance-attributes
+    def __init__(self, client_id=None, client_secret=None, access_token=None, refresh_token=None,
+                 name=None, base_url=None, local_base_url=None, session=None, budget=None,
+                 rate_limiter=None, response_cache=None, allow_local_control=True):
+        self.name = name or client_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.refresh_token = refresh_token
+        self.api_headers = {"User-Agent": USER_AGENT}
+        self.local_api_headers = {}
+        self.all_devices = None
+        self.last_update = None
+        self.hubs = {}
+        self.base_url = base_url
+        self.local_base_url = local_base_url
+        self.session = session
+        self.budget = budget
+        self.rate_limiter = rate_limiter
+        self.response_cache = response_cache
+        self.allow_local_control = allow_local_control
+        if access_token is not None:
+            with use_account(self):
+                set_bearer_token(access_token)
+
+    def __repr__(self):
+        return "<WinkAccount {}>".format(self.name)
+
+
+def _module_global(name):
+    def fget(_self):
+        return globals()[name]
+
+    def fset(_self, value):
+        globals()[name] = value
+    return property(fget, fset)
+
+
+class _GlobalAccount:
+    """
+    The account used outside use_account(), reads and writes the module globals.
+    """
+    name = None
+    base_url = None
+    local_base_url = None
+    session = None
+    budget = None
+    client_id = _module_global("CLIENT_ID")
+    client_secret = _module_global("CLIENT_SECRET")
+    refresh_token = _module_global("REFRESH_TOKEN")
+    api_headers = _module_global("API_HEADERS")
+    local_api_headers = _module_global("LOCAL_API_HEADERS")
+    all_devices = _module_global("ALL_DEVICES")
+    last_update = _module_global("LAST_UPDATE")
+    hubs = _module_global("HUBS")
+    rate_limiter = _module_global("RATE_LIMITER")
+    response_cache = _module_global("RESPONSE_CACHE")
+    allow_local_control = _module_global("ALLOW_LOCAL_CONTROL")
+
+
+_GLOBAL_ACCOUNT = _GlobalAccount()
+
+
+def current_account():
+    """
+    Returns:
+        account (WinkAccount): The account requests in this thread are made
+            for, None when the module globals are used.
+    """
+    return getattr(_CURRENT, "account", None)
+
+
+@contextlib.contextmanager
+def use_account(account):
+    """
+    Make the api functions called in this block act on account.
+
+    Args:
+        account (WinkAccount): The account, None for the module globals.
+    """
+    previous = current_account()
+    _CURRENT.account = account
+    try:
+        yield account
+    finally:
+        _CURRENT.account = previous
+
+
+def _account():
+    account = current_account()
+    return _GLOBAL_ACCOUNT if account is None else account
+
+
+def _device_account(device):
+    # Devices of a WinkAccount carry it in their api interface, also when
+    # they are looked at outside use_account().
+    account = getattr(getattr(device, "api_interface", None), "account", None)
+    return account if isinstance(account, WinkAccount) else _account()
+
+
+def _base_url():
+    return _account().base_url or WinkApiInterface.BASE_URL
+
+
+def _bounded(func):
+    """
+    Give a call DEADLINE seconds, or less when it is made within an
+    earlier deadline.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timeouts.deadline(DEADLINE):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _in_account(method):
+    """
+    Run a WinkApiInterface method for the account of the interface.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.account is None:
+            return method(self, *args, **kwargs)
+        with use_account(self.account):
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class WinkApiInterface:
 
     BASE_URL = "https://api.wink.com"
+    LOCAL_BASE_URL = "https://{}:8888"
     api_headers = API_HEADERS
 
+    def __init__(self, account=None):
+        """
+        Args:
+            account (WinkAccount, optional): The account requests are made
+                for, None for the module globals.
+        """
+        self.account = account
+        if account is not None:
+            self.BASE_URL = account.base_url or self.BASE_URL
+            self.LOCAL_BASE_URL = account.local_base_url or self.LOCAL_BASE_URL
+
+    @staticmethod
+    def local_control_hub(device, state=None, select_route=True):
+        """
+        Decide if a request can be served by the device's hub.
+
+        Args:
+            device (WinkDevice): The device the request is for.
+            state (Dict, optional): The state being requested, None for reads.
+            select_route (Bool, optional): False leaves the latency based
+                route selection out, it decides per request.
+        Returns:
+            hub (Dict): The local control details of the hub, or None if the
+                request must be sent to the online API.
+        """
+        account = _device_account(device)
+        if not account.allow_local_control or device.local_id() is None:
+            return None
+        object_type = device.object_type()
+        if object_type not in LOCAL_CONTROL_SUPPORT:
+            return None
+        if state is not None:
+            desired_state = state.get("desired_state")
+            if desired_state is None:
+                return None
+            supported_fields = LOCAL_CONTROL_SUPPORT[object_type]
+            if supported_fields is not None and not set(desired_state).issubset(supported_fields):
+                return None
+        hub = account.hubs.get(device.hub_id())
+        if hub is None or hub["token"] is None:
+            return None
+        if choose_route(device, select_route) == instrumentation.ROUTE_CLOUD:
+            return None
+        return hub
+
+    @_in_account
+    @_bounded
     def set_device_state(self, device, state, id_override=None, type_override=None):
         """
         Set device state via online API.
@@ -61,22 +317,23 @@ class WinkApiInterface:
         if state is None or object_type == "group":
             url_string += "/activate"
             if state is None:
-                arequest = requests.post(url_string,
-                                         headers=API_HEADERS)
+                arequest = _request("post", url_string, "activate", object_type,
+                                    headers=_account().api_headers)
             else:
-                arequest = requests.post(url_string,
-                                         data=json.dumps(state),
-                                         headers=API_HEADERS)
-        else:
-            arequest = requests.put(url_string,
+                arequest = _request("post", url_string, "activate", object_type,
                                     data=json.dumps(state),
-                                    headers=API_HEADERS)
+                                    headers=_account().api_headers)
+        else:
+            arequest = _request("put", url_string, "object", object_type,
+                                data=json.dumps(state),
+                                headers=_account().api_headers)
         if arequest.status_code == 401:
             new_token = refresh_access_token()
             if new_token:
-                arequest = requests.put(url_string,
+                with instrumentation.fallback(instrumentation.FALLBACK_TOKEN_REFRESH):
+                    arequest = _request("put", url_string, "object", object_type,
                                         data=json.dumps(state),
-                                        headers=API_HEADERS)
+                                        headers=_account().api_headers)
             else:
                 raise WinkAPIException("Failed to refresh access token.")
         response_json = arequest.json()
@@ -84,6 +341,8 @@ class WinkApiInterface:
         return response_json
 
     # pylint: disable=bare-except
+    @_in_account
+    @_bounded
     def local_set_state(self, device, state, id_override=None, type_override=None):
         """
         Set device state via local API, and fall back to online API.
@@ -97,39 +356,53 @@ class WinkApiInterface:
             type_override (String, optional): Used to override the device type
                 when a device inherits from a device other than WinkDevice.
         Returns:
-            response_json (Dict): The API's response in dictionary format
+            response_json (Dict): The API's response in dictionary format, or
+                the optimistic state when optimistic state is enabled.
         """
-        if ALLOW_LOCAL_CONTROL:
-            if device.local_id() is not None:
-                hub = HUBS.get(device.hub_id())
-                if hub is None or hub["token"] is None:
-                    return self.set_device_state(device, state, id_override, type_override)
-            else:
-                return self.set_device_state(device, state, id_override, type_override)
-            _LOGGER.info("Setting local state")
-            local_id = id_override or device.local_id().split(".")[0]
-            object_type = type_override or device.object_type()
-            LOCAL_API_HEADERS['Authorization'] = "Bearer " + hub["token"]
-            url_string = "https://{}:8888/{}s/{}".format(hub["ip"],
-                                                         object_type,
-                                                         local_id)
-            try:
-                arequest = requests.put(url_string,
-                                        data=json.dumps(state),
-                                        headers=LOCAL_API_HEADERS,
-                                        verify=False, timeout=3)
-            except requests.exceptions.RequestException:
-                _LOGGER.error("Error sending local control request. Sending request online")
-                return self.set_device_state(device, state, id_override, type_override)
-            response_json = arequest.json()
-            _LOGGER.debug('%s', response_json)
-            temp_state = device.json_state
-            for key, value in response_json["data"]["last_reading"].items():
-                temp_state["last_reading"][key] = value
-            return temp_state
-        else:
+        if id_override is None and type_override is None and list(state) == ["desired_state"] \
+                and device.object_type() != device_types.GROUP:
+            if is_noop_write(device, state["desired_state"]):
+                _LOGGER.debug("Skipping write to %s, it already has %s", device.name(), state["desired_state"])
+                return {"data": device.json_state}
+            events.fire(events.STATE_REQUESTED, device, state["desired_state"])
+            if OPTIMISTIC_STATE:
+                return optimistic.apply(device, state, self._submit_desired_state)
+            window = coalescing_window(device)
+            if window:
+                return executor.coalesce(device, state, self._send_state, window, blocking=True).result()
+        return self._send_state(device, state, id_override, type_override)
+
+    def _submit_desired_state(self, device, state):
+        window = coalescing_window(device)
+        if window:
+            return executor.coalesce(device, state, self._send_state, window)
+        return executor.submit(device, self._send_state, device, state)
+
+    @_in_account
+    @_bounded
+    def _send_state(self, device, state, id_override=None, type_override=None):
+        hub = self.local_control_hub(device, state)
+        if hub is None:
             return self.set_device_state(device, state, id_override, type_override)
+        _LOGGER.info("Setting local state")
+        local_id = id_override or device.local_id()
+        object_type = type_override or device.object_type()
+        url_string = "{}/{}s/{}".format(self.LOCAL_BASE_URL.format(hub["ip"]),
+                                        object_type,
+                                        local_id)
+        try:
+            arequest = _local_request(device, hub, "put", url_string, object_type,
+                                      data=json.dumps(state))
+        except requests.exceptions.RequestException:
+            _LOGGER.error("Error sending local control request. Sending request online")
+            with instrumentation.fallback(instrumentation.FALLBACK_LOCAL_ERROR):
+                return self.set_device_state(device, state, id_override, type_override)
+        response_json = arequest.json()
+        _LOGGER.debug('%s', response_json)
+        return merge_local_state(device, response_json)
 
+    @_in_account
+    @_bounded
     def get_device_state(self, device, id_override=None, type_override=None):
         """
         Get device state via online API.
@@ -149,12 +422,15 @@ class WinkApiInterface:
         object_type = type_override or device.object_type()
         url_string = "{}/{}s/{}".format(self.BASE_URL,
                                         object_type, object_id)
-        arequest = requests.get(url_string, headers=API_HEADERS)
-        response_json = arequest.json()
+        arequest, response_json = _cached_get(url_string, "object", object_type, headers=_account().api_headers)
+        if response_json is None:
+            response_json = arequest.json()
         _LOGGER.debug('%s', response_json)
         return response_json
 
     # pylint: disable=bare-except, too-many-locals
+    @_in_account
+    @_bounded
     def local_get_state(self, device, id_override=None, type_override=None):
         """
         Get device state via local API, and fall back to online API.
@@ -169,39 +445,53 @@ class WinkApiInterface:
         Returns:
             response_json (Dict): The API's response in dictionary format
         """
-        if ALLOW_LOCAL_CONTROL:
-            if device.local_id() is not None:
-                hub = HUBS.get(device.hub_id())
-                if hub is not None and hub["token"] is not None:
-                    ip = hub["ip"]
-                    access_token = hub["token"]
-                else:
-                    return self.get_device_state(device, id_override, type_override)
-            else:
+        hub = self.local_control_hub(device)
+        if hub is None:
+            return self.get_device_state(device, id_override, type_override)
+        if HEDGE_PERCENTILE is not None:
+            return self._hedged_get_state(device, hub, id_override, type_override)
+        _LOGGER.info("Getting local state")
+        try:
+            response_json = self._local_get(device, hub, id_override, type_override)
+        except requests.exceptions.RequestException:
+            _LOGGER.error("Error sending local control request. Sending request online")
+            with instrumentation.fallback(instrumentation.FALLBACK_LOCAL_ERROR):
                 return self.get_device_state(device, id_override, type_override)
-            _LOGGER.info("Getting local state")
-            local_id = id_override or device.local_id()
-            object_type = type_override or device.object_type()
-            LOCAL_API_HEADERS['Authorization'] = "Bearer " + access_token
-            url_string = "https://{}:8888/{}s/{}".format(ip,
-                                                         object_type,
-                                                         local_id)
-            try:
-                arequest = requests.get(url_string,
-                                        headers=LOCAL_API_HEADERS,
-                                        verify=False, timeout=3)
-            except requests.exceptions.RequestException:
-                _LOGGER.error("Error sending local control request. Sending request online")
+        return merge_local_state(device, response_json)
+
+    def _local_get(self, device, hub, id_override=None, type_override=None):
+        local_id = id_override or device.local_id()
+        object_type = type_override or device.object_type()
+        url_string = "{}/{}s/{}".format(self.LOCAL_BASE_URL.format(hub["ip"]),
+                                        object_type,
+                                        local_id)
+        arequest = _local_request(device, hub, "get", url_string, object_type)
+        response_json = arequest.json()
+        _LOGGER.debug('%s', response_json)
+        return response_json
+
+    def _hedged_get_state(self, device, hub, id_override=None, type_override=None):
+        """
+        Read from the hub, and from the cloud as well when the hub is slower
+        than HEDGE_PERCENTILE of its recent reads. The first answer wins.
+        """
+        delay = HUB_LATENCY.percentile(device.hub_id(), HEDGE_PERCENTILE)
+        if delay is None:
+            delay = HEDGE_INITIAL_DELAY
+
+        def cloud_get():
+            with instrumentation.fallback(instrumentation.FALLBACK_HEDGE):
                 return self.get_device_state(device, id_override, type_override)
-            response_json = arequest.json()
-            _LOGGER.debug('%s', response_json)
-            temp_state = device.json_state
-            for key, value in response_json["data"]["last_reading"].items():
-                temp_state["last_reading"][key] = value
-            return temp_state
-        else:
-            return self.get_device_state(device, id_override, type_override)
 
+        response_json, winner = hedging.hedge(
+            _carry_context(self._local_get, device, hub, id_override, type_override),
+            _carry_context(cloud_get), delay, valid=_has_reading)
+        if winner == hedging.PRIMARY:
+            return merge_local_state(device, response_json)
+        return response_json
+
+    @_in_account
+    @_bounded
     def update_firmware(self, device, id_override=None, type_override=None):
         """
         Make a call to the update_firmware endpoint. As far as I know this
@@ -223,13 +513,15 @@ class WinkApiInterface:
                                                         object_type,
                                                         object_id)
         try:
-            arequest = requests.post(url_string,
-                                     headers=API_HEADERS)
+            arequest = _request("post", url_string, "update_firmware", object_type,
+                                headers=_account().api_headers)
             response_json = arequest.json()
             return response_json
         except requests.exceptions.RequestException:
             return None
 
+    @_in_account
+    @_bounded
     def remove_device(self, device, id_override=None, type_override=None):
         """
         Remove a device.
@@ -251,8 +543,8 @@ class WinkApiInterface:
                                         object_id)
 
         try:
-            arequest = requests.delete(url_string,
-                                       headers=API_HEADERS)
+            arequest = _request("delete", url_string, "object", object_type,
+                                headers=_account().api_headers)
             if arequest.status_code == 204:
                 return True
             _LOGGER.error("Failed to remove device. Status code: %s", arequest.status_code)
@@ -261,6 +553,8 @@ class WinkApiInterface:
             _LOGGER.error("Failed to remove device.")
             return False
 
+    @_in_account
+    @_bounded
     def create_lock_key(self, device, new_device_json, id_override=None, type_override=None):
         """
         Create a new lock key code.
@@ -282,14 +576,16 @@ class WinkApiInterface:
                                              object_type,
                                              object_id)
         try:
-            arequest = requests.post(url_string,
-                                     data=json.dumps(new_device_json),
-                                     headers=API_HEADERS)
+            arequest = _request("post", url_string, "keys", object_type,
+                                data=json.dumps(new_device_json),
+                                headers=_account().api_headers)
             response_json = arequest.json()
             return response_json
         except requests.exceptions.RequestException:
             return None
 
+    @_in_account
+    @_bounded
     def create_cloud_clock_alarm(self, device, new_device_json, id_override=None, type_override=None):
         """
         Create a new alarm on the provided Nimbus.
@@ -311,14 +607,16 @@ class WinkApiInterface:
                                                object_type,
                                                object_id)
         try:
-            arequest = requests.post(url_string,
-                                     data=json.dumps(new_device_json),
-                                     headers=API_HEADERS)
+            arequest = _request("post", url_string, "alarms", object_type,
+                                data=json.dumps(new_device_json),
+                                headers=_account().api_headers)
             response_json = arequest.json()
             return response_json
         except requests.exceptions.RequestException:
             return None
 
+    @_in_account
+    @_bounded
     def piggy_bank_deposit(self, device, _json):
         """
         Args:
@@ -331,39 +629,477 @@ class WinkApiInterface:
                                                  device.object_type(),
                                                  device.object_id())
         try:
-            arequest = requests.post(url_string,
-                                     data=json.dumps(_json),
-                                     headers=API_HEADERS)
+            arequest = _request("post", url_string, "deposits", device.object_type(),
+                                data=json.dumps(_json),
+                                headers=_account().api_headers)
             response_json = arequest.json()
             return response_json
         except requests.exceptions.RequestException:
             return None
 
 
+# pylint: disable=too-many-arguments
+def _request(method, url, end_point, object_type=None, route=instrumentation.ROUTE_CLOUD, **kwargs):
+    """
+    Send a request and report it to the instrumentation hooks.
+
+    Args:
+        method (String): The HTTP method.
+        url (String): The URL to request.
+        end_point (String): The API end point, used to group statistics.
+        object_type (String, optional): The type of the object requested.
+        route (String, optional): instrumentation.ROUTE_CLOUD or ROUTE_LOCAL.
+        kwargs: Passed on to requests.
+    Returns:
+        response (requests.Response): The response, 429 responses are only
+            returned after MAX_RATE_LIMITED_RETRIES attempts.
+    Raises:
+        requests.exceptions.RequestException: When the request failed,
+            timeouts.DeadlineExceeded when the current deadline passed.
+    """
+    account = _account()
+    limiter = account.rate_limiter if route == instrumentation.ROUTE_CLOUD else None
+    _endpoint_class = ratelimit.endpoint_class(method, end_point)
+    # Reads can be sent again safely, local reads fall back to the cloud instead.
+    retries = READ_RETRIES if method.upper() == "GET" and route == instrumentation.ROUTE_CLOUD else 0
+    attempt = 0
+    rate_limited = 0
+    reason = None
+    while True:
+        error = None
+        with instrumentation.fallback(reason or instrumentation.current_fallback_reason()):
+            try:
+                response = _send(account, limiter, _endpoint_class, method, url, end_point, object_type, route,
+                                 kwargs)
+            except timeouts.DeadlineExceeded:
+                raise
+            except requests.exceptions.RequestException as exception:
+                if attempt >= retries:
+                    raise
+                response, error = None, exception
+        if response is not None and response.status_code == 429:
+            # Throttled requests wait as long as the server asks and are sent again.
+            delay = ratelimit.retry_after(response)
+            if rate_limited >= MAX_RATE_LIMITED_RETRIES or not timeouts.allows(delay):
+                return response
+            _LOGGER.warning("Rate limited on %s, sending again in %.1f seconds", end_point, delay)
+            response.close()
+            if limiter is None or not limiter.throttle(_endpoint_class, delay):
+                time.sleep(delay)
+            rate_limited += 1
+            reason = instrumentation.FALLBACK_RATE_LIMITED
+            continue
+        if response is not None and (response.status_code not in RETRY_STATUSES or attempt >= retries):
+            return response
+        delay = random.uniform(0, RETRY_BACKOFF * 2 ** attempt)
+        if not timeouts.allows(delay):
+            if error is not None:
+                raise error
+            return response
+        _LOGGER.warning("Request to %s failed, sending again in %.2f seconds", end_point, delay)
+        if response is not None:
+            response.close()
+        time.sleep(delay)
+        attempt += 1
+        reason = instrumentation.FALLBACK_RETRY
+
+
+# pylint: disable=too-many-arguments
+def _send(account, limiter, _endpoint_class, method, url, end_point, object_type, route, kwargs):
+    level = ratelimit.current_priority(_endpoint_class)
+    if limiter is not None and limiter.acquire(_endpoint_class, level, timeouts.remaining()) is None:
+        raise timeouts.DeadlineExceeded("Deadline exceeded waiting for the rate limiter")
+    if account.budget is not None and account.budget.acquire(level, timeouts.remaining()) is None:
+        raise timeouts.DeadlineExceeded("Deadline exceeded waiting for the request budget")
+    kwargs = dict(kwargs)
+    default_timeout = LOCAL_TIMEOUT if route == instrumentation.ROUTE_LOCAL else CLOUD_TIMEOUT
+    kwargs["timeout"] = timeouts.timeout(kwargs.get("timeout", default_timeout))
+    start = time.time()
+    status = None
+    size = None
+    try:
+        response = (account.session or requests).request(method, url, **kwargs)
+        status = response.status_code
+        if kwargs.get("stream"):
+            # Reading the body here would defeat streaming, count what the server announced.
+            size = response.headers.get("Content-Length")
+            size = int(size) if size is not None else None
+        else:
+            size = len(response.content)
+        return response
+    finally:
+        duration = time.time() - start
+        if route == instrumentation.ROUTE_CLOUD and end_point == "object":
+            # Object requests are the ones a hub could have served instead.
+            _record_route(instrumentation.ROUTE_CLOUD, duration, status is not None and status < 500)
+        instrumentation.record_request(instrumentation.RequestRecord(
+            end_point, object_type, route, method.upper(), status, size, duration,
+            instrumentation.current_fallback_reason()))
+
+
+# pylint: disable=too-many-arguments
+def _cached_get(url, end_point, object_type=None, headers=None, stream=False, on_item=None):
+    """
+    GET url, conditionally when the current account has a response cache.
+
+    Args:
+        stream (Bool, optional): Parse the body while it is downloaded,
+            see streaming.parse.
+        on_item (Callable, optional): Called with every item of the body's
+            "data" array, also when the body came from the cache.
+    Returns:
+        (response, response_json): response_json is the parsed body of a 200
+            or the cached body of a 304, None for other statuses.
+    """
+    cache = _account().response_cache
+    request_headers = dict(headers or {})
+    entry = None
+    if cache is not None:
+        entry = cache.get(url)
+        request_headers.update(cache.request_headers(url))
+    response = _request("get", url, end_point, object_type, headers=request_headers, stream=stream)
+    if response.status_code == 304 and entry is not None:
+        response.close()
+        cache.record(end_point, True, entry.size)
+        response_json = entry.body
+        _feed_items(response_json, on_item)
+        return response, response_json
+    if cache is not None:
+        cache.record(end_point, False)
+    if response.status_code != 200:
+        response.close()
+        return response, None
+    if stream:
+        with contextlib.closing(response):
+            response_json, size = streaming.parse(response.iter_content(streaming.CHUNK_SIZE), on_item)
+    else:
+        response_json, size = response.json(), len(response.content)
+        _feed_items(response_json, on_item)
+    if cache is not None:
+        cache.store(url, response.headers, response_json, size)
+    return response, response_json
+
+
+def _feed_items(response_json, on_item):
+    if on_item is not None:
+        for item in response_json.get("data") or ():
+            on_item(item)
+
+
+def _local_request(device, hub, method, url, object_type, **kwargs):
+    """
+    Send a request to the device's hub and track the hub's latency.
+    """
+    # A copy per request, requests to different hubs can run in parallel.
+    headers = dict(_account().local_api_headers)
+    headers["Authorization"] = "Bearer " + hub["token"]
+    start = time.time()
+    try:
+        response = _request(method, url, "object", object_type, route=instrumentation.ROUTE_LOCAL,
+                            headers=headers, verify=False, **kwargs)
+    except requests.exceptions.RequestException:
+        _record_route(device.hub_id(), time.time() - start, False)
+        raise
+    duration = time.time() - start
+    HUB_LATENCY.record(device.hub_id(), duration)
+    _record_route(device.hub_id(), duration, response.status_code < 500)
+    return response
+
+
+def _record_route(key, seconds, ok):
+    selector = ROUTE_SELECTOR
+    if selector is not None:
+        selector.record(key, seconds, ok)
+
+
+def _carry_context(func, *args):
+    """
+    Bind func to the account, deadline and fallback reason of the calling
+    thread, so it can run on another one.
+    """
+    account = current_account()
+    remaining = timeouts.remaining()
+    reason = instrumentation.current_fallback_reason()
+
+    def run():
+        with use_account(account), timeouts.deadline(remaining), instrumentation.fallback(reason):
+            return func(*args)
+    return run
+
+
+def _has_reading(response_json):
+    data = response_json.get("data") if isinstance(response_json, dict) else None
+    return isinstance(data, dict) and "last_reading" in data
+
+
+def merge_local_state(device, response_json):
+    """
+    Merge the reading returned by a hub's local API into the device's state.
+
+    Args:
+        device (WinkDevice): The device the request was for.
+        response_json (Dict): The hub's response in dictionary format.
+    Returns:
+        response_json (Dict): The device's updated state, in the format
+            returned by the online API.
+    """
+    temp_state = device.json_state
+    temp_state["last_reading"].update(response_json["data"]["last_reading"])
+    device.json_state = temp_state
+    return {"data": temp_state}
+
+
 def disable_local_control():
-    global ALLOW_LOCAL_CONTROL
-    ALLOW_LOCAL_CONTROL = False
+    """
+    Send every request of the current account to the online API.
+    """
+    _account().allow_local_control = False
+
+
+def set_coalescing_window(seconds, object_type=None, object_id=None):
+    """
+    Send the first desired_state write to a device at once and merge the
+    writes that arrive while it is in flight, or within seconds of them,
+    into one trailing request, the last value of each field wins. Writes
+    only merge when they overlap, i.e. come from several threads or with
+    optimistic state enabled. Blocking setters called one after the other
+    from one thread are each sent without delay.
+
+    Args:
+        seconds (Float): The window, None or 0 to send every write.
+        object_type (String, optional): Only apply to this device type.
+        object_id (String, optional): Only apply to this device, requires
+            object_type.
+    """
+    key = (object_type, object_id) if object_id is not None else object_type
+    if seconds:
+        COALESCING_WINDOWS[key] = seconds
+    else:
+        COALESCING_WINDOWS.pop(key, None)
+
+
+def coalescing_window(device):
+    object_type = device.object_type()
+    for key in ((object_type, device.object_id()), object_type, None):
+        if key in COALESCING_WINDOWS:
+            return COALESCING_WINDOWS[key]
+    return None
+
+
+def enable_noop_suppression(max_age=30):
+    """
+    Skip desired_state writes that every requested field already matches.
+
+    Args:
+        max_age (Float, optional): Only trust readings younger than this
+            many seconds, older state is always written.
+    """
+    global NOOP_SUPPRESSION_MAX_AGE
+    NOOP_SUPPRESSION_MAX_AGE = max_age
+
+
+def disable_noop_suppression():
+    global NOOP_SUPPRESSION_MAX_AGE
+    NOOP_SUPPRESSION_MAX_AGE = None
+
+
+def is_noop_write(device, desired_state):
+    """
+    Args:
+        device (WinkDevice): The device the change is being requested for.
+        desired_state (Dict): The requested desired_state.
+    Returns:
+        noop (Bool): True when no-op suppression is enabled, the state is
+            fresh and the write would not change anything.
+    """
+    if NOOP_SUPPRESSION_MAX_AGE is None or not desired_state:
+        return False
+    if device.state_age() > NOOP_SUPPRESSION_MAX_AGE:
+        return False
+    if mismatched_fields(device, desired_state):
+        return False
+    # A pending change towards another value still needs to be overridden.
+    pending = device.json_state.get("desired_state") or {}
+    return not mismatched_fields(device, dict((field, pending.get(field)) for field in desired_state))
+
+
+# pylint: disable=too-many-arguments
+def set_timeouts(cloud_timeout=None, local_timeout=None, deadline=None, read_retries=None, retry_backoff=None):
+    """
+    Change the timeouts and retries of requests, arguments left at None
+    keep their current value.
+
+    Args:
+        cloud_timeout (Float, optional): Seconds to wait for the cloud.
+        local_timeout (Float, optional): Seconds to wait for a hub.
+        deadline (Float, optional): Seconds allowed for a whole call.
+        read_retries (Int, optional): Times a failed cloud read is sent again.
+        retry_backoff (Float, optional): Base of the jittered backoff between
+            read retries, doubled for every retry.
+    """
+    global CLOUD_TIMEOUT, LOCAL_TIMEOUT, DEADLINE, READ_RETRIES, RETRY_BACKOFF
+    if cloud_timeout is not None:
+        CLOUD_TIMEOUT = cloud_timeout
+    if local_timeout is not None:
+        LOCAL_TIMEOUT = local_timeout
+    if deadline is not None:
+        DEADLINE = deadline
+    if read_retries is not None:
+        READ_RETRIES = read_retries
+    if retry_backoff is not None:
+        RETRY_BACKOFF = retry_backoff
+
+
+def enable_route_selection(**kwargs):
+    """
+    Send requests a hub could serve over the hub or the cloud, whichever
+    has been faster and healthy recently.
+
+    Args:
+        kwargs: Passed on to routing.RouteSelector.
+    """
+    global ROUTE_SELECTOR
+    ROUTE_SELECTOR = routing.RouteSelector(**kwargs)
+
+
+def disable_route_selection():
+    global ROUTE_SELECTOR
+    ROUTE_SELECTOR = None
+
+
+def set_route_override(route, hub_id=None, object_type=None):
+    """
+    Always send the requests of a hub, a device type or a device type on one
+    hub over route, overrides route selection.
+
+    Args:
+        route (String): instrumentation.ROUTE_LOCAL or ROUTE_CLOUD, None to
+            remove the override.
+        hub_id (String, optional): The hub.
+        object_type (String, optional): The device type.
+    """
+    if hub_id is not None and object_type is not None:
+        key = (hub_id, object_type)
+    else:
+        key = hub_id if hub_id is not None else object_type
+    if route is None:
+        ROUTE_OVERRIDES.pop(key, None)
+    else:
+        ROUTE_OVERRIDES[key] = route
+
+
+def choose_route(device, select_route=True):
+    """
+    Args:
+        select_route (Bool, optional): False only applies the overrides.
+    Returns:
+        route (String): instrumentation.ROUTE_LOCAL or ROUTE_CLOUD for a
+            request the device's hub could serve.
+    """
+    hub_id = device.hub_id()
+    for key in ((hub_id, device.object_type()), hub_id, device.object_type()):
+        if key in ROUTE_OVERRIDES:
+            return ROUTE_OVERRIDES[key]
+    selector = ROUTE_SELECTOR
+    if selector is not None and select_route:
+        return selector.choose(hub_id)
+    return instrumentation.ROUTE_LOCAL
+
+
+def enable_hedged_reads(percentile=95, initial_delay=0.5):
+    """
+    Send local reads to the cloud as well when the hub is slow to answer,
+    the first answer is used.
+
+    Args:
+        percentile (Float, optional): Hedge when the hub takes longer than
+            this percentile of its recent reads.
+        initial_delay (Float, optional): Hedge delay until a hub has
+            answered enough reads.
+    """
+    global HEDGE_PERCENTILE, HEDGE_INITIAL_DELAY
+    HEDGE_PERCENTILE = percentile
+    HEDGE_INITIAL_DELAY = initial_delay
+
+
+def disable_hedged_reads():
+    global HEDGE_PERCENTILE
+    HEDGE_PERCENTILE = None
+
+
+def enable_conditional_requests(max_entries=1024):
+    """
+    Send inventory and object reads of the current account with the ETag
+    and Last-Modified of the previous response, a 304 answer reuses its
+    body. Every answer is a new copy, devices built on it don't change
+    the cached body.
+
+    Args:
+        max_entries (Int, optional): URLs to keep responses for.
+    """
+    _account().response_cache = conditional.ResponseCache(max_entries)
+
+
+def disable_conditional_requests():
+    _account().response_cache = None
+
+
+def get_cache_stats():
+    """
+    Returns:
+        stats (Dict): See conditional.ResponseCache.get_stats, None when
+            conditional requests are disabled.
+    """
+    cache = _account().response_cache
+    return None if cache is None else cache.get_stats()
+
+
+def enable_rate_limiting(limits=None):
+    """
+    Limit the cloud requests of the current account per endpoint class.
+    Requests over the limit wait for their turn by priority, see ratelimit.
+
+    Args:
+        limits (Dict, optional): (requests per second, burst) keyed by
+            endpoint class, merged over ratelimit.DEFAULT_LIMITS.
+    """
+    _account().rate_limiter = ratelimit.RateLimiter(limits)
+
+
+def disable_rate_limiting():
+    _account().rate_limiter = None
+
+
+def enable_optimistic_state():
+    global OPTIMISTIC_STATE
+    OPTIMISTIC_STATE = True
+
+
+def disable_optimistic_state():
+    global OPTIMISTIC_STATE
+    OPTIMISTIC_STATE = False
 
 
 def set_user_agent(user_agent):
     _LOGGER.info("Setting user agent to %s", user_agent)
-    API_HEADERS["User-Agent"] = user_agent
+    _account().api_headers["User-Agent"] = user_agent
 
 
 def set_bearer_token(token):
-    global LOCAL_API_HEADERS
-
-    API_HEADERS["Content-Type"] = "application/json"
-    API_HEADERS["Authorization"] = "Bearer {}".format(token)
-    LOCAL_API_HEADERS = API_HEADERS
+    account = _account()
+    account.api_headers["Content-Type"] = "application/json"
+    account.api_headers["Authorization"] = "Bearer {}".format(token)
+    # Local requests replace the Authorization header with the hub's token,
+    # so they need their own copy of the headers.
+    account.local_api_headers = dict(account.api_headers)
 
 
+@_bounded
 def legacy_set_wink_credentials(email, password, client_id, client_secret):
     _LOGGER.debug("Email: %s Password: %s Client_id: %s Client_secret: %s", email, password, client_id, client_secret)
-    global CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN
-
-    CLIENT_ID = client_id
-    CLIENT_SECRET = client_secret
+    account = _account()
+    account.client_id = client_id
+    account.client_secret = client_secret
 
     data = {
         "client_id": client_id,
@@ -375,51 +1111,52 @@ def legacy_set_wink_credentials(email, password, client_id, client_secret):
     headers = {
         'Content-Type': 'application/json'
     }
-    response = requests.post('{}/oauth2/token'.format(WinkApiInterface.BASE_URL),
-                             data=json.dumps(data),
-                             headers=headers)
+    response = _request("post", '{}/oauth2/token'.format(_base_url()), "oauth2/token",
+                        data=json.dumps(data),
+                        headers=headers)
     response_json = response.json()
     access_token = response_json.get('access_token')
-    REFRESH_TOKEN = response_json.get('refresh_token')
+    account.refresh_token = response_json.get('refresh_token')
     set_bearer_token(access_token)
 
 
 def set_wink_credentials(client_id, client_secret, access_token, refresh_token):
     _LOGGER.debug("Client_id: %s Client_secret: %s Access_token: %s Refreash_token: %s",
                   client_id, client_secret, access_token, refresh_token)
-    global CLIENT_ID, CLIENT_SECRET, REFRESH_TOKEN
-
-    CLIENT_ID = client_id
-    CLIENT_SECRET = client_secret
-    REFRESH_TOKEN = refresh_token
+    account = _account()
+    account.client_id = client_id
+    account.client_secret = client_secret
+    account.refresh_token = refresh_token
     set_bearer_token(access_token)
 
 
 def get_current_oauth_credentials():
-    access_token = API_HEADERS.get("Authorization").split()[1]
-    return {"access_token": access_token, "refresh_token": REFRESH_TOKEN,
-            "client_id": CLIENT_ID, "client_secret": CLIENT_SECRET}
+    account = _account()
+    access_token = account.api_headers.get("Authorization").split()[1]
+    return {"access_token": access_token, "refresh_token": account.refresh_token,
+            "client_id": account.client_id, "client_secret": account.client_secret}
 
 
+@_bounded
 def refresh_access_token():
-    global REFRESH_TOKEN
+    account = _account()
     _LOGGER.info("Attempting to refresh access token")
-    if CLIENT_ID and CLIENT_SECRET and REFRESH_TOKEN:
+    if account.client_id and account.client_secret and account.refresh_token:
         data = {
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
+            "client_id": account.client_id,
+            "client_secret": account.client_secret,
             "grant_type": "refresh_token",
-            "refresh_token": REFRESH_TOKEN
+            "refresh_token": account.refresh_token
         }
         headers = {
             'Content-Type': 'application/json'
         }
-        response = requests.post('{}/oauth2/token'.format(WinkApiInterface.BASE_URL),
-                                 data=json.dumps(data),
-                                 headers=headers)
+        response = _request("post", '{}/oauth2/token'.format(_base_url()), "oauth2/token",
+                            data=json.dumps(data),
+                            headers=headers)
         response_json = response.json()
         access_token = response_json.get('access_token')
-        REFRESH_TOKEN = response_json.get('refresh_token')
+        account.refresh_token = response_json.get('refresh_token')
         set_bearer_token(access_token)
         return access_token
     return None
@@ -427,13 +1164,12 @@ def refresh_access_token():
 
 def get_authorization_url(client_id, redirect_uri):
     _LOGGER.debug("Client_id: %s redirect_uri: %s", client_id, redirect_uri)
-    global CLIENT_ID
-
-    CLIENT_ID = client_id
+    _account().client_id = client_id
     encoded_uri = urllib.parse.quote(redirect_uri)
-    return OAUTH_AUTHORIZE.format(WinkApiInterface.BASE_URL, client_id, encoded_uri)
+    return OAUTH_AUTHORIZE.format(_base_url(), client_id, encoded_uri)
 
 
+@_bounded
 def request_token(code, client_secret):
     _LOGGER.debug("code: %s Client_secret: %s", code, client_secret)
     data = {
@@ -444,9 +1180,9 @@ def request_token(code, client_secret):
     headers = {
         'Content-Type': 'application/json'
     }
-    response = requests.post('{}/oauth2/token'.format(WinkApiInterface.BASE_URL),
-                             data=json.dumps(data),
-                             headers=headers)
+    response = _request("post", '{}/oauth2/token'.format(_base_url()), "oauth2/token",
+                        data=json.dumps(data),
+                        headers=headers)
     _LOGGER.debug('%s', response)
     response_json = response.json()
     access_token = response_json.get('access_token')
@@ -454,13 +1190,15 @@ def request_token(code, client_secret):
     return {"access_token": access_token, "refresh_token": refresh_token}
 
 
+@_bounded
 def get_user():
-    url_string = "{}/users/me".format(WinkApiInterface.BASE_URL)
-    arequest = requests.get(url_string, headers=API_HEADERS)
+    url_string = "{}/users/me".format(_base_url())
+    arequest = _request("get", url_string, "users/me", headers=_account().api_headers)
     _LOGGER.debug('%s', arequest)
     return arequest.json()
 
 
+@_bounded
 def post_session():
     """
     This endpoint appears to be required in order to keep pubnub updates flowing for some user.
@@ -468,38 +1206,40 @@ def post_session():
     This just posts a random nonce to the /users/me/session endpoint and returns the result.
     """
 
-    url_string = "{}/users/me/session".format(WinkApiInterface.BASE_URL)
+    url_string = "{}/users/me/session".format(_base_url())
 
     nonce = ''.join([str(random.randint(0, 9)) for i in range(9)])
     _json = {"nonce": str(nonce)}
 
     try:
-        arequest = requests.post(url_string,
-                                 data=json.dumps(_json),
-                                 headers=API_HEADERS)
+        arequest = _request("post", url_string, "session",
+                            data=json.dumps(_json),
+                            headers=_account().api_headers)
         response_json = arequest.json()
         return response_json
     except requests.exceptions.RequestException:
         return None
 
 
+@_bounded
 def get_local_control_access_token(local_control_id):
     _LOGGER.debug("Local_control_id: %s", local_control_id)
-    if CLIENT_ID and CLIENT_SECRET and REFRESH_TOKEN:
+    account = _account()
+    if account.client_id and account.client_secret and account.refresh_token:
         data = {
-            "client_id": CLIENT_ID,
-            "client_secret": CLIENT_SECRET,
+            "client_id": account.client_id,
+            "client_secret": account.client_secret,
             "grant_type": "refresh_token",
-            "refresh_token": REFRESH_TOKEN,
+            "refresh_token": account.refresh_token,
             "scope": "local_control",
             "local_control_id": local_control_id
         }
         headers = {
             'Content-Type': 'application/json'
         }
-        response = requests.post('{}/oauth2/token'.format(WinkApiInterface.BASE_URL),
-                                 data=json.dumps(data),
-                                 headers=headers)
+        response = _request("post", '{}/oauth2/token'.format(_base_url()), "oauth2/token",
+                            data=json.dumps(data),
+                            headers=headers)
         _LOGGER.debug('%s', response)
         response_json = response.json()
         access_token = response_json.get('access_token')
@@ -567,16 +1307,33 @@ def get_thermostats():
 
 def get_hubs():
     hubs = get_devices(device_types.HUB)
+    set_up_local_control(hubs)
+    return hubs
+
+
+def set_up_local_control(hubs, refresh=True):
+    """
+    Get a local control token for every hub that supports local control.
+
+    Args:
+        hubs (List): WinkHub devices of the current account.
+        refresh (Bool, optional): False keeps the token of a hub that has
+            one and only updates its address.
+    """
+    account = _account()
     for hub in hubs:
         if hub.manufacturer_device_model() in SUPPORTS_LOCAL_CONTROL:
             _id = hub.local_control_id()
             if _id is not None:
+                known = account.hubs.get(hub.object_id())
+                if not refresh and known is not None and known["token"] is not None and known["id"] == _id:
+                    known["ip"] = hub.ip_address()
+                    continue
                 token = get_local_control_access_token(_id)
                 ip = hub.ip_address()
-                HUBS[hub.object_id()] = {"ip": ip, "token": token, "id": _id}
+                account.hubs[hub.object_id()] = {"ip": ip, "token": token, "id": _id}
             else:
                 _LOGGER.error("%s is missing local control ID.", hub.name())
-    return hubs
 
 
 def get_fans():
@@ -680,35 +1437,48 @@ def get_subscription_origin(device):
     return None
 
 
-def wink_api_fetch(end_point='wink_devices', retry=True):
-    arequest_url = "{}/users/me/{}".format(WinkApiInterface.BASE_URL, end_point)
-    response = requests.get(arequest_url, headers=API_HEADERS)
+@_bounded
+def wink_api_fetch(end_point='wink_devices', retry=True, on_item=None):
+    """
+    Args:
+        on_item (Callable, optional): Called with every item of the
+            response's "data" array as soon as it is parsed.
+    """
+    arequest_url = "{}/users/me/{}".format(_base_url(), end_point)
+    headers = dict(_account().api_headers)
+    headers["Accept-Encoding"] = streaming.ACCEPT_ENCODING
+    response, response_json = _cached_get(arequest_url, end_point, headers=headers, stream=True,
+                                          on_item=on_item)
     _LOGGER.debug('%s', response)
-    if response.status_code == 200:
-        return response.json()
+    if response_json is not None:
+        return response_json
     if response.status_code == 401:
         # Attempt a token refresh and retry the fetch call
         if retry:
             refresh_access_token()
             # Only retry once so pass in False for retry value
-            return wink_api_fetch(end_point, False)
+            with instrumentation.fallback(instrumentation.FALLBACK_TOKEN_REFRESH):
+                return wink_api_fetch(end_point, False, on_item)
         raise WinkAPIException("401 Response from Wink API.")
-    raise WinkAPIException("Unexpected")
+    raise WinkAPIException("Unexpected response {} from Wink API.".format(response.status_code))
 
 
 def get_devices(device_type, end_point="wink_devices"):
-    global ALL_DEVICES, LAST_UPDATE
-
     if end_point == "wink_devices":
+        account = _account()
         now = time.time()
         # Only call the API once to obtain all devices
-        if LAST_UPDATE is None or (now - LAST_UPDATE) > 60:
-            ALL_DEVICES = wink_api_fetch(end_point)
-            LAST_UPDATE = now
-        return get_devices_from_response_dict(ALL_DEVICES, device_type)
+        if account.last_update is None or (now - account.last_update) > 60:
+            # Devices are built while the inventory is still downloading.
+            devices = []
+            account.all_devices = wink_api_fetch(end_point, on_item=_device_builder(device_type, devices))
+            account.last_update = now
+            return devices
+        return get_devices_from_response_dict(account.all_devices, device_type)
     if end_point in ("robots", "scenes", "groups"):
-        json_data = wink_api_fetch(end_point)
-        return get_devices_from_response_dict(json_data, device_type)
+        devices = []
+        wink_api_fetch(end_point, on_item=_device_builder(device_type, devices))
+        return devices
     _LOGGER.error("Invalid endpoint %s", end_point)
     return {}
 
@@ -721,17 +1491,30 @@ def get_devices_from_response_dict(response_dict, device_type):
 
     devices = []
 
-    api_interface = WinkApiInterface()
+    add_device = _device_builder(device_type, devices)
+    for item in items:
+        add_device(item)
+
+    return devices
+
+
+def _device_builder(device_type, devices):
+    """
+    Returns:
+        add_device (Callable): Takes an item of an API response and appends
+            the devices built from it to devices if it is of device_type.
+    """
+    api_interface = WinkApiInterface(current_account())
     check_list = isinstance(device_type, (list,))
 
-    for item in items:
+    def add_device(item):
         if (check_list and get_object_type(item) in device_type) or \
                 (not check_list and get_object_type(item) == device_type):
-            _devices = build_device(item, api_interface)
-            for device in _devices:
-                devices.append(device)
-
-    return devices
+            built = build_device(item, api_interface)
+            devices.extend(built)
+            for device in built:
+                events.fire(events.DEVICE_LOADED, device)
+    return add_device
 
 
 class WinkAPIException(Exception):
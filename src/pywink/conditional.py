@@ -0,0 +1,123 @@
+"""
+Conditional GET requests.
+
+ResponseCache keeps the ETag and Last-Modified validators of GET responses
+together with their parsed body. The next GET of the same URL sends them
+as If-None-Match and If-Modified-Since, and a 304 Not Modified answer is
+served from the cached body without downloading it again.
+
+Bodies are kept serialized. Devices are built on the parsed body and
+change it as their state changes, so every hit gets a fresh copy that
+can't alter what later hits, or other readers, see.
+"""
+import collections
+import json
+import threading
+
+
+class CacheEntry(collections.namedtuple("CacheEntry", ["etag", "last_modified", "text", "size"])):
+    __slots__ = ()
+
+    @property
+    def body(self):
+        """
+        Returns:
+            body (Dict): A new copy of the cached body.
+        """
+        return json.loads(self.text)
+
+
+class ResponseCache:
+    """
+    Args:
+        max_entries (Int, optional): URLs kept, the least recently used
+            are dropped first.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._stats = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def request_headers(self, url):
+        """
+        Returns:
+            headers (Dict): The validators to send with a GET of url.
+        """
+        entry = self.get(url)
+        headers = {}
+        if entry is not None:
+            if entry.etag is not None:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified is not None:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url, headers, body, size):
+        """
+        Keep a 200 response's body if it came with validators.
+
+        Returns:
+            stored (Bool): False if the response had no validators.
+        """
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        with self._lock:
+            if etag is None and last_modified is None:
+                self._entries.pop(url, None)
+                return False
+            self._entries[url] = CacheEntry(etag, last_modified, json.dumps(body), size or 0)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def forget(self, url):
+        with self._lock:
+            self._entries.pop(url, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record(self, end_point, hit, bytes_saved=0):
+        """
+        Count a GET that was answered from the cache, or not.
+        """
+        with self._lock:
+            stats = self._stats.get(end_point)
+            if stats is None:
+                stats = self._stats[end_point] = {"requests": 0, "hits": 0, "bytes_saved": 0}
+            stats["requests"] += 1
+            if hit:
+                stats["hits"] += 1
+                stats["bytes_saved"] += bytes_saved
+
+    def get_stats(self):
+        """
+        Returns:
+            stats (Dict): Requests, hits, hit_rate and bytes_saved per end
+                point under "end_points" and summed up under "total".
+        """
+        with self._lock:
+            end_points = dict((end_point, dict(stats)) for end_point, stats in self._stats.items())
+            entries = len(self._entries)
+        total = {"requests": 0, "hits": 0, "bytes_saved": 0}
+        for stats in end_points.values():
+            for key in total:
+                total[key] += stats[key]
+        for stats in list(end_points.values()) + [total]:
+            stats["hit_rate"] = stats["hits"] / stats["requests"] if stats["requests"] else None
+        return {"end_points": end_points, "total": total, "entries": entries}
@@ -49,7 +49,7 @@ class WinkAirConditioner(WinkDevice):
         """
         desired_state = {"schedule_enabled": state}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -62,7 +62,7 @@ class WinkAirConditioner(WinkDevice):
         """
         desired_state = {"fan_speed": speed}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -78,7 +78,7 @@ class WinkAirConditioner(WinkDevice):
         else:
             desired_state = {"powered": True, "mode": mode}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -94,7 +94,7 @@ class WinkAirConditioner(WinkDevice):
         if max_set_point:
             desired_state['max_set_point'] = max_set_point
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -1,3 +1,77 @@
+import contextlib
+import functools
+import threading
+import time
+
+from .. import events
+
+# Where a device's state came from.
+SOURCE_INVENTORY = "inventory"
+SOURCE_POLL = "poll"
+SOURCE_PUBNUB = "pubnub"
+SOURCE_COMMAND = "command"
+
+_CONTEXT = threading.local()
+
+
+@contextlib.contextmanager
+def state_source(source):
+    """
+    Record states set on this thread within the block as coming from source.
+    """
+    previous = getattr(_CONTEXT, "source", None)
+    _CONTEXT.source = source
+    try:
+        yield
+    finally:
+        _CONTEXT.source = previous
+
+
+def polled(update_state):
+    """
+    Decorator for update_state implementations. Adds the max_age argument,
+    the refresh is skipped while the state is younger than max_age seconds.
+    """
+    @functools.wraps(update_state)
+    def wrapper(self, max_age=None):
+        if max_age is not None and self.state_age() <= max_age:
+            return True
+        with state_source(SOURCE_POLL):
+            return update_state(self)
+    return wrapper
+
+
+def pushed(pubnub_update):
+    """
+    Decorator for pubnub_update implementations.
+    """
+    @functools.wraps(pubnub_update)
+    def wrapper(self, json_response):
+        with state_source(SOURCE_PUBNUB):
+            return pubnub_update(self, json_response)
+    return wrapper
+
+
+class _StateRecorder:
+    """
+    Stands in for the api interface during a transaction, desired_state
+    writes are collected and everything else is passed through.
+    """
+
+    def __init__(self, api_interface):
+        self.api_interface = api_interface
+        self.desired_state = {}
+
+    def local_set_state(self, device, state, id_override=None, type_override=None):
+        if id_override is not None or type_override is not None or list(state) != ["desired_state"]:
+            return self.api_interface.local_set_state(device, state, id_override, type_override)
+        self.desired_state.update(state["desired_state"])
+        return {}
+
+    def __getattr__(self, name):
+        return getattr(self.api_interface, name)
+
+
 class WinkDevice:
     """
     This is a generic Wink device, all other object inherit from this.
@@ -9,16 +83,45 @@ class WinkDevice:
         :return:
         """
         self.api_interface = api_interface
-        self.json_state = device_state_as_json
         self.pubnub_key = None
         self.pubnub_channel = None
-        self.obj_id = self.json_state.get('object_id')
-        self.obj_type = self.json_state.get('object_type')
-        subscription = self.json_state.get('subscription')
+        self.obj_id = device_state_as_json.get('object_id')
+        self.obj_type = device_state_as_json.get('object_type')
+        subscription = device_state_as_json.get('subscription')
         if subscription != {} and subscription is not None:
             pubnub = subscription.get('pubnub')
             self.pubnub_key = pubnub.get('subscribe_key')
             self.pubnub_channel = pubnub.get('channel')
+        with state_source(SOURCE_INVENTORY):
+            self.json_state = device_state_as_json
+
+    @property
+    def api_interface(self):
+        # A transaction only records the setters called on its own thread.
+        recorder = (getattr(_CONTEXT, "transactions", None) or {}).get(id(self))
+        return recorder if recorder is not None else self._api_interface
+
+    @api_interface.setter
+    def api_interface(self, api_interface):
+        self._api_interface = api_interface
+
+    @property
+    def json_state(self):
+        return self._json_state
+
+    @json_state.setter
+    def json_state(self, json_state):
+        self._json_state = json_state
+        self.state_updated_at = time.time()
+        self.state_source = getattr(_CONTEXT, "source", None) or SOURCE_COMMAND
+        events.fire(events.STATE_UPDATED, self)
+
+    def state_age(self):
+        """
+        Returns:
+            age (Float): Seconds since the state was last replaced.
+        """
+        return time.time() - self.state_updated_at
 
     def name(self):
         return self.json_state.get('name')
@@ -95,11 +198,49 @@ class WinkDevice:
             return True
         return False
 
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Collect the desired_state of every setter called in the block and send
+        it as one request when the block exits. Nothing is sent if the block
+        raises. Setters that don't change desired_state are sent immediately.
+
+        Only setters called on this thread are collected, other threads keep
+        sending theirs right away.
+
+        i.e.
+            with thermostat.transaction():
+                thermostat.set_operation_mode("heat_only")
+                thermostat.set_temperature(min_set_point=20.0)
+        """
+        # In a nested transaction this is the enclosing one's recorder.
+        api_interface = self.api_interface
+        recorder = _StateRecorder(api_interface)
+        transactions = getattr(_CONTEXT, "transactions", None)
+        if transactions is None:
+            transactions = _CONTEXT.transactions = {}
+        previous = transactions.get(id(self))
+        transactions[id(self)] = recorder
+        try:
+            yield recorder
+        finally:
+            if previous is None:
+                del transactions[id(self)]
+            else:
+                transactions[id(self)] = previous
+        if recorder.desired_state:
+            response = api_interface.local_set_state(self, {
+                "desired_state": recorder.desired_state
+            })
+            self._update_state_from_response(response)
+
+    @polled
     def update_state(self):
         """ Update state with latest info from Wink API. """
-        response = self.api_interface.get_device_state(self)
+        response = self.api_interface.local_get_state(self)
         return self._update_state_from_response(response)
 
+    @pushed
     def pubnub_update(self, json_response):
         if json_response is not None:
             self.json_state = json_response
@@ -1,4 +1,4 @@
-from ..devices.base import WinkDevice
+from ..devices.base import WinkDevice, polled
 
 SUPPORTED_BINARY_STATE_FIELDS = ['powered', 'opened']
 
@@ -40,6 +40,7 @@ class WinkBinarySwitch(WinkDevice):
     def last_event(self):
         return self._last_reading.get("last_event")
 
+    @polled
     def update_state(self):
         """
         Update state with latest info from Wink API.
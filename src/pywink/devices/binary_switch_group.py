@@ -30,5 +30,5 @@ class WinkBinarySwitchGroup(WinkDevice):
         :return: nothing
         """
         desired_state = {"desired_state": {"powered": state}}
-        response = self.api_interface.set_device_state(self, desired_state)
+        response = self.api_interface.local_set_state(self, desired_state)
         self._update_state_from_response(response)
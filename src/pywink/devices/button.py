@@ -1,3 +1,4 @@
+from ..devices.base import polled
 from ..devices.binary_switch import WinkBinarySwitch
 
 
@@ -15,6 +16,7 @@ class WinkButton(WinkBinarySwitch):
     def pressed(self):
         return self._last_reading.get('pressed') or False
 
+    @polled
     def update_state(self):
         """
         Update state with latest info from Wink API.
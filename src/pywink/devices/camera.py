@@ -24,7 +24,7 @@ class WinkCanaryCamera(WinkDevice):
         :return: nothing
         """
         values = {"desired_state": {"mode": mode}}
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
     def set_privacy(self, state):
@@ -33,5 +33,5 @@ class WinkCanaryCamera(WinkDevice):
         :return: nothing
         """
         values = {"desired_state": {"private": state}}
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
@@ -2,7 +2,7 @@ from datetime import datetime
 import logging
 import random
 
-from ..devices.base import WinkDevice
+from ..devices.base import WinkDevice, polled, pushed
 
 
 DTSTART = "DTSTART;TZID="
@@ -90,6 +90,7 @@ class WinkCloudClockAlarm(WinkDevice):
     def set_enabled(self, enabled):
         self.api_interface.set_device_state(self, {"enabled": enabled})
 
+    @polled
     def update_state(self):
         """ Update state with latest info from Wink API. """
         response = self.api_interface.get_device_state(self, id_override=self.parent.object_id(),
@@ -180,6 +181,7 @@ class WinkCloudClockDial(WinkDevice):
     def available(self):
         return self.json_state.get('connection', False)
 
+    @polled
     def update_state(self):
         """ Update state with latest info from Wink API. """
         response = self.api_interface.get_device_state(self, id_override=self.parent_id(),
@@ -209,6 +211,7 @@ class WinkCloudClockDial(WinkDevice):
                 return True
         return False
 
+    @pushed
     def pubnub_update(self, json_response):
         self._update_state_from_response(json_response)
 
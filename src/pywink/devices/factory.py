@@ -140,7 +140,7 @@ def __is_ge_zwave_fan(device_state_as_json):
 
 
 def __get_subsensors_from_device(item, api_interface):
-    sensor_types = item.get('capabilities', {}).get('fields', [])
+    sensor_types = list(item.get('capabilities', {}).get('fields', []))
     sensor_types.extend(item.get('capabilities', {}).get('sensor_types', []))
 
     # These are attributes of the sensor, not the main sensor to track.
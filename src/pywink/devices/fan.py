@@ -6,7 +6,6 @@ class WinkFan(WinkDevice):
     """
     Represents a Wink fan.
     """
-    json_state = {}
 
     def fan_speeds(self):
         capabilities = self.json_state.get('capabilities', {})
@@ -63,7 +62,7 @@ class WinkFan(WinkDevice):
         else:
             desired_state = {"powered": state}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -76,7 +75,7 @@ class WinkFan(WinkDevice):
         """
         desired_state = {"direction": direction}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -89,7 +88,7 @@ class WinkFan(WinkDevice):
         """
         desired_state = {"timer": timer}
 
-        resp = self.api_interface.set_device_state(self, {
+        resp = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -145,7 +144,7 @@ class WinkGeZwaveFan(WinkFan):
             brightness = self._to_brightness.get(speed or self.current_fan_speed(), 0.33)
             desired_state.update({'brightness': brightness})
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
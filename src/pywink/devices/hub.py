@@ -77,7 +77,7 @@ class WinkHub(WinkDevice):
         if pairing_device_type_selector is not None:
             desired_state.update({"pairing_device_type_selector": pairing_device_type_selector})
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
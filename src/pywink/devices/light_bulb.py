@@ -47,11 +47,6 @@ class WinkLightBulb(WinkDevice):
         """
         return self._last_reading.get('saturation')
 
-    def update_state(self):
-        """ Update state with latest info from Wink API. """
-        response = self.api_interface.local_get_state(self)
-        return self._update_state_from_response(response)
-
     def set_state(self, state, brightness=None,
                   color_kelvin=None, color_xy=None,
                   color_hue_saturation=None):
@@ -1,4 +1,4 @@
-from ..devices.base import WinkDevice
+from ..devices.base import WinkDevice, polled, pushed
 
 
 class WinkPowerStrip(WinkDevice):
@@ -35,6 +35,7 @@ class WinkPowerStripOutlet(WinkDevice):
     def state(self):
         return self._last_reading.get('powered', False)
 
+    @polled
     def update_state(self):
         """ Update state with latest info from Wink API. """
         response = self.api_interface.get_device_state(self, id_override=self.parent_id(),
@@ -55,6 +56,7 @@ class WinkPowerStripOutlet(WinkDevice):
                 outlet['last_reading']['connection'] = power_strip_reading.get('connection')
                 self.json_state = outlet
 
+    @pushed
     def pubnub_update(self, json_response):
         self._update_state_from_response(json_response)
 
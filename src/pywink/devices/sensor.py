@@ -1,4 +1,4 @@
-from ..devices.base import WinkDevice
+from ..devices.base import WinkDevice, pushed
 
 SENSOR_FIELDS_TO_UNITS = {"humidity": "%", "temperature": u'\N{DEGREE SIGN}', "brightness": "%", "proximity": ""}
 
@@ -34,6 +34,7 @@ class WinkSensor(WinkDevice):
     def state(self):
         return self._last_reading.get(self.capability())
 
+    @pushed
     def pubnub_update(self, json_response):
         humidity = json_response['last_reading'].get("humidity")
         # humidity is returned from pubnub on some sensors as a float
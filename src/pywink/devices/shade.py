@@ -15,5 +15,5 @@ class WinkShade(WinkDevice):
         :return: nothing
         """
         values = {"desired_state": {"position": state}}
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
@@ -45,7 +45,7 @@ class WinkSiren(WinkDevice):
                 "siren_volume": volume
             }
         }
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
     def set_chime_volume(self, volume):
@@ -57,7 +57,7 @@ class WinkSiren(WinkDevice):
                 "chime_volume": volume
             }
         }
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
     def set_mode(self, mode):
@@ -70,7 +70,7 @@ class WinkSiren(WinkDevice):
                 "mode": mode
             }
         }
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
     def set_siren_strobe_enabled(self, enabled):
@@ -83,7 +83,7 @@ class WinkSiren(WinkDevice):
                 "strobe_enabled": enabled
             }
         }
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
     def set_chime_strobe_enabled(self, enabled):
@@ -96,7 +96,7 @@ class WinkSiren(WinkDevice):
                 "chime_strobe_enabled": enabled
             }
         }
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
     def set_siren_sound(self, sound):
@@ -111,7 +111,7 @@ class WinkSiren(WinkDevice):
                 "siren_sound": sound
             }
         }
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
     def set_chime(self, sound, cycles=None):
@@ -125,8 +125,8 @@ class WinkSiren(WinkDevice):
         desired_state = {"activate_chime": sound}
         if cycles is not None:
             desired_state.update({"chime_cycles": cycles})
-        response = self.api_interface.set_device_state(self,
-                                                       {"desired_state": desired_state})
+        response = self.api_interface.local_set_state(self,
+                                                      {"desired_state": desired_state})
         self._update_state_from_response(response)
 
     def set_auto_shutoff(self, timer):
@@ -139,21 +139,14 @@ class WinkSiren(WinkDevice):
                 "auto_shutoff": timer
             }
         }
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
 
-    def update_state(self):
-        """
-        Update state with latest info from Wink API.
-        """
-        response = self.api_interface.get_device_state(self)
-        return self._update_state_from_response(response)
-
     def set_state(self, state):
         """
         :param state:   a boolean of true (on) or false ('off')
         :return: nothing
         """
         values = {"desired_state": {"powered": state}}
-        response = self.api_interface.set_device_state(self, values)
+        response = self.api_interface.local_set_state(self, values)
         self._update_state_from_response(response)
@@ -1,3 +1,4 @@
+from ..devices.base import polled
 from ..devices.binary_switch import WinkBinarySwitch
 
 
@@ -9,6 +10,7 @@ class WinkSprinkler(WinkBinarySwitch):
     def state(self):
         return self._last_reading.get('powered', False)
 
+    @polled
     def update_state(self):
         """
         Update state with latest info from Wink API.
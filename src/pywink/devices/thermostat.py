@@ -130,7 +130,7 @@ class WinkThermostat(WinkDevice):
         """
         desired_state = {"fan_mode": mode}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -152,7 +152,7 @@ class WinkThermostat(WinkDevice):
         else:
             desired_state = {"users_away": away}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -168,7 +168,7 @@ class WinkThermostat(WinkDevice):
         else:
             desired_state = {"powered": True, "mode": mode}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -187,7 +187,7 @@ class WinkThermostat(WinkDevice):
         if max_set_point:
             desired_state['max_set_point'] = max_set_point
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
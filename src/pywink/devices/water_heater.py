@@ -44,7 +44,7 @@ class WinkWaterHeater(WinkDevice):
         else:
             desired_state = {"powered": True, "mode": mode}
 
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": desired_state
         })
 
@@ -55,7 +55,7 @@ class WinkWaterHeater(WinkDevice):
         :param set_point: a float for the set point value in celsius
         :return: nothing
         """
-        response = self.api_interface.set_device_state(self, {
+        response = self.api_interface.local_set_state(self, {
             "desired_state": {'set_point': set_point}
         })
 
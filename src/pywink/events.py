@@ -0,0 +1,53 @@
+"""
+Device state events.
+
+Listeners registered with add_listener are called with a StateEvent when a
+desired state is requested and when pywink changes a device's state on its
+own, for example when an optimistic write is confirmed or rolled back.
+"""
+import logging
+from collections import namedtuple
+
+_LOGGER = logging.getLogger(__name__)
+
+# A desired_state write to the device is about to be sent.
+STATE_REQUESTED = "state_requested"
+# The device's json_state was replaced or merged, from any source.
+STATE_UPDATED = "state_updated"
+# A device object was built from an inventory response, i.e. on refresh.
+DEVICE_LOADED = "device_loaded"
+OPTIMISTIC_CONFIRMED = "optimistic_confirmed"
+OPTIMISTIC_ROLLBACK = "optimistic_rollback"
+RECONCILE_CONVERGED = "reconcile_converged"
+RECONCILE_FAILED = "reconcile_failed"
+
+# fields maps the affected last_reading fields to their new values, error is
+# the exception or error response that caused the event, if any.
+StateEvent = namedtuple("StateEvent", ["event", "device", "fields", "error"])
+
+_LISTENERS = []
+
+
+def add_listener(listener):
+    """
+    Args:
+        listener (Callable): Called with a StateEvent for every event.
+    """
+    if listener not in _LISTENERS:
+        _LISTENERS.append(listener)
+
+
+def remove_listener(listener):
+    if listener in _LISTENERS:
+        _LISTENERS.remove(listener)
+
+
+def fire(event, device, fields=None, error=None):
+    if not _LISTENERS:
+        return
+    state_event = StateEvent(event, device, fields or {}, error)
+    for listener in list(_LISTENERS):
+        try:
+            listener(state_event)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("State listener %s failed", listener)
@@ -0,0 +1,301 @@
+"""
+Ordered command execution.
+
+CommandExecutor runs commands on a fixed pool of worker threads. Commands
+are sharded by device, so the commands for one device run one at a time in
+the order they were submitted while different devices run in parallel.
+
+LaneExecutor gives every hub its own small CommandExecutor, a lane, so a
+slow or dead hub only delays the commands for its own devices.
+
+StateCoalescer sends the first desired_state write to an idle device right
+away and merges the writes that arrive while it is in flight, or within a
+short window after, into a single trailing request.
+"""
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+# Hubs have little CPU to spare, a couple of requests at a time is plenty.
+DEFAULT_HUB_WORKERS = 2
+CLOUD_LANE = "cloud"
+
+
+def device_key(device):
+    return device.object_type(), device.object_id()
+
+
+class CommandExecutor:
+    """
+    A pool of worker threads with one queue each.
+
+    Args:
+        workers (Int, optional): Number of worker threads.
+        key (Callable, optional): Maps a device to its shard key, devices with
+            equal keys share a queue. Defaults to device_key.
+        name (String, optional): Prefix of the worker thread names.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, key=device_key, name="pywink-command"):
+        self.key = key
+        self._queues = [queue.Queue() for _ in range(workers)]
+        self._lock = threading.Lock()
+        self._shutdown = False
+        self._threads = []
+        for index, _queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._work, args=(_queue,), name="{}-{}".format(name, index))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _queue_for(self, device):
+        return self._queues[hash(self.key(device)) % len(self._queues)]
+
+    def submit(self, device, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) behind the device's earlier commands.
+
+        Returns:
+            future (Future): Resolved with the command's return value.
+        """
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit commands after shutdown")
+            self._queue_for(device).put((future, func, args, kwargs))
+        return future
+
+    def pending(self):
+        """
+        Returns:
+            pending (Int): Commands queued and not started yet.
+        """
+        return sum(_queue.qsize() for _queue in self._queues)
+
+    def shutdown(self, wait=True):
+        """
+        Stop the workers once the queued commands have run.
+        """
+        with self._lock:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            for _queue in self._queues:
+                _queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    @staticmethod
+    def _work(_queue):
+        while True:
+            command = _queue.get()
+            if command is None:
+                return
+            future, func, args, kwargs = command
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as err:  # pylint: disable=broad-except
+                future.set_exception(err)
+
+
+def hub_lane(device):
+    """
+    Returns:
+        lane (String): The hub_id of devices whose commands go to their hub,
+            as decided by the api interface's local_control_hub, CLOUD_LANE
+            for everything else. The latency based route selection is left
+            out, it decides per request.
+    """
+    local_control_hub = getattr(getattr(device, "api_interface", None), "local_control_hub", None)
+    if local_control_hub is not None and local_control_hub(device, select_route=False) is not None:
+        return device.hub_id()
+    return CLOUD_LANE
+
+
+class LaneExecutor:
+    """
+    Runs commands on one CommandExecutor per lane, created on first use.
+    Commands for a device are still run in order, a device maps to the same
+    lane as long as its route, hub or cloud, doesn't change.
+
+    Args:
+        lane (Callable, optional): Maps a device to its lane, hub_lane by default.
+        lane_workers (Int, optional): Concurrency limit of each hub lane.
+        cloud_workers (Int, optional): Concurrency limit of the CLOUD_LANE.
+    """
+
+    def __init__(self, lane=hub_lane, lane_workers=DEFAULT_HUB_WORKERS, cloud_workers=DEFAULT_WORKERS):
+        self.lane = lane
+        self.lane_workers = lane_workers
+        self.cloud_workers = cloud_workers
+        self._lock = threading.Lock()
+        self._lanes = {}
+        self._shutdown = False
+
+    def _executor_for(self, lane):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit commands after shutdown")
+            executor = self._lanes.get(lane)
+            if executor is None:
+                workers = self.cloud_workers if lane == CLOUD_LANE else self.lane_workers
+                executor = self._lanes[lane] = CommandExecutor(workers, name="pywink-{}".format(lane))
+            return executor
+
+    def submit(self, device, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) on the device's lane, see CommandExecutor.submit.
+        """
+        return self._executor_for(self.lane(device)).submit(device, func, *args, **kwargs)
+
+    def pending(self):
+        """
+        Returns:
+            pending (Dict): Commands queued and not started yet per lane.
+        """
+        with self._lock:
+            return dict((lane, executor.pending()) for lane, executor in self._lanes.items())
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._shutdown = True
+            executors = list(self._lanes.values())
+        for executor in executors:
+            executor.shutdown(wait)
+
+
+class _PendingWrite:
+
+    def __init__(self, device, send, previous):
+        self.device = device
+        self.send = send
+        self.previous = previous
+        self.desired_state = {}
+        self.futures = []
+        self.done = threading.Event()
+
+
+class StateCoalescer:
+    """
+    Last write wins coalescing of desired_state writes.
+
+    A write to a device with nothing in flight is sent at once. A write
+    that arrives while an earlier one is being sent opens a window, writes
+    to the same device within the window are merged into it with later
+    values replacing earlier ones. When the window closes, and the earlier
+    batch has been answered, the merged state is sent once and every
+    caller's future resolves with that response. Batches for one device
+    are sent one at a time, in order.
+
+    A blocking setter called from one thread waits for its own response
+    before the next call, so its writes are never in flight together and
+    are sent one by one without delay. Writes only merge when they come
+    from several threads or through the non-blocking optimistic path.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._last = {}
+
+    # pylint: disable=too-many-arguments
+    def submit(self, device, state, send, window, blocking=False):
+        """
+        Args:
+            device (WinkDevice): The device the change is being requested for.
+            state (Dict): The state being requested, only desired_state is sent.
+            send (Callable): Sends the merged request, called as send(device, state).
+            window (Float): Seconds to wait for more writes after the first.
+            blocking (Bool, optional): The caller waits for the future, a
+                write that is sent at once is sent from the caller's thread.
+        Returns:
+            future (Future): Resolved with the response of the merged request.
+        """
+        key = device_key(device)
+        future = Future()
+        with self._lock:
+            pending = self._pending.get(key)
+            opened = pending is None
+            leading = False
+            if opened:
+                previous = self._last.get(key)
+                leading = previous is None or previous.done.is_set()
+                pending = _PendingWrite(device, send, None if leading else previous)
+                self._pending[key] = self._last[key] = pending
+            pending.desired_state.update(state["desired_state"])
+            pending.futures.append(future)
+        if opened and leading and blocking:
+            self._flush(key, pending)
+        elif opened:
+            timer = threading.Timer(0 if leading else window, self._flush, (key, pending))
+            timer.daemon = True
+            timer.start()
+        return future
+
+    def _flush(self, key, pending):
+        with self._lock:
+            del self._pending[key]
+        if pending.previous is not None:
+            pending.previous.done.wait()
+            pending.previous = None
+        try:
+            response = pending.send(pending.device, {"desired_state": pending.desired_state})
+        except BaseException as err:  # pylint: disable=broad-except
+            for future in pending.futures:
+                future.set_exception(err)
+        else:
+            for future in pending.futures:
+                future.set_result(response)
+        finally:
+            pending.done.set()
+            with self._lock:
+                if self._last.get(key) is pending:
+                    del self._last[key]
+
+
+_LOCK = threading.Lock()
+_EXECUTOR = None
+_COALESCER = StateCoalescer()
+
+
+def get_executor():
+    """
+    Returns:
+        executor (LaneExecutor): The shared executor, started on first use.
+    """
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = LaneExecutor()
+        return _EXECUTOR
+
+
+def submit(device, func, *args, **kwargs):
+    """
+    Run a command for the device on the shared executor, see LaneExecutor.submit.
+
+    i.e. submit(bulb, bulb.set_state, True, brightness=0.5)
+    """
+    return get_executor().submit(device, func, *args, **kwargs)
+
+
+def shutdown(wait=True):
+    global _EXECUTOR
+    with _LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait)
+
+
+def coalesce(device, state, send, window, blocking=False):
+    """
+    Merge the write into the device's pending write, see StateCoalescer.submit.
+    """
+    return _COALESCER.submit(device, state, send, window, blocking)
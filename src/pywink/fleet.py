@@ -0,0 +1,339 @@
+"""
+Many Wink accounts in one process.
+
+FleetManager keeps a WinkAccount per account. The requests of all its
+accounts share one connection pool and one request rate budget, their
+inventories are refreshed oldest first on a bounded set of workers so a
+large or slow account can't starve the others, and every request is
+counted towards the health of the account it was made for. After each
+inventory fetch the hubs of accounts that allow local control get their
+local control tokens, like get_hubs() does for a single account.
+
+To spread a fleet over processes, run a FleetManager in each process on
+the accounts shard() assigns to it.
+"""
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import api, instrumentation
+from .devices import types as device_types
+from .ratelimit import TokenBucket
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_REFRESH_INTERVAL = 300
+
+
+class RateBudget(TokenBucket):
+    """
+    A TokenBucket shared by every request of the fleet, see TokenBucket for
+    the arguments.
+    """
+
+
+class AccountHealth:
+    """
+    Request and inventory counters of one account.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_success = None
+        self.last_error = None
+        self.last_status = None
+        self.latency = instrumentation.LatencyHistogram()
+        self.inventory_updated_at = None
+        self.inventory_errors = 0
+        self.device_count = None
+
+    def record(self, record):
+        now = time.time()
+        with self._lock:
+            self.requests += 1
+            self.last_status = record.status
+            self.latency.add(record.duration)
+            if record.status is None or record.status >= 400:
+                self.errors += 1
+                self.consecutive_errors += 1
+                self.last_error = now
+            else:
+                self.consecutive_errors = 0
+                self.last_success = now
+
+    def inventory_updated(self, device_count):
+        with self._lock:
+            self.inventory_updated_at = time.time()
+            self.device_count = device_count
+
+    def inventory_failed(self):
+        with self._lock:
+            self.inventory_errors += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {"requests": self.requests,
+                    "errors": self.errors,
+                    "error_rate": self.errors / self.requests if self.requests else None,
+                    "consecutive_errors": self.consecutive_errors,
+                    "last_success": self.last_success,
+                    "last_error": self.last_error,
+                    "last_status": self.last_status,
+                    "latency": self.latency.as_dict(),
+                    "inventory_updated_at": self.inventory_updated_at,
+                    "inventory_errors": self.inventory_errors,
+                    "device_count": self.device_count}
+
+
+def shard(accounts, count, index):
+    """
+    Split a fleet over processes, every account is assigned to exactly one.
+
+    Args:
+        accounts (List): WinkAccounts.
+        count (Int): Number of processes.
+        index (Int): This process, from 0 to count - 1.
+    Returns:
+        accounts (List): The accounts this process should manage.
+    """
+    return [account for account in accounts
+            if zlib.crc32(str(account.name).encode("utf-8")) % count == index]
+
+
+class FleetManager:
+    """
+    Args:
+        accounts (List, optional): WinkAccounts to manage, more can be added later.
+        rate (Float, optional): Requests per second over all accounts, None
+            for no limit.
+        burst (Int, optional): See RateBudget.
+        workers (Int, optional): Inventories fetched at the same time.
+        pool_size (Int, optional): Connections kept open per host.
+        refresh_interval (Float, optional): Seconds between inventory
+            refreshes of an account.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, accounts=(), rate=None, burst=None, workers=4, pool_size=10,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.workers = workers
+        self.budget = RateBudget(rate, burst) if rate else None
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._accounts = {}
+        self._health = {}
+        self._devices = {}
+        self._refreshed_at = {}
+        self._in_flight = set()
+        self._thread = None
+        self._running = False
+        instrumentation.add_request_hook(self._record)
+        for account in accounts:
+            self.add(account)
+
+    def add(self, account):
+        """
+        Args:
+            account (WinkAccount): Its session and budget are replaced by the fleet's.
+        """
+        with self._lock:
+            if account.name in self._accounts:
+                raise ValueError("Account {} is already in the fleet".format(account.name))
+            account.session = self.session
+            account.budget = self.budget
+            self._accounts[account.name] = account
+            self._health[account.name] = AccountHealth()
+        self._wakeup.set()
+
+    def remove(self, name):
+        with self._lock:
+            account = self._accounts.pop(name, None)
+            self._health.pop(name, None)
+            self._devices.pop(name, None)
+            self._refreshed_at.pop(name, None)
+        if account is not None:
+            account.session = None
+            account.budget = None
+        return account
+
+    def account(self, name):
+        return self._accounts[name]
+
+    def accounts(self):
+        with self._lock:
+            return list(self._accounts.values())
+
+    def use(self, name):
+        """
+        Make the api functions called in this block act on one account,
+        i.e. "with fleet.use(name): pywink.get_subscription_details()".
+        """
+        return api.use_account(self._accounts[name])
+
+    def devices(self, name):
+        """
+        Returns:
+            devices (List): The devices of the account's last inventory, None
+                before the first refresh.
+        """
+        return self._devices.get(name)
+
+    def health(self, name=None):
+        """
+        Returns:
+            health (Dict): AccountHealth.as_dict() of one account, or of every
+                account keyed by name.
+        """
+        if name is not None:
+            return self._health[name].as_dict()
+        with self._lock:
+            health = dict(self._health)
+        return dict((_name, account_health.as_dict()) for _name, account_health in health.items())
+
+    def _record(self, record):
+        account = api.current_account()
+        if account is None:
+            return
+        health = self._health.get(account.name)
+        if health is not None and self._accounts.get(account.name) is account:
+            health.record(record)
+
+    def due(self, now=None):
+        """
+        Returns:
+            names (List): Accounts whose inventory is due, the longest
+                waiting first. Accounts being refreshed are left out.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            due = [(self._refreshed_at.get(name, 0), name) for name in self._accounts
+                   if name not in self._in_flight
+                   and now - self._refreshed_at.get(name, 0) >= self.refresh_interval]
+        return [name for _, name in sorted(due)]
+
+    def refresh(self, now=None, force=False):
+        """
+        Start inventory fetches for the due accounts, no more than there are
+        idle workers so the next call can still put a longer waiting
+        account first.
+
+        Args:
+            now (Float, optional): The current time.
+            force (Bool, optional): Treat every idle account as due.
+        Returns:
+            futures (Dict): Future of the started fetches keyed by account
+                name, each resolves to the account's devices.
+        """
+        names = self.due(float("inf") if force else now)
+        futures = {}
+        with self._lock:
+            names = names[:max(0, self.workers - len(self._in_flight))]
+            self._in_flight.update(names)
+        for name in names:
+            futures[name] = self._executor.submit(self._fetch, name)
+        return futures
+
+    def refresh_all(self, timeout=None):
+        """
+        Fetch the inventory of every idle account and wait for them.
+
+        Args:
+            timeout (Float, optional): Seconds to wait.
+        Returns:
+            devices (Dict): Device lists keyed by account name, accounts whose
+                fetch failed or did not finish in time are left out.
+        """
+        names = self.due(float("inf"))
+        with self._lock:
+            self._in_flight.update(names)
+        futures = dict((name, self._executor.submit(self._fetch, name)) for name in names)
+        wait(futures.values(), timeout)
+        return dict((name, future.result()) for name, future in futures.items()
+                    if future.done() and future.exception() is None)
+
+    def _fetch(self, name):
+        account = self._accounts.get(name)
+        try:
+            if account is None:
+                return None
+            with api.use_account(account):
+                # The fleet decides when to refetch, not the 60 second cache.
+                account.last_update = None
+                devices = api.get_all_devices()
+                if account.allow_local_control:
+                    api.set_up_local_control([device for device in devices
+                                              if device.object_type() == device_types.HUB], refresh=False)
+            with self._lock:
+                if self._accounts.get(name) is account:
+                    self._devices[name] = devices
+                    self._health[name].inventory_updated(len(devices))
+            return devices
+        except Exception:
+            _LOGGER.exception("Failed to refresh the inventory of %s", name)
+            health = self._health.get(name)
+            if health is not None:
+                health.inventory_failed()
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.discard(name)
+                if name in self._accounts:
+                    # Failed accounts wait a full interval too, so they can't
+                    # take the workers from the healthy ones.
+                    self._refreshed_at[name] = time.time()
+            self._wakeup.set()
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="pywink-fleet")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join()
+
+    def close(self):
+        self.stop()
+        instrumentation.remove_request_hook(self._record)
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+            self._wakeup.clear()
+            self.refresh()
+            with self._lock:
+                waits = [self._refreshed_at.get(name, 0) + self.refresh_interval - time.time()
+                         for name in self._accounts if name not in self._in_flight]
+            self._wakeup.wait(max(0.05, min(waits)) if waits else self.refresh_interval)
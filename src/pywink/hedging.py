@@ -0,0 +1,104 @@
+"""
+Hedged requests.
+
+A hedged request sends the primary request and, if it hasn't answered by
+a delay taken from the recent latency of its route, sends the secondary
+request as well. The first valid answer wins and the other one is left to
+finish on its own, so the wait is bounded by the faster of the two.
+"""
+import collections
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+_LOGGER = logging.getLogger(__name__)
+
+PRIMARY = "primary"
+SECONDARY = "secondary"
+
+# Samples needed before a route's percentile is trusted.
+MIN_SAMPLES = 5
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+class LatencyTracker:
+    """
+    The most recent latencies of each route, i.e. of each hub.
+
+    Args:
+        size (Int, optional): Samples kept per route.
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = collections.deque(maxlen=self.size)
+            samples.append(seconds)
+
+    def percentile(self, key, percent):
+        """
+        Returns:
+            latency (Float): The percentile of the route's recent latencies,
+                None with fewer than MIN_SAMPLES samples.
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(key) or ())
+        if len(samples) < MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, int(round(percent / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+def _get_pool():
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=16)
+        return _POOL
+
+
+def _succeeded(future, valid):
+    return future.exception() is None and (valid is None or valid(future.result()))
+
+
+def hedge(primary, secondary, delay, valid=None):
+    """
+    Args:
+        primary (Callable): Called first.
+        secondary (Callable): Called when primary hasn't answered validly
+            within delay seconds.
+        delay (Float): Seconds to wait for primary alone.
+        valid (Callable, optional): Takes a result and returns False when it
+            should not win, by default every result that didn't raise wins.
+    Returns:
+        (result, winner): The first valid result and PRIMARY or SECONDARY.
+            When neither is valid the secondary's result is returned, or its
+            exception raised.
+    """
+    pool = _get_pool()
+    first = pool.submit(primary)
+    done, _ = wait([first], delay)
+    if done and _succeeded(first, valid):
+        return first.result(), PRIMARY
+    _LOGGER.debug("Primary did not answer within %.3f seconds, sending secondary", delay)
+    second = pool.submit(secondary)
+    pending = {second} if done else {first, second}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        # Prefer the primary when both finished together.
+        for future in (first, second):
+            if future in done and _succeeded(future, valid):
+                return future.result(), PRIMARY if future is first else SECONDARY
+    return second.result(), SECONDARY
@@ -0,0 +1,201 @@
+"""
+Recent history of numeric readings.
+
+History keeps a fixed size ring buffer of (time, value) pairs per device
+and field, backed by arrays of doubles. Once started it records from every
+state update, whatever its source, and answers min/max/mean/rate queries
+over a time window.
+"""
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from . import events
+from .executor import device_key
+
+DEFAULT_CAPACITY = 1024
+
+# Fields of last_reading recorded by default.
+DEFAULT_FIELDS = ["temperature", "external_temperature", "humidity", "brightness", "proximity",
+                  "remaining", "total_consumption", "consumption", "battery"]
+
+WindowStats = namedtuple("WindowStats", ["count", "min", "max", "mean", "rate", "first", "last"])
+
+
+class RingBuffer:
+    """
+    The newest capacity (time, value) pairs, oldest first.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._start = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, timestamp, value):
+        index = (self._start + self._count) % self.capacity
+        self._times[index] = timestamp
+        self._values[index] = value
+        if self._count < self.capacity:
+            self._count += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def last_time(self):
+        if not self._count:
+            return None
+        return self._times[(self._start + self._count - 1) % self.capacity]
+
+    def _first_index_since(self, since):
+        # Binary search over the logical order, times only ever increase.
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._times[(self._start + middle) % self.capacity] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def items(self, since=None):
+        """
+        Returns:
+            items (List): (time, value) pairs no older than since, oldest first.
+        """
+        first = 0 if since is None else self._first_index_since(since)
+        return [(self._times[(self._start + index) % self.capacity],
+                 self._values[(self._start + index) % self.capacity])
+                for index in range(first, self._count)]
+
+    def stats(self, since=None):
+        """
+        Returns:
+            stats (WindowStats): Over the pairs no older than since, None if
+                there are none. rate is the change per second between the
+                first and last value.
+        """
+        first = 0 if since is None else self._first_index_since(since)
+        count = self._count - first
+        if count <= 0:
+            return None
+        low = float("inf")
+        high = float("-inf")
+        total = 0.0
+        for index in range(first, self._count):
+            value = self._values[(self._start + index) % self.capacity]
+            low = min(low, value)
+            high = max(high, value)
+            total += value
+        first_index = (self._start + first) % self.capacity
+        last_index = (self._start + self._count - 1) % self.capacity
+        elapsed = self._times[last_index] - self._times[first_index]
+        rate = (self._values[last_index] - self._values[first_index]) / elapsed if elapsed > 0 else None
+        return WindowStats(count, low, high, total / count, rate,
+                           (self._times[first_index], self._values[first_index]),
+                           (self._times[last_index], self._values[last_index]))
+
+
+class History:
+    """
+    Args:
+        capacity (Int, optional): Readings kept per device and field.
+        fields (List, optional): last_reading fields to record, DEFAULT_FIELDS
+            by default, None records every numeric field.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, fields=DEFAULT_FIELDS):
+        self.capacity = capacity
+        self.fields = fields
+        self._lock = threading.Lock()
+        self._buffers = {}
+        self._last_readings = {}
+
+    def start(self):
+        """
+        Record every state update from now on.
+        """
+        events.add_listener(self._on_event)
+
+    def stop(self):
+        events.remove_listener(self._on_event)
+
+    def _on_event(self, event):
+        if event.event == events.STATE_UPDATED:
+            self.record(event.device)
+
+    def record(self, device, now=None):
+        """
+        Record the numeric fields of the device's last_reading. A reading is
+        timed by its <field>_updated_at when the API sent one, and skipped if
+        it is not newer than the last recorded one. A last_reading equal to
+        the last one recorded for the Wink object is skipped as a whole, the
+        devices of one object, i.e. the sensors of a sensor pod, each report
+        the same update.
+        """
+        last_reading = device.json_state.get("last_reading") or {}
+        fields = self.fields if self.fields is not None else list(last_reading)
+        now = time.time() if now is None else now
+        key = device_key(device)
+        with self._lock:
+            if self._last_readings.get(key) == last_reading:
+                return
+            self._last_readings[key] = dict(last_reading)
+            for field in fields:
+                value = last_reading.get(field)
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                timestamp = last_reading.get("{}_updated_at".format(field))
+                if not isinstance(timestamp, (int, float)):
+                    timestamp = now
+                buffer = self._buffers.get((key, field))
+                if buffer is None:
+                    buffer = self._buffers[(key, field)] = RingBuffer(self.capacity)
+                else:
+                    last_time = buffer.last_time()
+                    if last_time is not None and timestamp <= last_time:
+                        continue
+                buffer.append(timestamp, value)
+
+    def readings(self, device, field, window=None, now=None):
+        """
+        Returns:
+            readings (List): (time, value) pairs from the last window seconds,
+                all of them if window is None.
+        """
+        with self._lock:
+            buffer = self._buffers.get((device_key(device), field))
+            if buffer is None:
+                return []
+            return buffer.items(self._since(window, now))
+
+    def stats(self, device, field, window=None, now=None):
+        """
+        Returns:
+            stats (WindowStats): count, min, max, mean, rate per second and
+                the first and last (time, value) over the last window seconds,
+                None if there are no readings.
+        """
+        with self._lock:
+            buffer = self._buffers.get((device_key(device), field))
+            if buffer is None:
+                return None
+            return buffer.stats(self._since(window, now))
+
+    def forget(self, device):
+        key = device_key(device)
+        with self._lock:
+            self._last_readings.pop(key, None)
+            for buffer_key in [buffer_key for buffer_key in self._buffers if buffer_key[0] == key]:
+                del self._buffers[buffer_key]
+
+    @staticmethod
+    def _since(window, now):
+        if window is None:
+            return None
+        return (time.time() if now is None else now) - window
@@ -0,0 +1,179 @@
+"""
+Request level instrumentation.
+
+Every request made by pywink is reported to the registered hooks as a
+RequestRecord. A built-in hook keeps latency histograms per route and end
+point, read them with get_stats().
+"""
+import bisect
+import contextlib
+import logging
+import threading
+from collections import namedtuple
+
+_LOGGER = logging.getLogger(__name__)
+
+ROUTE_CLOUD = "cloud"
+ROUTE_LOCAL = "local"
+
+# Why a request was sent again or sent somewhere else.
+FALLBACK_LOCAL_ERROR = "local_error"
+FALLBACK_TOKEN_REFRESH = "token_refresh"
+FALLBACK_RATE_LIMITED = "rate_limited"
+FALLBACK_RETRY = "retry"
+FALLBACK_HEDGE = "hedge"
+
+RequestRecord = namedtuple("RequestRecord", ["end_point", "object_type", "route", "method", "status",
+                                             "bytes", "duration", "fallback_reason"])
+
+# Upper bounds of the histogram buckets in seconds, the last bucket is open.
+LATENCY_BUCKETS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+
+_HOOKS = []
+_CONTEXT = threading.local()
+
+
+def add_request_hook(hook):
+    """
+    Args:
+        hook (Callable): Called with a RequestRecord after every request.
+    """
+    if hook not in _HOOKS:
+        _HOOKS.append(hook)
+
+
+def remove_request_hook(hook):
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+
+def record_request(record):
+    for hook in list(_HOOKS):
+        try:
+            hook(record)
+        except Exception:  # pylint: disable=broad-except
+            _LOGGER.exception("Request hook %s failed", hook)
+
+
+@contextlib.contextmanager
+def fallback(reason):
+    """
+    Mark the requests made in this block as a fallback for the given reason.
+    """
+    previous = getattr(_CONTEXT, "fallback_reason", None)
+    _CONTEXT.fallback_reason = reason
+    try:
+        yield
+    finally:
+        _CONTEXT.fallback_reason = previous
+
+
+def current_fallback_reason():
+    return getattr(_CONTEXT, "fallback_reason", None)
+
+
+class LatencyHistogram:
+    """
+    Counts durations into the fixed LATENCY_BUCKETS.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, duration):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+
+    def percentile(self, percent):
+        """
+        Estimate a percentile as the upper bound of the bucket it falls in.
+        """
+        if not self.count:
+            return None
+        rank = self.count * percent / 100.0
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                if index < len(LATENCY_BUCKETS):
+                    return min(LATENCY_BUCKETS[index], self.max)
+                return self.max
+        return self.max
+
+    def as_dict(self):
+        return {"count": self.count,
+                "total": self.total,
+                "mean": self.total / self.count if self.count else None,
+                "min": self.min,
+                "max": self.max,
+                "p50": self.percentile(50),
+                "p90": self.percentile(90),
+                "p99": self.percentile(99),
+                "buckets": list(zip(LATENCY_BUCKETS + [None], self.buckets))}
+
+
+class RequestStats:
+    """
+    The built-in hook, aggregates records per route and end point.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._latency = {}
+            self._statuses = {}
+            self._bytes = {}
+            self._fallbacks = {}
+
+    def __call__(self, record):
+        key = (record.route, record.end_point)
+        with self._lock:
+            histogram = self._latency.get(key)
+            if histogram is None:
+                histogram = self._latency[key] = LatencyHistogram()
+            histogram.add(record.duration)
+            statuses = self._statuses.setdefault(key, {})
+            statuses[record.status] = statuses.get(record.status, 0) + 1
+            self._bytes[key] = self._bytes.get(key, 0) + (record.bytes or 0)
+            if record.fallback_reason is not None:
+                self._fallbacks[record.fallback_reason] = self._fallbacks.get(record.fallback_reason, 0) + 1
+
+    def get_stats(self):
+        with self._lock:
+            requests = {}
+            for key, histogram in self._latency.items():
+                stats = histogram.as_dict()
+                stats["statuses"] = dict(self._statuses[key])
+                stats["bytes"] = self._bytes[key]
+                requests["{}:{}".format(*key)] = stats
+            return {"requests": requests, "fallbacks": dict(self._fallbacks)}
+
+
+REQUEST_STATS = RequestStats()
+add_request_hook(REQUEST_STATS)
+
+
+def get_stats():
+    """
+    Returns:
+        stats (Dict): "requests" maps "route:end_point" to its latency
+            histogram, status counts and bytes received, "fallbacks" counts
+            the requests sent again per fallback reason.
+    """
+    return REQUEST_STATS.get_stats()
+
+
+def reset_stats():
+    REQUEST_STATS.reset()
@@ -0,0 +1,213 @@
+"""
+Append-only journal of device state changes.
+
+Journal writes a record for every state update that changed a device's
+state, whether it came from polling, pubnub or a command response. Files
+are rotated by size. JournalReader memory-maps the files and filters on
+object_id and time from the fixed size record headers, so it only decodes
+the records that match.
+
+Every record is flushed to the operating system when it is written, so it
+survives a crash of the process. With fsync it is also forced to disk and
+survives a crash of the machine, at the cost of a disk write per record.
+
+File layout: the FILE_MAGIC, then records of RECORD_HEADER (length of the
+body, timestamp, length of the object_id), the UTF-8 object_id and a JSON
+body with object_type, source, last_reading and desired_state.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from . import events
+
+_LOGGER = logging.getLogger(__name__)
+
+FILE_MAGIC = b"PWJ1"
+FILE_PATTERN = "journal-{:06d}.pwj"
+RECORD_HEADER = struct.Struct("<IdH")
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Devices whose last state is remembered to skip unchanged updates.
+DEFAULT_MAX_TRACKED = 65536
+
+JournalRecord = namedtuple("JournalRecord", ["timestamp", "object_id", "object_type", "source",
+                                             "last_reading", "desired_state"])
+
+
+def _journal_files(directory):
+    names = sorted(name for name in os.listdir(directory)
+                   if name.startswith("journal-") and name.endswith(".pwj"))
+    return [os.path.join(directory, name) for name in names]
+
+
+class Journal:
+    """
+    Args:
+        directory (String): Where the journal files are written, created if needed.
+        max_bytes (Int, optional): Size at which a file is rotated.
+        max_files (Int, optional): Oldest files beyond this count are deleted,
+            None keeps every file.
+        fsync (Bool, optional): Force every record to disk, not just to the
+            operating system.
+        max_tracked (Int, optional): Devices whose last state is remembered,
+            the least recently updated are forgotten first. A forgotten
+            device's next update is written even if it didn't change.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, max_files=None, fsync=False,
+                 max_tracked=DEFAULT_MAX_TRACKED):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.fsync = fsync
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._file = None
+        self._size = 0
+        self._index = 0
+        self._last = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        files = _journal_files(directory)
+        if files:
+            self._index = int(os.path.basename(files[-1])[8:14])
+
+    def start(self):
+        """
+        Journal every state update from now on.
+        """
+        events.add_listener(self._on_event)
+
+    def stop(self):
+        events.remove_listener(self._on_event)
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def _on_event(self, event):
+        if event.event == events.STATE_UPDATED:
+            self.append(event.device)
+
+    def append(self, device, timestamp=None):
+        """
+        Write the device's current state, unless it equals the last state
+        written for the device.
+
+        Returns:
+            written (Bool): True if a record was written.
+        """
+        json_state = device.json_state
+        body = json.dumps({"object_type": device.object_type(),
+                           "source": getattr(device, "state_source", None),
+                           "last_reading": json_state.get("last_reading"),
+                           "desired_state": json_state.get("desired_state")},
+                          separators=(",", ":"), sort_keys=True).encode("utf-8")
+        object_id = str(device.object_id()).encode("utf-8")
+        key = (device.object_type(), object_id)
+        # The source changes on every update, it alone is not a change.
+        state = json.dumps([json_state.get("last_reading"), json_state.get("desired_state")], sort_keys=True)
+        timestamp = getattr(device, "state_updated_at", None) if timestamp is None else timestamp
+        record = RECORD_HEADER.pack(len(body), timestamp or time.time(), len(object_id)) + object_id + body
+        with self._lock:
+            if self._last.get(key) == state:
+                self._last.move_to_end(key)
+                return False
+            self._last[key] = state
+            self._last.move_to_end(key)
+            while len(self._last) > self.max_tracked:
+                self._last.popitem(last=False)
+            if self._file is None or self._size + len(record) > self.max_bytes:
+                self._rotate()
+            self._file.write(record)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._size += len(record)
+        return True
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        self._index += 1
+        path = os.path.join(self.directory, FILE_PATTERN.format(self._index))
+        self._file = open(path, "wb")
+        self._file.write(FILE_MAGIC)
+        self._size = len(FILE_MAGIC)
+        if self.max_files is not None:
+            for old in _journal_files(self.directory)[:-self.max_files]:
+                os.remove(old)
+
+
+class JournalReader:
+    """
+    Reads the journal files of a directory, oldest first.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def scan(self, object_id=None, start=None, end=None):
+        """
+        Args:
+            object_id (String, optional): Only this object's records.
+            start (Float, optional): Only records at or after this time.
+            end (Float, optional): Only records before this time.
+        Returns:
+            records (Generator): JournalRecords in the order they were written.
+        """
+        wanted = None if object_id is None else str(object_id).encode("utf-8")
+        for path in _journal_files(self.directory):
+            for record in self._scan_file(path, wanted, start, end):
+                yield record
+
+    @staticmethod
+    def _scan_file(path, wanted, start, end):
+        with open(path, "rb") as journal_file:
+            if os.fstat(journal_file.fileno()).st_size <= len(FILE_MAGIC):
+                return
+            with mmap.mmap(journal_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:len(FILE_MAGIC)] != FILE_MAGIC:
+                    _LOGGER.error("%s is not a journal file", path)
+                    return
+                offset = len(FILE_MAGIC)
+                size = len(data)
+                while offset + RECORD_HEADER.size <= size:
+                    body_length, timestamp, id_length = RECORD_HEADER.unpack_from(data, offset)
+                    id_start = offset + RECORD_HEADER.size
+                    body_start = id_start + id_length
+                    offset = body_start + body_length
+                    if offset > size:
+                        # A record cut short by a crash ends the file.
+                        return
+                    if start is not None and timestamp < start or end is not None and timestamp >= end:
+                        continue
+                    if wanted is not None and data[id_start:body_start] != wanted:
+                        continue
+                    body = json.loads(data[body_start:offset].decode("utf-8"))
+                    yield JournalRecord(timestamp, data[id_start:body_start].decode("utf-8"), body["object_type"],
+                                        body["source"], body["last_reading"], body["desired_state"])
+
+    def replay(self, start=None, end=None):
+        """
+        Returns:
+            states (Dict): The last record per (object_type, object_id) within
+                the time range, i.e. the fleet's state at end.
+        """
+        states = {}
+        for record in self.scan(start=start, end=end):
+            states[(record.object_type, record.object_id)] = record
+        return states
@@ -0,0 +1,114 @@
+"""
+Optimistic state application.
+
+With optimistic state enabled, a desired_state write is merged into the
+device's last_reading straight away and the request is queued behind the
+device's earlier commands. When the request fails the fields that were
+changed are restored and an events.OPTIMISTIC_ROLLBACK event is fired.
+"""
+import copy
+import logging
+import threading
+from concurrent.futures import Future
+
+from . import events
+
+_LOGGER = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+_PENDING = set()
+
+
+def wait_for_confirmations(timeout=None):
+    """
+    Block until every pending optimistic write was confirmed or rolled back.
+
+    Returns:
+        done (Bool): False if the timeout expired first.
+    """
+    with _LOCK:
+        pending = list(_PENDING)
+    for future in pending:
+        try:
+            future.result(timeout)
+        except Exception:  # pylint: disable=broad-except
+            if not future.done():
+                return False
+    return True
+
+
+def apply(device, state, submit):
+    """
+    Apply state["desired_state"] to the device and confirm it in the background.
+
+    Args:
+        device (WinkDevice): The device the change is being requested for.
+        state (Dict): The state being requested.
+        submit (Callable): Queues the request, called as submit(device, state)
+            and returns a Future of the response.
+    Returns:
+        response_json (Dict): A response holding the optimistic state, to be
+            passed to the device's _update_state_from_response.
+    """
+    desired = state["desired_state"]
+    json_state = copy.copy(device.json_state)
+    last_reading = dict(json_state.get("last_reading") or {})
+    with _LOCK:
+        # The values to restore are the ones from before the first write
+        # that has not been confirmed yet.
+        rollback = getattr(device, "_optimistic_rollback", None) or {}
+        for field in desired:
+            rollback.setdefault(field, last_reading.get(field))
+        generation = getattr(device, "_optimistic_generation", 0) + 1
+        device._optimistic_rollback = rollback  # pylint: disable=protected-access
+        device._optimistic_generation = generation  # pylint: disable=protected-access
+    last_reading.update(desired)
+    json_state["last_reading"] = last_reading
+    json_state["desired_state"] = dict(json_state.get("desired_state") or {}, **desired)
+
+    confirmation = Future()
+    with _LOCK:
+        _PENDING.add(confirmation)
+    submit(device, state).add_done_callback(
+        lambda future: _confirm(device, state, future, generation, confirmation))
+    return {"data": json_state}
+
+
+# pylint: disable=protected-access
+def _confirm(device, state, future, generation, confirmation):
+    try:
+        response = future.result()
+        error = None if response and response.get("data") is not None else response
+    except Exception as err:  # pylint: disable=broad-except
+        response, error = None, err
+    with _LOCK:
+        # Only the outcome of the latest write counts, earlier ones were
+        # superseded by it.
+        latest = device._optimistic_generation == generation
+        rollback = device._optimistic_rollback if latest else {}
+        if latest:
+            device._optimistic_rollback = None
+        elif error is None and device._optimistic_rollback:
+            # The server now holds this write, a later failure goes back to it.
+            for field, value in state["desired_state"].items():
+                if field in device._optimistic_rollback:
+                    device._optimistic_rollback[field] = value
+    try:
+        if error is None:
+            if latest:
+                device._update_state_from_response(response)
+            events.fire(events.OPTIMISTIC_CONFIRMED, device, state["desired_state"])
+            return
+        _LOGGER.error("Optimistic update of %s failed: %s", device.name(), error)
+        restored = {}
+        if rollback and device.json_state.get("last_reading") is not None:
+            json_state = copy.copy(device.json_state)
+            json_state["last_reading"] = dict(json_state["last_reading"], **rollback)
+            # Assigned, not changed in place, so STATE_UPDATED listeners see it.
+            device.json_state = json_state
+            restored = dict(rollback)
+        events.fire(events.OPTIMISTIC_ROLLBACK, device, restored, error)
+    finally:
+        confirmation.set_result(response)
+        with _LOCK:
+            _PENDING.discard(confirmation)
@@ -0,0 +1,172 @@
+"""
+Indexed lookups over the device inventory.
+
+DeviceIndex keeps a secondary index per field, so a query costs the size
+of its smallest matching index entry rather than a pass over every device.
+
+Entries are keyed by the device's Wink object and capability, not by the
+device object. Once started, the index swaps in the new device objects an
+inventory refresh builds for the devices it holds.
+
+i.e.
+    index = DeviceIndex(get_all_devices())
+    index.find(hub_id=hub.object_id(), radio_type="zigbee", available=False)
+"""
+import threading
+
+from . import events
+from .snapshot import row_key
+
+
+def _json_field(field):
+    def get(device):
+        return device.json_state.get(field)
+    return get
+
+
+def _name(device):
+    name = device.name()
+    return name.lower() if isinstance(name, str) else name
+
+
+def _available(device):
+    return bool(device.available())
+
+
+# Indexed fields and how their value is read from a device.
+INDEXES = {
+    "hub_id": _json_field("hub_id"),
+    "device_manufacturer": _json_field("device_manufacturer"),
+    "manufacturer_device_model": _json_field("manufacturer_device_model"),
+    "radio_type": _json_field("radio_type"),
+    "object_type": lambda device: device.object_type(),
+    "object_id": lambda device: device.object_id(),
+    "gang_id": _json_field("gang_id"),
+    "name": _name,
+    "available": _available,
+}
+
+
+class DeviceIndex:
+    """
+    Args:
+        devices (List, optional): The devices to index.
+    """
+
+    def __init__(self, devices=()):
+        self._lock = threading.Lock()
+        # Keyed by row_key, one Wink object can back several devices, i.e.
+        # the sensors of a sensor pod, told apart by their capability.
+        self._devices = {}
+        self._keys = {}
+        self._values = {}
+        self._indexes = dict((field, {}) for field in INDEXES)
+        for device in devices:
+            self.add(device)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def start(self):
+        """
+        Re-index devices whenever their state is updated, and replace them
+        with the device objects built when the inventory is loaded again.
+        Devices that are added to or removed from the account still need
+        sync().
+        """
+        events.add_listener(self._on_event)
+
+    def stop(self):
+        events.remove_listener(self._on_event)
+
+    def _on_event(self, event):
+        if event.event == events.STATE_UPDATED:
+            # A device's constructor fires this before it is complete, only indexed devices are looked at.
+            key = self._keys.get(id(event.device))
+            if key is not None and self._devices.get(key) is event.device:
+                self.add(event.device)
+        elif event.event == events.DEVICE_LOADED and row_key(event.device) in self._devices:
+            self.add(event.device)
+
+    def add(self, device):
+        """
+        Index the device, or re-index it if it is indexed already. It
+        replaces an indexed device of the same Wink object and capability.
+        """
+        key = row_key(device)
+        values = dict((field, get(device)) for field, get in INDEXES.items())
+        with self._lock:
+            self._unindex(key)
+            self._devices[key] = device
+            self._keys[id(device)] = key
+            self._values[key] = values
+            for field, value in values.items():
+                self._indexes[field].setdefault(value, set()).add(key)
+
+    def remove(self, device):
+        with self._lock:
+            self._unindex(row_key(device))
+
+    def _unindex(self, key):
+        values = self._values.pop(key, None)
+        device = self._devices.pop(key, None)
+        if device is not None:
+            self._keys.pop(id(device), None)
+        if values is None:
+            return
+        for field, value in values.items():
+            keys = self._indexes[field].get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._indexes[field][value]
+
+    def sync(self, devices):
+        """
+        Make the index match a freshly loaded inventory, devices that are no
+        longer in it are dropped.
+        """
+        keys = set()
+        for device in devices:
+            keys.add(row_key(device))
+            self.add(device)
+        with self._lock:
+            for key in [key for key in self._devices if key not in keys]:
+                self._unindex(key)
+
+    def values(self, field):
+        """
+        Returns:
+            counts (Dict): The number of devices per value of the field.
+        """
+        with self._lock:
+            return dict((value, len(keys)) for value, keys in self._indexes[field].items())
+
+    def find(self, **criteria):
+        """
+        Args:
+            criteria: Indexed field names and the value to match, or a list,
+                tuple or set of values to match any of. Names match case
+                insensitively.
+        Returns:
+            devices (List): The devices matching every criterion.
+        """
+        with self._lock:
+            candidates = []
+            for field, wanted in criteria.items():
+                if field not in self._indexes:
+                    raise ValueError("{} is not indexed, use one of {}".format(field, ", ".join(sorted(INDEXES))))
+                if not isinstance(wanted, (list, tuple, set, frozenset)):
+                    wanted = [wanted]
+                if field == "name":
+                    wanted = [value.lower() if isinstance(value, str) else value for value in wanted]
+                index = self._indexes[field]
+                matches = [index[value] for value in wanted if value in index]
+                candidates.append(matches[0] if len(matches) == 1 else set().union(*matches))
+            if not candidates:
+                return list(self._devices.values())
+            candidates.sort(key=len)
+            keys = candidates[0]
+            for other in candidates[1:]:
+                keys = [key for key in keys if key in other]
+            return [self._devices[key] for key in keys]
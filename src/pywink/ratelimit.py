@@ -0,0 +1,254 @@
+"""
+Client side rate limiting of the Wink cloud API.
+
+Requests are sorted into endpoint classes, each with its own token bucket.
+While a bucket is empty, or paused after a 429 response, waiting requests
+are let through by priority and then in arrival order, so user commands
+go before background polling.
+"""
+import contextlib
+import email.utils
+import heapq
+import itertools
+import threading
+import time
+
+INVENTORY = "inventory"
+READ = "read"
+WRITE = "write"
+OAUTH = "oauth"
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+DEFAULT_PRIORITIES = {
+    OAUTH: PRIORITY_HIGH,
+    WRITE: PRIORITY_HIGH,
+    READ: PRIORITY_NORMAL,
+    INVENTORY: PRIORITY_LOW,
+}
+
+# (requests per second, burst) per endpoint class.
+DEFAULT_LIMITS = {
+    INVENTORY: (0.2, 3),
+    READ: (2.0, 10),
+    WRITE: (5.0, 10),
+    OAUTH: (0.5, 2),
+}
+
+# Seconds to wait after a 429 without a usable Retry-After header.
+DEFAULT_RETRY_AFTER = 1.0
+MAX_RETRY_AFTER = 300.0
+
+_CONTEXT = threading.local()
+
+
+def endpoint_class(method, end_point):
+    """
+    Args:
+        method (String): The HTTP method.
+        end_point (String): The end point name passed to api._request.
+    Returns:
+        endpoint_class (String): INVENTORY, READ, WRITE or OAUTH.
+    """
+    if end_point == "oauth2/token":
+        return OAUTH
+    if method.upper() != "GET":
+        return WRITE
+    if end_point == "object":
+        return READ
+    return INVENTORY
+
+
+@contextlib.contextmanager
+def priority(level):
+    """
+    Send the requests made in this block with the given priority instead of
+    the default of their endpoint class.
+    """
+    previous = getattr(_CONTEXT, "priority", None)
+    _CONTEXT.priority = level
+    try:
+        yield
+    finally:
+        _CONTEXT.priority = previous
+
+
+def current_priority(_endpoint_class=None):
+    level = getattr(_CONTEXT, "priority", None)
+    if level is None:
+        return DEFAULT_PRIORITIES.get(_endpoint_class, PRIORITY_NORMAL)
+    return level
+
+
+def retry_after(response, default=DEFAULT_RETRY_AFTER):
+    """
+    Args:
+        response (requests.Response): A 429 or 503 response.
+        default (Float, optional): Used when the header is missing or invalid.
+    Returns:
+        seconds (Float): How long to wait before sending again, as seconds
+            or an HTTP date in the Retry-After header.
+    """
+    value = (getattr(response, "headers", None) or {}).get("Retry-After")
+    if value is None:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class TokenBucket:
+    """
+    Args:
+        rate (Float): Requests per second.
+        burst (Int, optional): Requests that can be sent at once after a
+            quiet period, defaults to one second worth of requests.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst if burst is not None else rate))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._counter = itertools.count()
+
+    def _refill(self, now):
+        if now > self._updated:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def waiting(self):
+        with self._condition:
+            return len(self._waiters)
+
+    def try_acquire(self):
+        """
+        Returns:
+            acquired (Bool): True if a request can be sent now, waiting
+                requests go first.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            if self._waiters or self._tokens < 1 or now < self._updated:
+                return False
+            self._tokens -= 1
+            return True
+
+    def acquire(self, level=PRIORITY_NORMAL, timeout=None):
+        """
+        Wait until a request can be sent.
+
+        Args:
+            level (Int, optional): Lower levels are let through first.
+            timeout (Float, optional): Give up after this many seconds.
+        Returns:
+            waited (Float): Seconds spent waiting, None if it timed out.
+        """
+        start = time.monotonic()
+        with self._condition:
+            ticket = (level, next(self._counter))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    left = None if timeout is None else start + timeout - now
+                    if self._waiters[0] == ticket and self._tokens >= 1 and now >= self._updated:
+                        self._tokens -= 1
+                        return now - start
+                    if left is not None and left <= 0:
+                        return None
+                    if self._waiters[0] != ticket:
+                        self._condition.wait(left)
+                    else:
+                        delay = max(self._updated - now, 0) + max(1 - self._tokens, 0) / self.rate
+                        self._condition.wait(delay if left is None else min(delay, left))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def pause(self, seconds):
+        """
+        Let no request through for seconds, i.e. after a 429 response. Then
+        one request goes first before the rate picks up again.
+        """
+        with self._condition:
+            self._tokens = 1.0
+            self._updated = max(self._updated, time.monotonic() + seconds)
+            self._condition.notify_all()
+
+
+class RateLimiter:
+    """
+    A TokenBucket per endpoint class.
+
+    Args:
+        limits (Dict, optional): (requests per second, burst) keyed by
+            endpoint class, merged over DEFAULT_LIMITS. None turns the
+            limit of a class off.
+    """
+
+    def __init__(self, limits=None):
+        merged = dict(DEFAULT_LIMITS)
+        merged.update(limits or {})
+        self.buckets = dict((_class, TokenBucket(*limit)) for _class, limit in merged.items()
+                            if limit is not None)
+        self._lock = threading.Lock()
+        self._throttled = dict((_class, 0) for _class in merged)
+
+    def acquire(self, _endpoint_class, level=None, timeout=None):
+        """
+        Wait until a request of the endpoint class can be sent.
+
+        Args:
+            _endpoint_class (String): See endpoint_class().
+            level (Int, optional): Defaults to current_priority().
+            timeout (Float, optional): Give up after this many seconds.
+        Returns:
+            waited (Float): Seconds spent waiting, None if it timed out.
+        """
+        bucket = self.buckets.get(_endpoint_class)
+        if bucket is None:
+            return 0.0
+        return bucket.acquire(current_priority(_endpoint_class) if level is None else level, timeout)
+
+    def throttle(self, _endpoint_class, seconds):
+        """
+        The server answered 429, hold back the endpoint class for seconds.
+
+        Returns:
+            paused (Bool): False if the class has no limit, the caller has
+                to wait itself.
+        """
+        with self._lock:
+            self._throttled[_endpoint_class] = self._throttled.get(_endpoint_class, 0) + 1
+        bucket = self.buckets.get(_endpoint_class)
+        if bucket is None:
+            return False
+        bucket.pause(seconds)
+        return True
+
+    def get_stats(self):
+        """
+        Returns:
+            stats (Dict): Per endpoint class, the requests waiting for a token
+                and the 429 responses received.
+        """
+        with self._lock:
+            throttled = dict(self._throttled)
+        return dict((_class, {"waiting": self.buckets[_class].waiting() if _class in self.buckets else 0,
+                              "throttled": count})
+                    for _class, count in throttled.items())
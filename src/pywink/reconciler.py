@@ -0,0 +1,206 @@
+"""
+Desired state reconciliation.
+
+A write only asks a device to change, Z-Wave locks in particular often
+never reach the requested state. The Reconciler keeps the devices whose
+last_reading does not match the requested desired_state yet, refreshes
+just those with an exponential backoff and reports each as pending,
+converged or failed.
+"""
+import logging
+import threading
+import time
+
+from . import events
+from .executor import device_key
+
+_LOGGER = logging.getLogger(__name__)
+
+PENDING = "pending"
+CONVERGED = "converged"
+FAILED = "failed"
+
+# Readings closer than this count as equal, brightness is reported with
+# more precision than it can be set.
+FLOAT_TOLERANCE = 0.01
+
+
+def _matches(desired, current):
+    if isinstance(desired, float) or isinstance(current, float):
+        try:
+            return abs(float(desired) - float(current)) <= FLOAT_TOLERANCE
+        except (TypeError, ValueError):
+            return False
+    return desired == current
+
+
+def mismatched_fields(device, desired_state=None):
+    """
+    Args:
+        device (WinkDevice): The device to check.
+        desired_state (Dict, optional): Defaults to the device's desired_state.
+    Returns:
+        fields (Dict): The desired values that last_reading does not match.
+    """
+    if desired_state is None:
+        desired_state = device.json_state.get("desired_state") or {}
+    last_reading = device.json_state.get("last_reading") or {}
+    return dict((field, value) for field, value in desired_state.items()
+                if value is not None and not _matches(value, last_reading.get(field)))
+
+
+class _Tracked:
+
+    def __init__(self, device, desired_state, now):
+        self.device = device
+        self.desired_state = dict(desired_state)
+        self.attempts = 0
+        self.next_check = now
+
+
+class Reconciler:
+    """
+    Re-checks devices until their last_reading matches their desired state.
+
+    Args:
+        initial_delay (Float, optional): Seconds before the first check.
+        max_delay (Float, optional): Upper bound of the backoff between checks.
+        max_attempts (Int, optional): Refreshes before a device counts as failed.
+    """
+
+    def __init__(self, initial_delay=2.0, max_delay=60.0, max_attempts=6):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._tracked = {}
+        self._status = {}
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """
+        Track every desired_state write and start checking in a thread.
+        """
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="pywink-reconciler")
+            self._thread.daemon = True
+            self._thread.start()
+        events.add_listener(self._on_event)
+
+    def stop(self):
+        events.remove_listener(self._on_event)
+        with self._lock:
+            self._running = False
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join()
+
+    def _on_event(self, event):
+        if event.event == events.STATE_REQUESTED:
+            self.track(event.device, event.fields)
+
+    def track(self, device, desired_state=None):
+        """
+        Start checking the device, merging desired_state into the state it is
+        already being checked for.
+
+        Args:
+            device (WinkDevice): The device.
+            desired_state (Dict, optional): Defaults to the device's desired_state.
+        """
+        if desired_state is None:
+            desired_state = device.json_state.get("desired_state") or {}
+        key = device_key(device)
+        with self._lock:
+            tracked = self._tracked.get(key)
+            if tracked is None:
+                tracked = self._tracked[key] = _Tracked(device, desired_state, time.time() + self.initial_delay)
+            else:
+                tracked.desired_state.update(desired_state)
+                tracked.attempts = 0
+                tracked.next_check = time.time() + self.initial_delay
+            self._status[key] = PENDING
+        self._wakeup.set()
+
+    def track_all(self, devices):
+        """
+        Track the devices whose desired_state does not match their last_reading,
+        i.e. after loading the inventory.
+        """
+        for device in devices:
+            if mismatched_fields(device):
+                self.track(device)
+
+    def status(self, device):
+        """
+        Returns:
+            status (String): PENDING, CONVERGED, FAILED or None if the device
+                was never tracked.
+        """
+        with self._lock:
+            return self._status.get(device_key(device))
+
+    def pending(self):
+        with self._lock:
+            return [tracked.device for tracked in self._tracked.values()]
+
+    def check(self, now=None):
+        """
+        Check the devices that are due.
+
+        Returns:
+            delay (Float): Seconds until the next device is due, None if no
+                device is tracked.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            due = [tracked for tracked in self._tracked.values() if tracked.next_check <= now]
+        for tracked in due:
+            self._check(tracked)
+        with self._lock:
+            if not self._tracked:
+                return None
+            return max(0.0, min(tracked.next_check for tracked in self._tracked.values()) - time.time())
+
+    def _check(self, tracked):
+        device = tracked.device
+        # A pubnub update may have brought the device in line already.
+        if mismatched_fields(device, tracked.desired_state):
+            try:
+                device.update_state()
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error refreshing %s", device.name())
+        mismatched = mismatched_fields(device, tracked.desired_state)
+        key = device_key(device)
+        with self._lock:
+            if self._tracked.get(key) is not tracked:
+                return
+            if not mismatched:
+                del self._tracked[key]
+                self._status[key] = CONVERGED
+                event = events.RECONCILE_CONVERGED
+            else:
+                tracked.attempts += 1
+                if tracked.attempts < self.max_attempts:
+                    tracked.next_check = time.time() + min(self.initial_delay * 2 ** tracked.attempts,
+                                                           self.max_delay)
+                    return
+                del self._tracked[key]
+                self._status[key] = FAILED
+                event = events.RECONCILE_FAILED
+        events.fire(event, device, mismatched)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+            delay = self.check()
+            self._wakeup.wait(delay)
+            self._wakeup.clear()
@@ -0,0 +1,119 @@
+"""
+Latency aware choice between a device's hub and the cloud.
+
+RouteSelector keeps an exponentially weighted moving average (EWMA) of the
+latency and of the error rate of the cloud and of every hub. A command is
+sent over the faster healthy route. The slower route is tried again every
+probe_interval seconds, so it can win back when conditions change. The
+cloud needs no probing, every cloud request updates its averages.
+"""
+import threading
+import time
+
+from .instrumentation import ROUTE_CLOUD, ROUTE_LOCAL
+
+
+class RouteStats:
+    """
+    EWMA latency and error rate of one route.
+    """
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.updated_at = None
+
+    def add(self, seconds, ok, now):
+        self.samples += 1
+        self.updated_at = now
+        self.error_rate += self.alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            # Failures often return fast, they would make a route look quick.
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency += self.alpha * (seconds - self.latency)
+
+    def as_dict(self):
+        return {"latency": self.latency, "error_rate": self.error_rate, "samples": self.samples,
+                "updated_at": self.updated_at}
+
+
+class RouteSelector:
+    """
+    Args:
+        alpha (Float, optional): Weight of a new sample in the averages.
+        max_error_rate (Float, optional): Routes with a higher error rate are
+            unhealthy and only used when the other one is unhealthy too.
+        min_samples (Int, optional): The hub is used until both routes have
+            this many samples.
+        margin (Float, optional): The cloud has to be this many times faster
+            than the hub to be chosen.
+        probe_interval (Float, optional): Seconds after which a route that
+            lost is used once to refresh its averages.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, alpha=0.2, max_error_rate=0.5, min_samples=5, margin=1.2, probe_interval=60):
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.margin = margin
+        self.probe_interval = probe_interval
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, key, seconds, ok=True, now=None):
+        """
+        Args:
+            key (String): ROUTE_CLOUD or the hub_id of a hub.
+            seconds (Float): The request's latency.
+            ok (Bool, optional): False if the request failed.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = RouteStats(self.alpha)
+            stats.add(seconds, ok, now)
+
+    def _healthy(self, stats):
+        return stats.error_rate <= self.max_error_rate and stats.latency is not None
+
+    def _stale(self, stats, now):
+        return now - stats.updated_at >= self.probe_interval
+
+    def choose(self, hub_id, now=None):
+        """
+        Returns:
+            route (String): ROUTE_LOCAL or ROUTE_CLOUD for a request that
+                the hub could serve.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            local = self._routes.get(hub_id)
+            cloud = self._routes.get(ROUTE_CLOUD)
+            if local is None or cloud is None or min(local.samples, cloud.samples) < self.min_samples:
+                return ROUTE_LOCAL
+            local_healthy = self._healthy(local)
+            cloud_healthy = self._healthy(cloud)
+            if local_healthy and cloud_healthy:
+                cloud_wins = cloud.latency * self.margin < local.latency
+            else:
+                cloud_wins = cloud_healthy or (not local_healthy and cloud.error_rate < local.error_rate)
+            if cloud_wins and self._stale(local, now):
+                # Bump the hub's timestamp so only one request probes it.
+                local.updated_at = now
+                return ROUTE_LOCAL
+            return ROUTE_CLOUD if cloud_wins else ROUTE_LOCAL
+
+    def get_stats(self):
+        """
+        Returns:
+            stats (Dict): Latency, error rate, sample count and last update
+                keyed by ROUTE_CLOUD and hub_id.
+        """
+        with self._lock:
+            return dict((key, stats.as_dict()) for key, stats in self._routes.items())
@@ -0,0 +1,268 @@
+"""
+Adaptive polling.
+
+PollingScheduler refreshes devices with update_state() from a thread, each
+at the interval configured for its device type or for the device itself.
+Intervals are jittered so devices don't line up, the refreshes of all
+devices share one request budget, and devices whose state keeps arriving
+through pubnub are polled less often.
+
+One Wink object can back several devices, i.e. the sensors of a sensor
+pod. They are polled with one request and the state is handed to all.
+"""
+import collections
+import heapq
+import logging
+import random
+import threading
+import time
+
+from . import ratelimit
+from .devices import types as device_types
+from .devices.base import SOURCE_POLL, SOURCE_PUBNUB, state_source
+from .executor import device_key, get_executor
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 300
+
+# Seconds between refreshes per object_type.
+DEFAULT_INTERVALS = {
+    device_types.LOCK: 30,
+    device_types.GARAGE_DOOR: 30,
+    device_types.SIREN: 60,
+    device_types.THERMOSTAT: 120,
+    device_types.LIGHT_BULB: 120,
+    device_types.BINARY_SWITCH: 120,
+    device_types.PROPANE_TANK: 6 * 3600,
+    device_types.EGGTRAY: 6 * 3600,
+    device_types.PIGGY_BANK: 6 * 3600,
+    device_types.HUB: 3600,
+    device_types.SCENE: None,
+    device_types.ROBOT: None,
+}
+
+
+def _poll(devices):
+    # Commands go before polls when the rate limiter holds requests back.
+    with ratelimit.priority(ratelimit.PRIORITY_LOW):
+        result = devices[0].update_state()
+    if result is not False:
+        with state_source(SOURCE_POLL):
+            for device in devices[1:]:
+                device.json_state = devices[0].json_state
+    return result
+
+
+class PollingScheduler:
+    """
+    Args:
+        devices (List, optional): Devices to poll, more can be added later.
+        intervals (Dict, optional): Seconds between refreshes keyed by
+            object_type or device class, merged over DEFAULT_INTERVALS.
+            None turns polling off for that type.
+        default_interval (Float, optional): For types without an interval.
+        jitter (Float, optional): Intervals vary randomly by this fraction.
+        budget (Int, optional): Refreshes allowed per minute over all devices.
+        pubnub_slowdown (Float, optional): Interval multiplier for devices
+            that received a pubnub update within their last slowed interval.
+        executor (CommandExecutor, optional): Runs the refreshes, so they
+            are ordered with the device's commands. Defaults to the shared one.
+        seed (Int, optional): Seed of the jitter.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, devices=(), intervals=None, default_interval=DEFAULT_INTERVAL, jitter=0.1,
+                 budget=None, pubnub_slowdown=4.0, executor=None, seed=None):
+        self.intervals = dict(DEFAULT_INTERVALS)
+        self.intervals.update(intervals or {})
+        self.default_interval = default_interval
+        self.jitter = jitter
+        self.budget = budget
+        self.pubnub_slowdown = pubnub_slowdown
+        self.executor = executor
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        # Keyed by (object_type, object_id), the devices of one Wink object
+        # share an entry and a refresh.
+        self._devices = {}
+        self._device_intervals = {}
+        self._polled_at = {}
+        self._pushed_at = {}
+        self._in_flight = set()
+        self._requests = collections.deque()
+        self._queue = []
+        self._due = {}
+        self._thread = None
+        self._running = False
+        for device in devices:
+            self.add(device)
+
+    def interval(self, device):
+        """
+        Returns:
+            interval (Float): Seconds between refreshes of the device before
+                jitter and pubnub slowdown, None if it is not polled.
+        """
+        key = device_key(device)
+        if key in self._device_intervals:
+            return self._device_intervals[key]
+        for cls in type(device).__mro__:
+            if cls in self.intervals:
+                return self.intervals[cls]
+        return self.intervals.get(device.object_type(), self.default_interval)
+
+    def _group_interval(self, devices):
+        # The devices of one object are refreshed together, as often as the most frequent one needs.
+        intervals = [interval for interval in (self.interval(device) for device in devices) if interval is not None]
+        return min(intervals) if intervals else None
+
+    def set_interval(self, device, interval):
+        """
+        Override the interval of one device and the others of its Wink
+        object, None stops polling them.
+        """
+        key = device_key(device)
+        with self._lock:
+            self._device_intervals[key] = interval
+        self._schedule(key, time.time())
+
+    def add(self, device):
+        key = device_key(device)
+        with self._lock:
+            devices = self._devices.setdefault(key, [])
+            if any(other is device for other in devices):
+                return
+            devices.append(device)
+            scheduled = key in self._due
+        interval = self._group_interval(devices)
+        if interval is not None and not scheduled:
+            # Spread the first refreshes over one interval.
+            self._push(key, time.time() + self._random.uniform(0, interval))
+
+    def remove(self, device):
+        key = device_key(device)
+        with self._lock:
+            devices = [other for other in self._devices.get(key, ()) if other is not device]
+            if devices:
+                self._devices[key] = devices
+                return
+            for state in (self._devices, self._due, self._device_intervals, self._polled_at, self._pushed_at):
+                state.pop(key, None)
+
+    def _push(self, key, due):
+        with self._lock:
+            self._due[key] = due
+            heapq.heappush(self._queue, (due, key))
+        self._wakeup.set()
+
+    def _schedule(self, key, base):
+        with self._lock:
+            devices = self._devices.get(key)
+            interval = self._group_interval(devices) if devices else None
+            if interval is None:
+                self._due.pop(key, None)
+                return
+            pushed_at = self._pushed_at.get(key)
+        if devices[0].pubnub_channel is not None and pushed_at is not None \
+                and base - pushed_at < interval * self.pubnub_slowdown:
+            interval *= self.pubnub_slowdown
+        self._push(key, base + interval * self._random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _take_budget(self, now):
+        if self.budget is None:
+            return True
+        while self._requests and self._requests[0] <= now - 60:
+            self._requests.popleft()
+        if len(self._requests) >= self.budget:
+            return False
+        self._requests.append(now)
+        return True
+
+    def poll_due(self, now=None):
+        """
+        Start the refreshes that are due.
+
+        Returns:
+            delay (Float): Seconds until the next refresh is due, None if
+                nothing is scheduled.
+        """
+        now = time.time() if now is None else now
+        while True:
+            with self._lock:
+                if not self._queue:
+                    return None
+                due, key = self._queue[0]
+                if self._due.get(key) != due or key in self._in_flight:
+                    # Rescheduled, removed or already being refreshed.
+                    heapq.heappop(self._queue)
+                    continue
+                if due > now:
+                    return due - now
+                devices = self._devices[key]
+                device = devices[0]
+                polled_at = self._polled_at.get(key)
+                updated_at = getattr(device, "state_updated_at", None)
+                fresh = False
+                if polled_at is not None and updated_at is not None and updated_at > polled_at:
+                    # Something other than polling, usually pubnub, refreshed the device.
+                    if getattr(device, "state_source", SOURCE_PUBNUB) == SOURCE_PUBNUB:
+                        self._pushed_at[key] = updated_at
+                    fresh = now - updated_at < (self._group_interval(devices) or 0) / 2
+                if not fresh:
+                    if not self._take_budget(now):
+                        # Out of budget, everything waits for the window to move on.
+                        return max(0.0, self._requests[0] + 60 - now)
+                    self._in_flight.add(key)
+                heapq.heappop(self._queue)
+                del self._due[key]
+            if fresh:
+                with self._lock:
+                    self._polled_at[key] = updated_at
+                self._schedule(key, updated_at)
+            else:
+                self._start(devices, key, now)
+
+    def _start(self, devices, key, started):
+        executor = self.executor or get_executor()
+        future = executor.submit(devices[0], _poll, devices)
+        future.add_done_callback(lambda future: self._done(devices[0], key, started, future))
+
+    def _done(self, device, key, started, future):
+        if future.exception() is not None:
+            _LOGGER.error("Error polling %s: %s", device.name(), future.exception())
+        now = max(time.time(), started)
+        with self._lock:
+            self._in_flight.discard(key)
+            polled = key in self._devices
+            if polled:
+                self._polled_at[key] = getattr(device, "state_updated_at", now)
+        if polled:
+            self._schedule(key, now)
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="pywink-scheduler")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+            self._wakeup.clear()
+            delay = self.poll_due()
+            self._wakeup.wait(delay)
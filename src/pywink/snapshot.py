@@ -0,0 +1,150 @@
+"""
+Columnar snapshots of many devices.
+
+snapshot() turns devices into one typed column per field, NumPy arrays
+when NumPy is installed and array.array otherwise, so checks over a whole
+fleet are vector operations instead of a getter call per device.
+
+Rows are keyed by (object_type, object_id, capability), the sensors of a
+sensor pod share an object and only differ in their capability.
+
+i.e.
+    fleet = snapshot(get_sensors())
+    low = fleet.select(fleet["battery"] < 0.2)
+"""
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Missing numbers are NaN, missing booleans are -1.
+MISSING_BOOL = -1
+
+
+def _reading(field):
+    def get(device):
+        return (device.json_state.get("last_reading") or {}).get(field)
+    return get
+
+
+def _battery(device):
+    try:
+        return device.battery_level()
+    except (TypeError, ValueError):
+        return None
+
+
+def _available(device):
+    return device.available()
+
+
+def _updated_at(device):
+    return getattr(device, "state_updated_at", None)
+
+
+# (name, typecode, getter), "d" columns are floats and "b" columns booleans.
+COLUMNS = [
+    ("available", "b", _available),
+    ("battery", "d", _battery),
+    ("temperature", "d", _reading("temperature")),
+    ("humidity", "d", _reading("humidity")),
+    ("brightness", "d", _reading("brightness")),
+    ("remaining", "d", _reading("remaining")),
+    ("powered", "b", _reading("powered")),
+    ("locked", "b", _reading("locked")),
+    ("opened", "b", _reading("opened")),
+    ("updated_at", "d", _updated_at),
+]
+
+_NUMPY_TYPES = {"d": "float64", "b": "int8"}
+
+
+def row_key(device):
+    """
+    Returns:
+        key (Tuple): (object_type, object_id, capability) of the device's row,
+            capability is None for devices without one.
+    """
+    capability = getattr(device, "capability", None)
+    return device.object_type(), device.object_id(), capability() if callable(capability) else None
+
+
+def _convert(value, typecode):
+    if typecode == "b":
+        return MISSING_BOOL if value is None else int(bool(value))
+    try:
+        return float("nan") if value is None else float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+class FleetSnapshot:
+    """
+    Columns of device fields, row i of every column belongs to keys[i], the
+    row_key of the device, whose parts are also in object_types[i],
+    object_ids[i] and capabilities[i].
+    """
+
+    def __init__(self, keys, columns):
+        self.keys = keys
+        self.object_types = [key[0] for key in keys]
+        self.object_ids = [key[1] for key in keys]
+        self.capabilities = [key[2] for key in keys]
+        self.columns = columns
+        self._rows = dict((key, row) for row, key in enumerate(keys))
+
+    def __len__(self):
+        return len(self.object_ids)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def row(self, key):
+        """
+        Args:
+            key (Tuple): A row_key, or a device.
+        Returns:
+            row (Dict): Every column's value for the device.
+        """
+        index = self._rows[key if isinstance(key, tuple) else row_key(key)]
+        return dict((name, column[index]) for name, column in self.columns.items())
+
+    def select(self, mask):
+        """
+        Args:
+            mask (Iterable): One truth value per row, i.e. a NumPy comparison.
+        Returns:
+            keys (List): The keys of the rows where mask is true.
+        """
+        return [key for key, selected in zip(self.keys, mask) if selected]
+
+
+def snapshot(devices, columns=None, use_numpy=True):
+    """
+    Args:
+        devices (List): WinkDevice objects.
+        columns (List, optional): Names of the COLUMNS to export, all by default.
+        use_numpy (Bool, optional): Return NumPy arrays if NumPy is installed.
+    Returns:
+        snapshot (FleetSnapshot): The devices' current state in columns.
+    """
+    specs = [spec for spec in COLUMNS if columns is None or spec[0] in columns]
+    keys = []
+    rows = set()
+    data = dict((name, array(typecode)) for name, typecode, _ in specs)
+    for device in devices:
+        key = row_key(device)
+        if key in rows:
+            # The same device twice, i.e. from overlapping device lists.
+            continue
+        rows.add(key)
+        keys.append(key)
+        for name, typecode, getter in specs:
+            data[name].append(_convert(getter(device), typecode))
+    if use_numpy and numpy is not None:
+        data = dict((name, numpy.frombuffer(column, dtype=_NUMPY_TYPES[column.typecode]) if len(column)
+                     else numpy.zeros(0, dtype=_NUMPY_TYPES[column.typecode]))
+                    for name, column in data.items())
+    return FleetSnapshot(keys, data)
@@ -0,0 +1,138 @@
+"""
+Incremental parsing of the inventory payload.
+
+The inventory of a large account is a big JSON object whose "data" member
+holds one item per device. parse reads the body chunk by chunk and decodes
+the items of that array one at a time, handing each to a callback as soon
+as it is complete. Only the current chunk and the item being decoded are
+held as text, never the whole body.
+"""
+import codecs
+import json
+
+# Sent with inventory requests, requests decompresses both on the fly.
+ACCEPT_ENCODING = "gzip, deflate"
+CHUNK_SIZE = 16384
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}"
+_DECODER = json.JSONDecoder()
+
+
+class _Scanner:
+    """
+    Pulls JSON tokens and values out of text that arrives in pieces.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+        self.size = 0
+
+    def _more(self):
+        if self._eof:
+            raise ValueError("Unexpected end of JSON document")
+        # Drop what has been consumed before growing the buffer.
+        self._buffer = self._buffer[self._pos:]
+        self._pos = 0
+        for chunk in self._chunks:
+            if chunk:
+                self.size += len(chunk)
+                self._buffer += self._decoder.decode(chunk)
+                return
+        self._buffer += self._decoder.decode(b"", final=True)
+        self._eof = True
+
+    def peek(self):
+        """
+        Returns:
+            char (String): The next character that isn't whitespace, "" at
+                the end of the document.
+        """
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer) or self._eof:
+                return self._buffer[self._pos:self._pos + 1]
+            self._more()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected {!r} in JSON document".format(char))
+        self._pos += 1
+
+    def accept(self, char):
+        if self.peek() == char:
+            self._pos += 1
+            return True
+        return False
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except ValueError:
+                if self._eof:
+                    raise
+            else:
+                # A number may go on in the next chunk, "1" of "1.5" decodes on its own.
+                number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if self._eof or (end < len(self._buffer) and (not number or self._buffer[end] in _DELIMITERS)):
+                    self._pos = end
+                    return value
+            self._more()
+
+
+def parse(chunks, on_item=None, key="data"):
+    """
+    Args:
+        chunks (Iterable): The body as bytes, in UTF-8, in any number of
+            pieces, e.g. response.iter_content().
+        on_item (Callable, optional): Called with every item of the key
+            array while it is parsed.
+        key (String, optional): The top-level member holding the items.
+    Returns:
+        (document, size): The parsed object, the same as json.loads of the
+            whole body, and the number of bytes read.
+    Raises:
+        ValueError: When the body isn't a valid JSON object.
+    """
+    scanner = _Scanner(chunks)
+    document = {}
+    scanner.expect("{")
+    if not scanner.accept("}"):
+        while True:
+            name = scanner.value()
+            if not isinstance(name, str):
+                raise ValueError("Expected a member name in JSON document")
+            scanner.expect(":")
+            if name == key and scanner.peek() == "[":
+                document[name] = _parse_items(scanner, on_item)
+            else:
+                document[name] = scanner.value()
+            if not scanner.accept(","):
+                break
+        scanner.expect("}")
+    if scanner.peek():
+        raise ValueError("Extra data after JSON document")
+    return document, scanner.size
+
+
+def _parse_items(scanner, on_item):
+    items = []
+    scanner.expect("[")
+    if scanner.accept("]"):
+        return items
+    while True:
+        item = scanner.value()
+        items.append(item)
+        if on_item is not None:
+            on_item(item)
+        if not scanner.accept(","):
+            break
+    scanner.expect("]")
+    return items
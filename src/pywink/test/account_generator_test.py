@@ -0,0 +1,69 @@
+import unittest
+
+from .. import api
+from ..api import get_all_devices, get_hubs, get_light_bulbs, get_devices_from_response_dict
+from ..devices import types as device_types
+from ..testing import AccountGenerator, FakeWinkServer, generate_account
+
+
+class AccountGeneratorTests(unittest.TestCase):
+
+    def test_account_size(self):
+        account = generate_account(250, hub_count=4)
+        hubs = [item for item in account["wink_devices"] if item["object_type"] == device_types.HUB]
+        self.assertEqual(len(hubs), 4)
+        self.assertEqual(len(account["wink_devices"]), 254)
+        self.assertEqual(len(account["groups"]), 5)
+
+    def test_ids_are_unique(self):
+        account = generate_account(500)
+        object_ids = [item["object_id"] for item in account["wink_devices"]]
+        self.assertEqual(len(object_ids), len(set(object_ids)))
+        local_ids = [(item["hub_id"], item["local_id"].split(".")[0]) for item in account["wink_devices"]
+                     if item.get("local_id") is not None]
+        self.assertEqual(len(local_ids), len(set(local_ids)))
+        channels = [item["subscription"]["pubnub"]["channel"] for item in account["wink_devices"]
+                    if item.get("subscription")]
+        self.assertEqual(len(channels), len(set(channels)))
+
+    def test_hub_ids_point_at_generated_hubs(self):
+        account = generate_account(300, hub_count=3)
+        hub_ids = set(item["object_id"] for item in account["wink_devices"]
+                      if item["object_type"] == device_types.HUB)
+        for item in account["wink_devices"]:
+            if item.get("local_id") is not None:
+                self.assertIn(item["hub_id"], hub_ids)
+
+    def test_device_mix(self):
+        account = generate_account(100, mix={device_types.LOCK: 1})
+        object_types = set(item["object_type"] for item in account["wink_devices"])
+        self.assertEqual(object_types, {device_types.LOCK, device_types.HUB})
+
+    def test_unknown_device_type_in_mix(self):
+        with self.assertRaises(ValueError):
+            generate_account(10, mix={"toaster": 1})
+
+    def test_same_seed_same_account(self):
+        self.assertEqual(generate_account(50, seed=7), generate_account(50, seed=7))
+        self.assertNotEqual(generate_account(50, seed=7), generate_account(50, seed=8))
+
+    def test_generated_devices_build(self):
+        account = AccountGenerator(seed=1).generate(400)
+        devices = get_devices_from_response_dict({"data": account["wink_devices"]},
+                                                 device_types.ALL_SUPPORTED_DEVICES)
+        self.assertGreaterEqual(len(devices), 400)
+
+    def test_fake_server_serves_generated_account(self):
+        allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = True
+        account = generate_account(200, hub_count=2, mix={device_types.LIGHT_BULB: 1})
+        with FakeWinkServer(account) as fake:
+            try:
+                get_all_devices()
+                self.assertEqual(len(get_hubs()), 2)
+                bulb = get_light_bulbs()[0]
+                bulb.set_state(True, 0.5)
+                self.assertEqual(bulb.brightness(), 0.5)
+                self.assertEqual(fake.request_counts[("hub", "PUT", 200)], 1)
+            finally:
+                api.ALLOW_LOCAL_CONTROL = allow_local_control
@@ -10,6 +10,7 @@ from unittest.mock import MagicMock, Mock
 from requests import *
 
 from ..api import *
+from .. import api
 from ..devices.sensor import WinkSensor
 from ..devices.hub import WinkHub
 from ..devices.piggy_bank import WinkPorkfolioBalanceSensor, WinkPorkfolioNose
@@ -310,30 +311,44 @@ class ApiTests(unittest.TestCase):
         devices[0].set_state(True)
         mock_api_object.local_set_state.assert_called_with(devices[0], Any(str))
 
-    def test_local_control_get_state_is_not_being_called(self):
-        mock_api_object = Mock()
-        mock_api_object.local_get_state = MagicMock()
-        mock_api_object.get_device_state = MagicMock()
+    def test_local_control_hub_is_not_used_for_cloud_only_devices(self):
         devices = get_piggy_banks()
-        devices[0].api_interface = mock_api_object
-        devices[0].update_state()
-        mock_api_object.get_device_state.assert_called_with(devices[0])
-
-    def test_local_control_set_state_is_not_being_called(self):
+        self.assertIsNone(WinkApiInterface.local_control_hub(devices[0]))
 
-        def Any(cls):
-            class Any(cls):
-                def __eq__(self, other):
-                    return True
-            return Any()
-
-        mock_api_object = Mock()
-        mock_api_object.local_set_state = MagicMock()
-        mock_api_object.set_device_state = MagicMock()
-        devices = get_thermostats()
-        devices[0].api_interface = mock_api_object
-        devices[0].set_operation_mode("auto")
-        mock_api_object.set_device_state.assert_called_with(devices[0], Any(str))
+    def test_local_control_hub_is_used_for_thermostats(self):
+        thermostat = None
+        for device in get_thermostats():
+            if device.local_id() is not None:
+                thermostat = device
+        allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.HUBS[thermostat.hub_id()] = {"ip": "127.0.0.1", "token": "TOKEN", "id": "1"}
+        api.ALLOW_LOCAL_CONTROL = True
+        try:
+            values = {"desired_state": {"mode": "auto"}}
+            self.assertEqual(WinkApiInterface.local_control_hub(thermostat, values)["token"], "TOKEN")
+            self.assertEqual(WinkApiInterface.local_control_hub(thermostat)["token"], "TOKEN")
+            # Renaming is only supported by the online API
+            self.assertIsNone(WinkApiInterface.local_control_hub(thermostat, {"name": "TEST"}))
+            api.ALLOW_LOCAL_CONTROL = False
+            self.assertIsNone(WinkApiInterface.local_control_hub(thermostat, values))
+        finally:
+            api.HUBS.clear()
+            api.ALLOW_LOCAL_CONTROL = allow_local_control
+
+    def test_local_control_hub_is_not_used_for_extended_lock_features(self):
+        lock = None
+        for device in get_locks():
+            if device.local_id() is not None:
+                lock = device
+        allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.HUBS[lock.hub_id()] = {"ip": "127.0.0.1", "token": "TOKEN", "id": "1"}
+        api.ALLOW_LOCAL_CONTROL = True
+        try:
+            self.assertIsNotNone(WinkApiInterface.local_control_hub(lock, {"desired_state": {"locked": True}}))
+            self.assertIsNone(WinkApiInterface.local_control_hub(lock, {"desired_state": {"beeper_enabled": True}}))
+        finally:
+            api.HUBS.clear()
+            api.ALLOW_LOCAL_CONTROL = allow_local_control
 
     def test_get_shade_updated_states_from_api(self):
         WinkApiInterface.BASE_URL = "http://localhost:" + str(self.port)
@@ -0,0 +1,36 @@
+import unittest
+
+from ..testing import benchmark
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_run_reports_time_and_memory(self):
+        results = benchmark.run(sizes=[10], repeat=1)
+        names = [result["name"] for result in results]
+        self.assertEqual(len(names), len(benchmark.benchmarks()))
+        self.assertIn("get_devices_from_response_dict", names)
+        self.assertIn("build_device[light_bulb]", names)
+        self.assertIn("pubnub_update", names)
+        self.assertIn("merge_local_state", names)
+        for result in results:
+            self.assertEqual(result["size"], 10)
+            self.assertGreaterEqual(result["seconds"], 0)
+            self.assertGreaterEqual(result["peak_bytes"], 0)
+
+    def test_select(self):
+        results = benchmark.run(sizes=[10], repeat=1, select="get_locks")
+        self.assertEqual([result["name"] for result in results], ["get_locks"])
+
+    def test_repeated_parses_are_stable(self):
+        context = benchmark.BenchmarkContext(50)
+        parse, _ = benchmark.benchmarks()[0][1](context)
+        parse()
+        parse()
+        self.assertEqual(len(benchmark.api.get_devices_from_response_dict(context.response, "sensor_pod")),
+                         len([device for device in context.devices if device.object_type() == "sensor_pod"]))
+
+    def test_compare_finds_regressions(self):
+        baseline = [{"name": "a", "size": 10, "seconds": 1.0}, {"name": "b", "size": 10, "seconds": 1.0}]
+        results = [{"name": "a", "size": 10, "seconds": 1.1}, {"name": "b", "size": 10, "seconds": 2.0}]
+        self.assertEqual(benchmark.compare(results, baseline), [("b", 10, 2.0)])
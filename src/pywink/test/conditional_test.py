@@ -0,0 +1,92 @@
+import unittest
+
+from .. import api
+from ..api import get_all_devices, wink_api_fetch
+from ..conditional import ResponseCache
+from ..testing import FakeWinkServer, generate_account
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def test_validators(self):
+        cache = ResponseCache()
+        self.assertEqual(cache.request_headers("a"), {})
+        self.assertTrue(cache.store("a", {"ETag": '"1"', "Last-Modified": "yesterday"}, {"data": 1}, 10))
+        self.assertEqual(cache.request_headers("a"), {"If-None-Match": '"1"', "If-Modified-Since": "yesterday"})
+        self.assertEqual(cache.get("a").body, {"data": 1})
+        # A response without validators replaces the cached one.
+        self.assertFalse(cache.store("a", {}, {"data": 2}, 10))
+        self.assertIsNone(cache.get("a"))
+
+    def test_least_recently_used_is_dropped(self):
+        cache = ResponseCache(max_entries=2)
+        cache.store("a", {"ETag": '"a"'}, "a", 1)
+        cache.store("b", {"ETag": '"b"'}, "b", 1)
+        cache.get("a")
+        cache.store("c", {"ETag": '"c"'}, "c", 1)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_stats(self):
+        cache = ResponseCache()
+        self.assertIsNone(cache.get_stats()["total"]["hit_rate"])
+        cache.record("wink_devices", False)
+        cache.record("wink_devices", True, 100)
+        cache.record("object", True, 10)
+        stats = cache.get_stats()
+        self.assertEqual(stats["end_points"]["wink_devices"]["hit_rate"], 0.5)
+        self.assertEqual(stats["total"], {"requests": 3, "hits": 2, "bytes_saved": 110, "hit_rate": 2 / 3})
+
+
+class ConditionalRequestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeWinkServer(generate_account(10, hub_count=1)).start()
+        self.fake.install()
+        api.enable_conditional_requests()
+
+    def tearDown(self):
+        api.disable_conditional_requests()
+        self.fake.uninstall()
+        self.fake.stop()
+
+    def test_unchanged_inventory_is_not_downloaded_again(self):
+        first = wink_api_fetch()
+        second = wink_api_fetch()
+        self.assertEqual(second, first)
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 304)], 1)
+        stats = api.get_cache_stats()["end_points"]["wink_devices"]
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertGreater(stats["bytes_saved"], 0)
+
+    def test_changed_object_is_downloaded(self):
+        device = get_all_devices()[0]
+        device.api_interface.get_device_state(device)
+        self.assertEqual(device.api_interface.get_device_state(device)["data"]["name"], device.name())
+        self.fake.get_object(device.object_type(), device.object_id())["name"] = "Renamed"
+        response = device.api_interface.get_device_state(device)
+        self.assertEqual(response["data"]["name"], "Renamed")
+        stats = api.get_cache_stats()["end_points"]["object"]
+        self.assertEqual((stats["requests"], stats["hits"]), (3, 1))
+
+    def test_changed_devices_leave_the_cached_body_alone(self):
+        device = get_all_devices()[0]
+        served = dict(device.json_state)
+        device.json_state["name"] = "Changed"
+        device.json_state.setdefault("last_reading", {})["connection"] = False
+        refetched = wink_api_fetch()["data"]
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 304)], 1)
+        item = next(item for item in refetched if item["object_id"] == device.object_id()
+                    and item.get("object_type") == device.object_type())
+        self.assertEqual(item["name"], served["name"])
+        self.assertEqual(item.get("last_reading"), self.fake.get_object(device.object_type(),
+                                                                         device.object_id()).get("last_reading"))
+        self.assertIsNot(wink_api_fetch(), wink_api_fetch())
+
+    def test_disabled(self):
+        api.disable_conditional_requests()
+        wink_api_fetch()
+        wink_api_fetch()
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 304)], 0)
+        self.assertIsNone(api.get_cache_stats())
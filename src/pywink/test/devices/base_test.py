@@ -6,6 +6,7 @@ from unittest.mock import MagicMock
 
 from ...api import get_devices_from_response_dict
 from ...devices import types as device_types
+from ...devices.base import SOURCE_INVENTORY, SOURCE_PUBNUB
 from ...devices.key import WinkKey
 from ...devices.powerstrip import WinkPowerStripOutlet, WinkPowerStrip
 from ...devices.piggy_bank import WinkPorkfolioBalanceSensor, WinkPorkfolioNose
@@ -161,3 +162,33 @@ class BaseTests(unittest.TestCase):
                 self.assertIsNone(device.model_name())
             else:
                 self.assertIsNotNone(device.model_name())
+
+    def test_all_devices_record_state_source(self):
+        devices = get_devices_from_response_dict(self.response_dict, device_types.ALL_SUPPORTED_DEVICES)
+        for device in devices:
+            self.assertEqual(device.state_source, SOURCE_INVENTORY)
+            self.assertLess(device.state_age(), 60)
+
+    def test_update_state_with_max_age(self):
+        devices = get_devices_from_response_dict(self.response_dict, device_types.ALL_SUPPORTED_DEVICES)
+        for device in devices:
+            if type(device) in [WinkPowerStripOutlet, WinkCloudClockDial, WinkCloudClockAlarm]:
+                continue
+            device.api_interface = MagicMock()
+            device.api_interface.local_get_state.return_value = {"data": dict(device.json_state)}
+            device.api_interface.get_device_state.return_value = {"data": dict(device.json_state)}
+            device.update_state(max_age=60)
+            device.api_interface.local_get_state.assert_not_called()
+            device.api_interface.get_device_state.assert_not_called()
+            device.state_updated_at -= 120
+            device.update_state(max_age=60)
+            self.assertEqual(device.api_interface.local_get_state.call_count +
+                             device.api_interface.get_device_state.call_count, 1)
+
+    def test_pubnub_update_records_source(self):
+        devices = get_devices_from_response_dict(self.response_dict, device_types.ALL_SUPPORTED_DEVICES)
+        for device in devices:
+            if type(device) in [WinkPowerStripOutlet, WinkCloudClockDial, WinkCloudClockAlarm]:
+                continue
+            device.pubnub_update(dict(device.json_state))
+            self.assertEqual(device.state_source, SOURCE_PUBNUB)
@@ -27,6 +27,26 @@ class LightBulbTests(unittest.TestCase):
         bulb = get_devices_from_response_dict(response_dict, device_types.LIGHT_BULB)[0]
         self.assertEqual(bulb.brightness(), 0.02)
 
+    def test_bulb_transaction_sends_one_request(self):
+        device_list = []
+        response_dict = {}
+        _json_file = open('{}/api_responses/lightify_rgbw_bulb.json'.format(os.path.dirname(__file__)))
+        device_list.append(json.load(_json_file))
+        _json_file.close()
+        response_dict["data"] = device_list
+        bulb = get_devices_from_response_dict(response_dict, device_types.LIGHT_BULB)[0]
+        self.api_interface.local_set_state.return_value = {}
+        bulb.api_interface = self.api_interface
+        with bulb.transaction():
+            bulb.set_state(True)
+            bulb.set_state(True, brightness=0.5)
+            with bulb.transaction():
+                bulb.set_state(True, brightness=0.75)
+            self.api_interface.local_set_state.assert_not_called()
+        self.api_interface.local_set_state.assert_called_once_with(bulb, {
+            "desired_state": {"powered": True, "brightness": 0.75}})
+        self.assertIs(bulb.api_interface, self.api_interface)
+
     def test_bulb_hsb_color(self):
         device_list = []
         response_dict = {}
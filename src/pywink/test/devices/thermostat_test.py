@@ -1,5 +1,6 @@
 import json
 import os
+import threading
 import unittest
 
 from unittest.mock import MagicMock
@@ -342,3 +343,59 @@ class ThermostatTests(unittest.TestCase):
         response_dict["data"] = device_list
         thermostat = get_devices_from_response_dict(response_dict, device_types.THERMOSTAT)[0]
         self.assertFalse(thermostat.cool_on())
+
+    def test_thermostat_transaction_sends_one_request(self):
+        device_list = []
+        response_dict = {}
+        _json_file = open('{}/api_responses/sensi_thermostat.json'.format(os.path.dirname(__file__)))
+        device_list.append(json.load(_json_file))
+        _json_file.close()
+        response_dict["data"] = device_list
+        thermostat = get_devices_from_response_dict(response_dict, device_types.THERMOSTAT)[0]
+        thermostat.api_interface = self.api_interface
+        with thermostat.transaction():
+            thermostat.set_operation_mode("heat_only")
+            thermostat.set_temperature(min_set_point=20.0)
+            thermostat.set_fan_mode("auto")
+            self.api_interface.local_set_state.assert_not_called()
+        self.api_interface.local_set_state.assert_called_once_with(thermostat, {
+            "desired_state": {"powered": True, "mode": "heat_only", "min_set_point": 20.0, "fan_mode": "auto"}})
+        self.assertIs(thermostat.api_interface, self.api_interface)
+
+    def test_thermostat_transaction_is_not_sent_on_error(self):
+        device_list = []
+        response_dict = {}
+        _json_file = open('{}/api_responses/sensi_thermostat.json'.format(os.path.dirname(__file__)))
+        device_list.append(json.load(_json_file))
+        _json_file.close()
+        response_dict["data"] = device_list
+        thermostat = get_devices_from_response_dict(response_dict, device_types.THERMOSTAT)[0]
+        thermostat.api_interface = self.api_interface
+        with self.assertRaises(ValueError):
+            with thermostat.transaction():
+                thermostat.set_operation_mode("heat_only")
+                raise ValueError()
+        self.api_interface.local_set_state.assert_not_called()
+
+    def test_thermostat_transaction_ignores_other_threads(self):
+        device_list = []
+        response_dict = {}
+        _json_file = open('{}/api_responses/sensi_thermostat.json'.format(os.path.dirname(__file__)))
+        device_list.append(json.load(_json_file))
+        _json_file.close()
+        response_dict["data"] = device_list
+        thermostat = get_devices_from_response_dict(response_dict, device_types.THERMOSTAT)[0]
+        self.api_interface.local_set_state.return_value = {}
+        thermostat.api_interface = self.api_interface
+        with thermostat.transaction():
+            thermostat.set_operation_mode("heat_only")
+            other = threading.Thread(target=thermostat.set_fan_mode, args=("on",))
+            other.start()
+            other.join()
+            # The other thread's write is sent at once and not merged.
+            self.api_interface.local_set_state.assert_called_once_with(thermostat, {
+                "desired_state": {"fan_mode": "on"}})
+            thermostat.set_temperature(min_set_point=20.0)
+        self.assertEqual(self.api_interface.local_set_state.call_count, 2)
+        self.api_interface.local_set_state.assert_called_with(thermostat, {
+            "desired_state": {"powered": True, "mode": "heat_only", "min_set_point": 20.0}})
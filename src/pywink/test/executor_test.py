@@ -0,0 +1,230 @@
+import threading
+import time
+import unittest
+
+from .. import api, optimistic
+from ..api import get_hubs, get_light_bulbs
+from ..devices import types as device_types
+from ..executor import CLOUD_LANE, CommandExecutor, LaneExecutor, StateCoalescer, hub_lane
+from ..testing import FakeWinkServer, generate_account
+
+
+class _ApiInterface:
+
+    @staticmethod
+    def local_control_hub(device, state=None, select_route=True):
+        return {"token": "token"} if device.hub_id() is not None and device.local_id() is not None else None
+
+
+class _Device:
+
+    def __init__(self, object_id, hub_id=None, local_id=None):
+        self.obj_id = object_id
+        self.hub = hub_id
+        self.local = local_id
+        self.api_interface = _ApiInterface()
+
+    def object_id(self):
+        return self.obj_id
+
+    def hub_id(self):
+        return self.hub
+
+    def local_id(self):
+        return self.local
+
+    @staticmethod
+    def object_type():
+        return "light_bulb"
+
+
+class CommandExecutorTests(unittest.TestCase):
+
+    def setUp(self):
+        super(CommandExecutorTests, self).setUp()
+        self.executor = CommandExecutor(workers=4)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        super(CommandExecutorTests, self).tearDown()
+
+    def test_commands_for_one_device_run_in_order(self):
+        device = _Device("1")
+        calls = []
+
+        def command(value):
+            time.sleep(0.001 * (10 - value))
+            calls.append(value)
+            return value
+        futures = [self.executor.submit(device, command, value) for value in range(10)]
+        self.assertEqual([future.result(5) for future in futures], list(range(10)))
+        self.assertEqual(calls, list(range(10)))
+
+    def test_devices_run_in_parallel(self):
+        first = _Device("1")
+        second = [_Device(str(object_id)) for object_id in range(2, 50)
+                  if hash(("light_bulb", str(object_id))) % 4 != hash(("light_bulb", "1")) % 4][0]
+        release = threading.Event()
+        blocked = self.executor.submit(first, release.wait, 5)
+        self.assertEqual(self.executor.submit(second, lambda: "done").result(5), "done")
+        self.assertFalse(blocked.done())
+        release.set()
+        self.assertTrue(blocked.result(5))
+
+    def test_exceptions_are_set_on_the_future(self):
+        def command():
+            raise ValueError("failed")
+        future = self.executor.submit(_Device("1"), command)
+        with self.assertRaises(ValueError):
+            future.result(5)
+        self.assertEqual(self.executor.submit(_Device("1"), lambda: 1).result(5), 1)
+
+    def test_submit_after_shutdown(self):
+        self.executor.shutdown()
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(_Device("1"), lambda: 1)
+
+
+class LaneExecutorTests(unittest.TestCase):
+
+    def setUp(self):
+        super(LaneExecutorTests, self).setUp()
+        self.executor = LaneExecutor(lane_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+        super(LaneExecutorTests, self).tearDown()
+
+    def test_lanes(self):
+        self.assertEqual(hub_lane(_Device("1", hub_id="10", local_id="3")), "10")
+        self.assertEqual(hub_lane(_Device("1", hub_id="10")), CLOUD_LANE)
+        self.assertEqual(hub_lane(_Device("1")), CLOUD_LANE)
+
+    def test_lanes_follow_local_control(self):
+        allow_local_control = api.ALLOW_LOCAL_CONTROL
+        try:
+            with FakeWinkServer(generate_account(10, hub_count=1, mix={device_types.LIGHT_BULB: 1})):
+                api.ALLOW_LOCAL_CONTROL = True
+                bulb = get_light_bulbs()[0]
+                # No hub token yet, commands go to the cloud.
+                self.assertEqual(hub_lane(bulb), CLOUD_LANE)
+                get_hubs()
+                self.assertEqual(hub_lane(bulb), bulb.hub_id())
+                api.ALLOW_LOCAL_CONTROL = False
+                self.assertEqual(hub_lane(bulb), CLOUD_LANE)
+        finally:
+            api.ALLOW_LOCAL_CONTROL = allow_local_control
+
+    def test_stalled_hub_does_not_block_other_hubs(self):
+        release = threading.Event()
+        stalled = [self.executor.submit(_Device(str(object_id), "10", str(object_id)), release.wait, 5)
+                   for object_id in range(10)]
+        other_hub = _Device("100", "20", "1")
+        self.assertEqual(self.executor.submit(other_hub, lambda: "done").result(5), "done")
+        self.assertEqual(self.executor.submit(_Device("200"), lambda: "cloud").result(5), "cloud")
+        # The stalled hub never runs more than lane_workers commands at a time.
+        self.assertGreaterEqual(self.executor.pending()["10"], 8)
+        release.set()
+        self.assertTrue(all(future.result(5) for future in stalled))
+
+
+class StateCoalescerTests(unittest.TestCase):
+
+    def test_writes_within_the_window_are_merged(self):
+        sent = []
+        sending = threading.Event()
+        release = threading.Event()
+
+        def send(device, state):
+            sent.append(state)
+            sending.set()
+            release.wait(5)
+            return {"data": state}
+        coalescer = StateCoalescer()
+        device = _Device("1")
+        futures = [coalescer.submit(device, {"desired_state": {"brightness": 0.0}}, send, 0.1)]
+        sending.wait(5)
+        futures.extend(coalescer.submit(device, {"desired_state": {"brightness": value / 10.0}}, send, 0.1)
+                       for value in range(1, 10))
+        futures.append(coalescer.submit(device, {"desired_state": {"powered": True}}, send, 0.1))
+        release.set()
+        results = [future.result(5) for future in futures]
+        # The first write is sent at once, the rest are merged behind it.
+        self.assertEqual(sent, [{"desired_state": {"brightness": 0.0}},
+                                {"desired_state": {"brightness": 0.9, "powered": True}}])
+        self.assertTrue(all(result is results[1] for result in results[1:]))
+
+    def test_blocking_write_is_sent_at_once(self):
+        sent = []
+
+        def send(device, state):
+            sent.append((threading.current_thread(), state["desired_state"]))
+        coalescer = StateCoalescer()
+        start = time.time()
+        for value in range(3):
+            coalescer.submit(_Device("1"), {"desired_state": {"brightness": value}}, send, 1, blocking=True).result(5)
+        self.assertLess(time.time() - start, 0.5)
+        self.assertEqual(sent, [(threading.current_thread(), {"brightness": value}) for value in range(3)])
+
+    def test_devices_are_not_merged(self):
+        sent = []
+
+        def send(device, state):
+            sent.append((device.object_id(), state["desired_state"]))
+        coalescer = StateCoalescer()
+        first = coalescer.submit(_Device("1"), {"desired_state": {"powered": True}}, send, 0.05)
+        second = coalescer.submit(_Device("2"), {"desired_state": {"powered": False}}, send, 0.05)
+        first.result(5)
+        second.result(5)
+        self.assertEqual(sorted(sent), [("1", {"powered": True}), ("2", {"powered": False})])
+
+    def test_setter_calls_are_coalesced(self):
+        allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = False
+        api.set_coalescing_window(0.2, "light_bulb")
+        try:
+            with FakeWinkServer(seed=0) as fake:
+                bulb = get_light_bulbs()[0]
+                threads = [threading.Thread(target=bulb.set_state, args=(True, value / 10.0))
+                           for value in range(1, 6)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertLess(fake.request_counts[("cloud", "PUT", 200)], 5)
+                self.assertTrue(bulb.state())
+        finally:
+            api.set_coalescing_window(None, "light_bulb")
+            api.ALLOW_LOCAL_CONTROL = allow_local_control
+
+    def test_setter_calls_from_one_thread(self):
+        allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = False
+        api.set_coalescing_window(0.5, "light_bulb")
+        try:
+            with FakeWinkServer(seed=0) as fake:
+                bulb = get_light_bulbs()[0]
+                puts = fake.request_counts[("cloud", "PUT", 200)]
+                start = time.time()
+                for value in range(1, 6):
+                    bulb.set_state(True, value / 10.0)
+                # Every call is answered without waiting for the window.
+                self.assertLess(time.time() - start, 0.5)
+                self.assertEqual(fake.request_counts[("cloud", "PUT", 200)] - puts, 5)
+                self.assertEqual(bulb.brightness(), 0.5)
+                self.assertEqual(fake.get_object("light_bulb", bulb.object_id())["desired_state"]["brightness"], 0.5)
+                api.enable_optimistic_state()
+                try:
+                    puts = fake.request_counts[("cloud", "PUT", 200)]
+                    for value in range(1, 6):
+                        bulb.set_state(True, value / 100.0)
+                    optimistic.wait_for_confirmations(5)
+                finally:
+                    api.disable_optimistic_state()
+                # Without blocking the writes overlap, at most the first is sent on its own.
+                self.assertLessEqual(fake.request_counts[("cloud", "PUT", 200)] - puts, 2)
+                self.assertEqual(bulb.brightness(), 0.05)
+                self.assertEqual(fake.get_object("light_bulb", bulb.object_id())["desired_state"]["brightness"], 0.05)
+        finally:
+            api.set_coalescing_window(None, "light_bulb")
+            api.ALLOW_LOCAL_CONTROL = allow_local_control
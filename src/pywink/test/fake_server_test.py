@@ -0,0 +1,61 @@
+import unittest
+
+from .. import api
+from ..api import get_all_devices, get_hubs, get_light_bulbs, get_locks, get_scenes, get_light_groups
+from ..testing import FakeWinkServer
+
+
+class FakeWinkServerTests(unittest.TestCase):
+
+    def setUp(self):
+        super(FakeWinkServerTests, self).setUp()
+        self.allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = True
+        self.fake = FakeWinkServer(seed=0)
+        self.fake.start()
+        self.fake.install()
+
+    def tearDown(self):
+        self.fake.uninstall()
+        self.fake.stop()
+        api.ALLOW_LOCAL_CONTROL = self.allow_local_control
+        super(FakeWinkServerTests, self).tearDown()
+
+    def test_serves_fixture_inventory(self):
+        self.assertEqual(len(get_all_devices()), 83)
+        self.assertEqual(len(get_scenes()), 1)
+        self.assertEqual(len(get_light_groups()), 1)
+
+    def test_cloud_writes_are_reflected_in_reads(self):
+        lock = get_locks()[0]
+        lock.set_alarm_mode("alert")
+        self.assertEqual(lock.alarm_mode(), "alert")
+        self.assertEqual(self.fake.get_object("lock", lock.object_id())["last_reading"]["alarm_mode"], "alert")
+
+    def test_local_control_uses_hub(self):
+        get_hubs()
+        bulb = [bulb for bulb in get_light_bulbs() if bulb.hub_id() in api.HUBS][0]
+        bulb.set_state(True, 0.25)
+        bulb.update_state()
+        self.assertEqual(bulb.brightness(), 0.25)
+        self.assertEqual(self.fake.request_counts[("hub", "PUT", 200)], 1)
+        self.assertEqual(self.fake.request_counts[("hub", "GET", 200)], 1)
+
+    def test_offline_hub_falls_back_to_cloud(self):
+        get_hubs()
+        bulb = [bulb for bulb in get_light_bulbs() if bulb.hub_id() in api.HUBS][0]
+        self.fake.set_hub_online(bulb.hub_id(), False)
+        bulb.set_state(False)
+        self.assertFalse(bulb.state())
+        self.assertEqual(self.fake.request_counts[("hub", "PUT", None)], 1)
+        self.assertEqual(self.fake.request_counts[("cloud", "PUT", 200)], 1)
+
+    def test_expired_token_is_refreshed(self):
+        self.fake.expire_tokens()
+        self.assertEqual(len(get_all_devices()), 83)
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 401)], 1)
+
+    def test_injected_errors(self):
+        self.fake.error_rate = 1.0
+        with self.assertRaises(api.WinkAPIException):
+            get_all_devices()
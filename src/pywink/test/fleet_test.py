@@ -0,0 +1,157 @@
+import time
+import unittest
+
+from .. import api
+from ..api import WinkAccount, use_account
+from ..devices import types as device_types
+from ..fleet import FleetManager, RateBudget, shard
+from ..testing import FakeWinkServer, generate_account
+from ..testing.server import CLIENT_ID, CLIENT_SECRET
+
+
+def _account(name, fake, **kwargs):
+    access_token, refresh_token = fake.issue_tokens()
+    return WinkAccount(CLIENT_ID, CLIENT_SECRET, access_token, refresh_token, name=name,
+                       base_url=fake.url, local_base_url="http://{}:" + str(fake.hub_port), **kwargs)
+
+
+class FleetTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fakes = [FakeWinkServer(generate_account(size, seed=size, mix={device_types.LIGHT_BULB: 1})).start()
+                      for size in (5, 12)]
+        self.saved = api.LAST_UPDATE, api.ALL_DEVICES, api.REFRESH_TOKEN, dict(api.API_HEADERS)
+
+    def tearDown(self):
+        for fake in self.fakes:
+            fake.stop()
+        api.LAST_UPDATE, api.ALL_DEVICES, api.REFRESH_TOKEN, headers = self.saved
+        api.API_HEADERS.clear()
+        api.API_HEADERS.update(headers)
+
+    def test_accounts_are_isolated(self):
+        with FleetManager([_account("small", self.fakes[0]), _account("large", self.fakes[1])]) as fleet:
+            devices = fleet.refresh_all(timeout=10)
+            self.assertEqual(len([d for d in devices["small"] if d.object_type() == device_types.LIGHT_BULB]), 5)
+            self.assertEqual(len([d for d in devices["large"] if d.object_type() == device_types.LIGHT_BULB]), 12)
+            self.assertEqual(fleet.account("small").all_devices["data"], self.fakes[0].account["wink_devices"])
+        self.assertEqual(self.saved[:3], (api.LAST_UPDATE, api.ALL_DEVICES, api.REFRESH_TOKEN))
+        self.assertEqual(self.saved[3], api.API_HEADERS)
+
+    def test_devices_use_their_account_from_any_thread(self):
+        accounts = [_account("small", self.fakes[0], allow_local_control=False),
+                    _account("large", self.fakes[1], allow_local_control=False)]
+        with FleetManager(accounts) as fleet:
+            fleet.refresh_all(timeout=10)
+            bulb = [d for d in fleet.devices("large") if d.object_type() == device_types.LIGHT_BULB][0]
+            bulb.set_state(True, 0.25)
+            self.assertEqual(self.fakes[1].get_object(device_types.LIGHT_BULB, bulb.object_id())
+                             ["desired_state"]["brightness"], 0.25)
+            self.assertEqual(self.fakes[0].request_counts[("cloud", "PUT", 200)], 0)
+
+    def test_local_control_is_per_account(self):
+        small = _account("small", self.fakes[0])
+        small.client_secret = None
+        large = _account("large", self.fakes[1])
+        allow_local_control = api.ALLOW_LOCAL_CONTROL
+        with FleetManager([small, large]) as fleet:
+            fleet.refresh_all(timeout=10)
+            # The account without credentials for a hub token falls back to the cloud alone.
+            self.assertFalse(small.allow_local_control)
+            self.assertTrue(large.allow_local_control)
+            self.assertEqual(api.ALLOW_LOCAL_CONTROL, allow_local_control)
+            self.assertTrue(large.hubs)
+            self.assertTrue(all(hub["token"] for hub in large.hubs.values()))
+            bulb = [d for d in fleet.devices("large") if d.object_type() == device_types.LIGHT_BULB][0]
+            self.assertIsNotNone(api.WinkApiInterface.local_control_hub(bulb))
+            bulb.set_state(True, 0.5)
+            self.assertEqual(self.fakes[1].request_counts[("hub", "PUT", 200)], 1)
+            # A second refresh keeps the tokens.
+            token_requests = self.fakes[1].request_counts[("cloud", "POST", 200)]
+            fleet.refresh_all(timeout=10)
+            self.assertEqual(self.fakes[1].request_counts[("cloud", "POST", 200)], token_requests)
+
+    def test_token_refresh_is_per_account(self):
+        small, large = _account("small", self.fakes[0]), _account("large", self.fakes[1])
+        large_token = large.refresh_token
+        with FleetManager([small, large]) as fleet:
+            self.fakes[0].expire_tokens()
+            small_token = small.refresh_token
+            fleet.refresh_all(timeout=10)
+            self.assertNotEqual(small.refresh_token, small_token)
+            self.assertEqual(large.refresh_token, large_token)
+            self.assertEqual(fleet.health("small")["errors"], 1)
+            self.assertEqual(fleet.health("small")["consecutive_errors"], 0)
+            self.assertEqual(fleet.health("large")["errors"], 0)
+        self.assertEqual(api.REFRESH_TOKEN, self.saved[2])
+
+    def test_health(self):
+        self.fakes[1].error_rate = 1.0
+        with FleetManager([_account("small", self.fakes[0]), _account("large", self.fakes[1])]) as fleet:
+            devices = fleet.refresh_all(timeout=10)
+            self.assertEqual(list(devices), ["small"])
+            health = fleet.health()
+            self.assertEqual(health["small"]["device_count"], len(devices["small"]))
+            self.assertIsNotNone(health["small"]["last_success"])
+            self.assertEqual(health["large"]["inventory_errors"], 1)
+            self.assertEqual(health["large"]["last_status"], 500)
+            self.assertEqual(health["large"]["error_rate"], 1.0)
+            self.assertIsNone(health["large"]["inventory_updated_at"])
+
+    def test_refresh_oldest_first(self):
+        accounts = [WinkAccount(name=name) for name in ("a", "b", "c")]
+        with FleetManager(accounts, workers=1, refresh_interval=60) as fleet:
+            fleet._refreshed_at.update({"a": 1000, "b": 900, "c": 1050})
+            self.assertEqual(fleet.due(now=1100), ["b", "a"])
+            self.assertEqual(fleet.due(now=2000), ["b", "a", "c"])
+            fleet._in_flight.add("b")
+            self.assertEqual(fleet.due(now=2000), ["a", "c"])
+            # Every worker is busy, nothing more is started.
+            self.assertEqual(fleet.refresh(now=2000), {})
+
+    def test_duplicate_account(self):
+        with FleetManager([WinkAccount(name="a")]) as fleet:
+            with self.assertRaises(ValueError):
+                fleet.add(WinkAccount(name="a"))
+
+    def test_shared_session(self):
+        small, large = _account("small", self.fakes[0]), _account("large", self.fakes[1])
+        with FleetManager([small, large], rate=100) as fleet:
+            self.assertIs(small.session, large.session)
+            self.assertIs(small.budget, fleet.budget)
+            fleet.remove("small")
+            self.assertIsNone(small.session)
+
+    def test_use_account(self):
+        account = WinkAccount(CLIENT_ID, CLIENT_SECRET, "access", "refresh")
+        self.assertIsNone(api.current_account())
+        with use_account(account):
+            self.assertIs(api.current_account(), account)
+            api.set_bearer_token("other")
+            self.assertEqual(api.get_current_oauth_credentials()["access_token"], "other")
+        self.assertIsNone(api.current_account())
+        self.assertEqual(account.api_headers["Authorization"], "Bearer other")
+        self.assertEqual(self.saved[3], api.API_HEADERS)
+
+
+class RateBudgetTests(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        budget = RateBudget(50, burst=2)
+        self.assertTrue(budget.try_acquire())
+        self.assertTrue(budget.try_acquire())
+        self.assertFalse(budget.try_acquire())
+        start = time.monotonic()
+        for _ in range(3):
+            budget.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+
+class ShardTests(unittest.TestCase):
+
+    def test_every_account_in_one_shard(self):
+        accounts = [WinkAccount(name="account-{}".format(index)) for index in range(50)]
+        shards = [shard(accounts, 4, index) for index in range(4)]
+        self.assertEqual(sorted(account.name for part in shards for account in part),
+                         sorted(account.name for account in accounts))
+        self.assertEqual(shards, [shard(accounts, 4, index) for index in range(4)])
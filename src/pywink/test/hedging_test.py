@@ -0,0 +1,110 @@
+import time
+import unittest
+
+from .. import api, hedging, instrumentation
+from ..api import get_all_devices, get_hubs
+from ..devices import types as device_types
+from ..hedging import LatencyTracker, hedge
+from ..testing import FakeWinkServer, generate_account
+
+
+def _answer(value, delay=0):
+    def answer():
+        time.sleep(delay)
+        return value
+    return answer
+
+
+def _fail(delay=0):
+    def fail():
+        time.sleep(delay)
+        raise IOError("failed")
+    return fail
+
+
+class LatencyTrackerTests(unittest.TestCase):
+
+    def test_percentile(self):
+        tracker = LatencyTracker(size=10)
+        for seconds in range(1, hedging.MIN_SAMPLES):
+            tracker.record("hub", seconds)
+        self.assertIsNone(tracker.percentile("hub", 50))
+        for seconds in range(hedging.MIN_SAMPLES, 21):
+            tracker.record("hub", seconds)
+        # Only the last 10 samples, 11 to 20, are kept.
+        self.assertEqual(tracker.percentile("hub", 0), 11)
+        self.assertEqual(tracker.percentile("hub", 100), 20)
+        self.assertIsNone(tracker.percentile("other", 50))
+
+
+class HedgeTests(unittest.TestCase):
+
+    def test_fast_primary(self):
+        calls = []
+
+        def secondary():
+            calls.append(1)
+        self.assertEqual(hedge(_answer("local"), secondary, 0.5), ("local", hedging.PRIMARY))
+        self.assertEqual(calls, [])
+
+    def test_slow_primary(self):
+        start = time.time()
+        self.assertEqual(hedge(_answer("local", 0.5), _answer("cloud"), 0.05), ("cloud", hedging.SECONDARY))
+        self.assertLess(time.time() - start, 0.3)
+
+    def test_slow_secondary(self):
+        self.assertEqual(hedge(_answer("local", 0.1), _answer("cloud", 0.5), 0.01), ("local", hedging.PRIMARY))
+
+    def test_failed_primary(self):
+        self.assertEqual(hedge(_fail(), _answer("cloud"), 1), ("cloud", hedging.SECONDARY))
+
+    def test_invalid_primary(self):
+        self.assertEqual(hedge(_answer({}), _answer({"data": 1}, 0.05), 1, valid=lambda result: "data" in result),
+                         ({"data": 1}, hedging.SECONDARY))
+
+    def test_both_fail(self):
+        with self.assertRaises(IOError):
+            hedge(_fail(), _fail(0.05), 0.01)
+
+
+class HedgedReadTests(unittest.TestCase):
+
+    def setUp(self):
+        self.allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = True
+        api.HUB_LATENCY.clear()
+        self.fake = FakeWinkServer(generate_account(5, hub_count=1, mix={device_types.LIGHT_BULB: 1})).start()
+        self.fake.install()
+        get_hubs()
+        self.bulb = [device for device in get_all_devices() if device.object_type() == device_types.LIGHT_BULB][0]
+        api.enable_hedged_reads(initial_delay=0.05)
+        instrumentation.reset_stats()
+
+    def tearDown(self):
+        api.disable_hedged_reads()
+        api.ALLOW_LOCAL_CONTROL = self.allow_local_control
+        self.fake.uninstall()
+        self.fake.stop()
+
+    def test_slow_hub_is_hedged(self):
+        self.fake.hub_latency = 0.5
+        start = time.time()
+        response = self.bulb.api_interface.local_get_state(self.bulb)
+        self.assertLess(time.time() - start, 0.4)
+        self.assertEqual(response["data"]["object_id"], self.bulb.object_id())
+        self.assertEqual(instrumentation.get_stats()["fallbacks"][instrumentation.FALLBACK_HEDGE], 1)
+
+    def test_fast_hub_is_not_hedged(self):
+        self.fake.latency = 0.5
+        cloud_reads = self.fake.request_counts[("cloud", "GET", 200)]
+        self.bulb.json_state["last_reading"]["brightness"] = None
+        self.bulb.api_interface.local_get_state(self.bulb)
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 200)], cloud_reads)
+        self.assertIsNotNone(self.bulb.json_state["last_reading"]["brightness"])
+
+    def test_delay_follows_hub_latency(self):
+        for _ in range(hedging.MIN_SAMPLES):
+            api.HUB_LATENCY.record(self.bulb.hub_id(), 5.0)
+        self.fake.hub_latency = 0.2
+        self.bulb.api_interface.local_get_state(self.bulb)
+        self.assertNotIn(instrumentation.FALLBACK_HEDGE, instrumentation.get_stats()["fallbacks"])
@@ -0,0 +1,81 @@
+import unittest
+
+from .. import events
+from ..api import get_devices_from_response_dict
+from ..devices import types as device_types
+from ..history import History, RingBuffer
+from ..testing import load_fixtures
+
+
+class RingBufferTests(unittest.TestCase):
+
+    def test_keeps_the_newest_readings(self):
+        buffer = RingBuffer(capacity=4)
+        for second in range(10):
+            buffer.append(float(second), second * 2.0)
+        self.assertEqual(len(buffer), 4)
+        self.assertEqual(buffer.items(), [(6.0, 12.0), (7.0, 14.0), (8.0, 16.0), (9.0, 18.0)])
+        self.assertEqual(buffer.items(since=8.0), [(8.0, 16.0), (9.0, 18.0)])
+
+    def test_stats(self):
+        buffer = RingBuffer(capacity=8)
+        for second, value in enumerate([20.0, 22.0, 21.0, 25.0]):
+            buffer.append(float(second * 10), value)
+        stats = buffer.stats()
+        self.assertEqual((stats.count, stats.min, stats.max, stats.mean), (4, 20.0, 25.0, 22.0))
+        self.assertAlmostEqual(stats.rate, 5.0 / 30)
+        self.assertEqual(buffer.stats(since=15.0).count, 2)
+        self.assertIsNone(buffer.stats(since=100.0))
+
+
+class HistoryTests(unittest.TestCase):
+
+    def setUp(self):
+        super(HistoryTests, self).setUp()
+        items = [item for item in load_fixtures()["wink_devices"] if item["object_type"] == device_types.SENSOR_POD]
+        self.sensor = [device for device in get_devices_from_response_dict({"data": items}, [device_types.SENSOR_POD])
+                       if device.json_state["last_reading"].get("temperature") is not None][0]
+
+    def _update(self, temperature, timestamp):
+        json_state = dict(self.sensor.json_state)
+        json_state["last_reading"] = dict(json_state["last_reading"], temperature=temperature,
+                                          temperature_updated_at=timestamp)
+        self.sensor.pubnub_update(json_state)
+
+    def test_records_every_state_update(self):
+        history = History(fields=["temperature"])
+        history.start()
+        try:
+            for second, temperature in enumerate([20.0, 21.0, 23.0]):
+                self._update(temperature, 1000.0 + second)
+            # The same reading again is not recorded twice.
+            self._update(23.0, 1002.0)
+        finally:
+            history.stop()
+        self.assertEqual(history.readings(self.sensor, "temperature"),
+                         [(1000.0, 20.0), (1001.0, 21.0), (1002.0, 23.0)])
+        stats = history.stats(self.sensor, "temperature", window=1.5, now=1002.0)
+        self.assertEqual((stats.count, stats.min, stats.max, stats.rate), (2, 21.0, 23.0, 2.0))
+        self.assertNotIn(history._on_event, events._LISTENERS)  # pylint: disable=protected-access
+
+    def test_unknown_field(self):
+        history = History()
+        history.record(self.sensor)
+        self.assertIsNone(history.stats(self.sensor, "no_such_field"))
+        self.assertEqual(history.readings(self.sensor, "no_such_field"), [])
+
+    def test_sensors_of_one_object_record_once(self):
+        items = [item for item in load_fixtures()["wink_devices"] if item["object_type"] == device_types.SENSOR_POD]
+        sensors = [device for device in get_devices_from_response_dict({"data": items}, [device_types.SENSOR_POD])
+                   if device.object_id() == self.sensor.object_id()]
+        self.assertGreater(len(sensors), 1)
+        history = History(fields=["temperature"])
+        for temperature in (20.0, 21.0):
+            json_state = dict(self.sensor.json_state)
+            json_state["last_reading"] = dict(json_state["last_reading"], temperature=temperature)
+            json_state["last_reading"].pop("temperature_updated_at", None)
+            # Every sensor of the pod reports the same update.
+            for sensor in sensors:
+                sensor.json_state = json_state
+                history.record(sensor)
+        self.assertEqual([value for _, value in history.readings(self.sensor, "temperature")], [20.0, 21.0])
@@ -0,0 +1,91 @@
+import unittest
+
+from .. import api, instrumentation
+from ..api import get_all_devices, get_hubs, get_light_bulbs
+from ..testing import FakeWinkServer
+
+
+class LatencyHistogramTests(unittest.TestCase):
+
+    def test_percentiles(self):
+        histogram = instrumentation.LatencyHistogram()
+        for _ in range(90):
+            histogram.add(0.002)
+        for _ in range(10):
+            histogram.add(0.3)
+        self.assertEqual(histogram.count, 100)
+        self.assertEqual(histogram.percentile(50), 0.0025)
+        self.assertEqual(histogram.percentile(99), 0.3)
+        self.assertEqual(histogram.as_dict()["min"], 0.002)
+
+    def test_empty_histogram(self):
+        self.assertIsNone(instrumentation.LatencyHistogram().percentile(50))
+
+
+class RequestInstrumentationTests(unittest.TestCase):
+
+    def setUp(self):
+        super(RequestInstrumentationTests, self).setUp()
+        self.allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = True
+        self.records = []
+        instrumentation.add_request_hook(self.records.append)
+        instrumentation.reset_stats()
+        self.fake = FakeWinkServer(seed=0)
+        self.fake.start()
+        self.fake.install()
+
+    def tearDown(self):
+        self.fake.uninstall()
+        self.fake.stop()
+        instrumentation.remove_request_hook(self.records.append)
+        instrumentation.reset_stats()
+        api.ALLOW_LOCAL_CONTROL = self.allow_local_control
+        super(RequestInstrumentationTests, self).tearDown()
+
+    def test_cloud_requests_are_recorded(self):
+        get_all_devices()
+        record = self.records[-1]
+        self.assertEqual(record.route, instrumentation.ROUTE_CLOUD)
+        self.assertEqual(record.end_point, "wink_devices")
+        self.assertEqual(record.status, 200)
+        self.assertGreater(record.bytes, 0)
+        self.assertIsNone(record.fallback_reason)
+        stats = instrumentation.get_stats()["requests"]["cloud:wink_devices"]
+        self.assertEqual(stats["count"], 1)
+        self.assertEqual(stats["statuses"], {200: 1})
+
+    def test_local_requests_are_recorded(self):
+        get_hubs()
+        bulb = [bulb for bulb in get_light_bulbs() if bulb.hub_id() in api.HUBS][0]
+        del self.records[:]
+        bulb.set_state(True)
+        self.assertEqual([(record.route, record.method, record.object_type) for record in self.records],
+                         [(instrumentation.ROUTE_LOCAL, "PUT", "light_bulb")])
+
+    def test_local_fallback_reason(self):
+        get_hubs()
+        bulb = [bulb for bulb in get_light_bulbs() if bulb.hub_id() in api.HUBS][0]
+        self.fake.set_hub_online(bulb.hub_id(), False)
+        del self.records[:]
+        bulb.set_state(False)
+        self.assertEqual([(record.route, record.status, record.fallback_reason) for record in self.records],
+                         [(instrumentation.ROUTE_LOCAL, None, None),
+                          (instrumentation.ROUTE_CLOUD, 200, instrumentation.FALLBACK_LOCAL_ERROR)])
+        self.assertEqual(instrumentation.get_stats()["fallbacks"], {instrumentation.FALLBACK_LOCAL_ERROR: 1})
+
+    def test_token_refresh_reason(self):
+        self.fake.expire_tokens()
+        get_all_devices()
+        reasons = [(record.end_point, record.status, record.fallback_reason) for record in self.records]
+        self.assertEqual(reasons[0], ("wink_devices", 401, None))
+        self.assertIn(("wink_devices", 200, instrumentation.FALLBACK_TOKEN_REFRESH), reasons)
+
+    def test_failing_hook_does_not_break_requests(self):
+        def hook(record):
+            raise ValueError(record)
+        instrumentation.add_request_hook(hook)
+        try:
+            self.assertEqual(len(get_all_devices()), 83)
+        finally:
+            instrumentation.remove_request_hook(hook)
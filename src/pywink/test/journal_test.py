@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..api import get_devices_from_response_dict
+from ..devices import types as device_types
+from ..journal import Journal, JournalReader
+from ..testing import generate_account
+
+
+class JournalTests(unittest.TestCase):
+
+    def setUp(self):
+        super(JournalTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        account = generate_account(20, mix={device_types.LOCK: 1}, seed=5)
+        self.locks = get_devices_from_response_dict({"data": account["wink_devices"]}, [device_types.LOCK])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(JournalTests, self).tearDown()
+
+    def _set_locked(self, lock, locked):
+        json_state = dict(lock.json_state)
+        json_state["last_reading"] = dict(json_state["last_reading"], locked=locked)
+        lock.pubnub_update(json_state)
+
+    def test_state_changes_are_journaled(self):
+        journal = Journal(self.directory)
+        journal.start()
+        try:
+            lock = self.locks[0]
+            self._set_locked(lock, True)
+            self._set_locked(lock, True)
+            self._set_locked(lock, False)
+            self._set_locked(self.locks[1], True)
+        finally:
+            journal.stop()
+        records = list(JournalReader(self.directory).scan(object_id=lock.object_id()))
+        self.assertEqual([record.last_reading["locked"] for record in records], [True, False])
+        self.assertEqual(set(record.source for record in records), {"pubnub"})
+        self.assertEqual(records[0].object_type, device_types.LOCK)
+
+    def test_time_range_and_replay(self):
+        journal = Journal(self.directory)
+        for second, lock in enumerate(self.locks):
+            journal.append(lock, timestamp=1000.0 + second)
+        journal.close()
+        reader = JournalReader(self.directory)
+        self.assertEqual(len(list(reader.scan(start=1005.0, end=1010.0))), 5)
+        states = reader.replay(end=1003.0)
+        self.assertEqual(set(object_id for _, object_id in states), set(lock.object_id() for lock in self.locks[:3]))
+
+    def test_rotation(self):
+        journal = Journal(self.directory, max_bytes=2048, max_files=3)
+        for second in range(50):
+            for lock in self.locks[:5]:
+                self._set_locked(lock, second % 2 == 0)
+                journal.append(lock, timestamp=float(second))
+        journal.close()
+        files = sorted(os.listdir(self.directory))
+        self.assertEqual(len(files), 3)
+        records = list(JournalReader(self.directory).scan())
+        self.assertLess(len(records), 250)
+        self.assertEqual(records[-1].timestamp, 49.0)
+
+    def test_truncated_record_is_ignored(self):
+        journal = Journal(self.directory)
+        for lock in self.locks[:3]:
+            journal.append(lock)
+        journal.close()
+        path = os.path.join(self.directory, os.listdir(self.directory)[0])
+        with open(path, "r+b") as journal_file:
+            journal_file.truncate(os.path.getsize(path) - 5)
+        self.assertEqual(len(list(JournalReader(self.directory).scan())), 2)
+
+    def test_records_are_flushed(self):
+        journal = Journal(self.directory)
+        journal.append(self.locks[0], timestamp=1000.0)
+        # Read while the journal is still open, as after a crash.
+        records = list(JournalReader(self.directory).scan())
+        self.assertEqual([record.object_id for record in records], [self.locks[0].object_id()])
+        journal.close()
+
+    def test_tracked_states_are_bounded(self):
+        journal = Journal(self.directory, max_tracked=2, fsync=True)
+        for lock in self.locks[:3]:
+            self.assertTrue(journal.append(lock))
+        self.assertEqual(len(journal._last), 2)  # pylint: disable=protected-access
+        # The most recent devices are still deduplicated, the oldest was forgotten.
+        self.assertFalse(journal.append(self.locks[2]))
+        self.assertTrue(journal.append(self.locks[0]))
+        journal.close()
@@ -0,0 +1,52 @@
+import unittest
+
+from .. import api
+from ..api import get_locks
+from ..testing import FakeWinkServer
+
+
+class NoopSuppressionTests(unittest.TestCase):
+
+    def setUp(self):
+        super(NoopSuppressionTests, self).setUp()
+        self.allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = False
+        self.fake = FakeWinkServer(seed=0)
+        self.fake.start()
+        self.fake.install()
+        self.lock = get_locks()[0]
+        self.lock.json_state["desired_state"] = {}
+        api.enable_noop_suppression(max_age=30)
+
+    def tearDown(self):
+        api.disable_noop_suppression()
+        self.fake.uninstall()
+        self.fake.stop()
+        api.ALLOW_LOCAL_CONTROL = self.allow_local_control
+        super(NoopSuppressionTests, self).tearDown()
+
+    def _puts(self):
+        return self.fake.request_counts[("cloud", "PUT", 200)]
+
+    def test_matching_write_is_skipped(self):
+        self.lock.set_state(self.lock.state())
+        self.assertEqual(self._puts(), 0)
+
+    def test_changing_write_is_sent(self):
+        self.lock.set_state(not self.lock.state())
+        self.assertEqual(self._puts(), 1)
+
+    def test_stale_state_is_written(self):
+        self.lock.state_updated_at -= 60
+        self.lock.set_state(self.lock.state())
+        self.assertEqual(self._puts(), 1)
+
+    def test_pending_change_is_overridden(self):
+        self.lock.json_state["desired_state"] = {"locked": not self.lock.state()}
+        self.lock.set_state(self.lock.state())
+        self.assertEqual(self._puts(), 1)
+
+    def test_disabled_by_default(self):
+        api.disable_noop_suppression()
+        self.lock.set_state(self.lock.state())
+        self.assertEqual(self._puts(), 1)
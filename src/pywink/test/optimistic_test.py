@@ -0,0 +1,92 @@
+import time
+import unittest
+from concurrent.futures import Future
+
+from .. import api, events, optimistic
+from ..api import get_locks
+from ..testing import FakeWinkServer
+
+
+class OptimisticStateTests(unittest.TestCase):
+
+    def setUp(self):
+        super(OptimisticStateTests, self).setUp()
+        self.allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = False
+        self.events = []
+        events.add_listener(self._on_event)
+        self.fake = FakeWinkServer(seed=0)
+        self.fake.start()
+        self.fake.install()
+        self.lock = get_locks()[0]
+        api.enable_optimistic_state()
+
+    def tearDown(self):
+        api.disable_optimistic_state()
+        optimistic.wait_for_confirmations()
+        self.fake.uninstall()
+        self.fake.stop()
+        events.remove_listener(self._on_event)
+        api.ALLOW_LOCAL_CONTROL = self.allow_local_control
+        super(OptimisticStateTests, self).tearDown()
+
+    def _on_event(self, event):
+        if event.event in (events.OPTIMISTIC_CONFIRMED, events.OPTIMISTIC_ROLLBACK):
+            self.events.append(event)
+
+    def test_state_is_applied_before_the_request_completes(self):
+        locked = self.lock.state()
+        self.fake.latency = 0.3
+        start = time.time()
+        self.lock.set_state(not locked)
+        self.assertLess(time.time() - start, 0.3)
+        self.assertEqual(self.lock.state(), not locked)
+        self.assertTrue(optimistic.wait_for_confirmations())
+        self.assertEqual(self.fake.get_object("lock", self.lock.object_id())["last_reading"]["locked"], not locked)
+        self.assertEqual([event.event for event in self.events], [events.OPTIMISTIC_CONFIRMED])
+
+    def test_failed_request_rolls_back(self):
+        locked = self.lock.state()
+        self.fake.error_rate = 1.0
+        self.lock.set_state(not locked)
+        self.assertEqual(self.lock.state(), not locked)
+        optimistic.wait_for_confirmations()
+        self.assertEqual(self.lock.state(), locked)
+        self.assertEqual(len(self.events), 1)
+        self.assertEqual(self.events[0].event, events.OPTIMISTIC_ROLLBACK)
+        self.assertEqual(self.events[0].fields, {"locked": locked})
+        self.assertIs(self.events[0].device, self.lock)
+
+    def test_failure_after_a_confirmed_write_restores_the_confirmed_value(self):
+        locked = self.lock.state()
+        futures = []
+        updated = []
+
+        def submit(device, state):
+            futures.append(Future())
+            return futures[-1]
+
+        def on_updated(event):
+            if event.event == events.STATE_UPDATED and event.device is self.lock:
+                updated.append(self.lock.state())
+        for value in (not locked, locked):
+            self.lock._update_state_from_response(  # pylint: disable=protected-access
+                optimistic.apply(self.lock, {"desired_state": {"locked": value}}, submit))
+        events.add_listener(on_updated)
+        try:
+            futures[0].set_result({"data": {}})
+            futures[1].set_exception(RuntimeError("Hub offline"))
+        finally:
+            events.remove_listener(on_updated)
+        # The server holds the first write, not the state from before it.
+        self.assertEqual(self.lock.state(), not locked)
+        self.assertEqual(self.events[-1].fields, {"locked": not locked})
+        self.assertEqual(updated, [not locked])
+
+    def test_disabled_by_default(self):
+        api.disable_optimistic_state()
+        self.fake.error_rate = 1.0
+        locked = self.lock.state()
+        self.lock.set_state(not locked)
+        self.assertEqual(self.lock.state(), locked)
+        self.assertEqual(self.events, [])
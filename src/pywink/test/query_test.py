@@ -0,0 +1,80 @@
+import unittest
+
+from .. import api
+from ..api import get_all_devices, get_devices_from_response_dict
+from ..devices import types as device_types
+from ..query import DeviceIndex
+from ..testing import FakeWinkServer, generate_account
+
+
+class DeviceIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        super(DeviceIndexTests, self).setUp()
+        account = generate_account(500, hub_count=3, seed=11)
+        self.devices = get_devices_from_response_dict({"data": account["wink_devices"]},
+                                                      device_types.ALL_SUPPORTED_DEVICES)
+        self.index = DeviceIndex(self.devices)
+
+    def _expected(self, **criteria):
+        return set(id(device) for device in self.devices
+                   if all(device.json_state.get(field) == value for field, value in criteria.items()
+                          if field != "available") and
+                   ("available" not in criteria or bool(device.available()) == criteria["available"]))
+
+    def test_find_matches_a_full_scan(self):
+        hub_id = [device for device in self.devices if device.object_type() == device_types.HUB][0].object_id()
+        for criteria in [{"hub_id": hub_id}, {"radio_type": "zigbee"}, {"hub_id": hub_id, "radio_type": "zwave"},
+                         {"hub_id": hub_id, "radio_type": "zigbee", "available": False},
+                         {"object_type": device_types.LOCK, "available": True}]:
+            found = set(id(device) for device in self.index.find(**criteria))
+            self.assertEqual(found, self._expected(**criteria), criteria)
+
+    def test_find_any_of_and_name(self):
+        found = self.index.find(radio_type=["zigbee", "zwave"])
+        self.assertEqual(len(found), len([device for device in self.devices
+                                          if device.json_state.get("radio_type") in ("zigbee", "zwave")]))
+        device = self.devices[10]
+        self.assertIn(device, self.index.find(name=device.name().upper()))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            self.index.find(color="red")
+
+    def test_index_follows_state_updates(self):
+        device = [device for device in self.devices if device.available()][0]
+        self.index.start()
+        try:
+            json_state = dict(device.json_state)
+            json_state["last_reading"] = dict(json_state["last_reading"], connection=False)
+            device.pubnub_update(json_state)
+        finally:
+            self.index.stop()
+        self.assertIn(device, self.index.find(available=False))
+        self.assertNotIn(device, self.index.find(available=True))
+
+    def test_sync_drops_missing_devices(self):
+        self.index.sync(self.devices[:100])
+        self.assertEqual(len(self.index), 100)
+        self.assertEqual(sum(self.index.values("object_type").values()), 100)
+        self.assertEqual(self.index.find(object_id=self.devices[200].object_id()), [])
+        self.assertIn(self.devices[50], self.index.find(object_id=self.devices[50].object_id()))
+
+    def test_refresh_replaces_devices_without_sync(self):
+        with FakeWinkServer(generate_account(30, hub_count=1, seed=2)):
+            old = get_all_devices()
+            index = DeviceIndex(old)
+            index.start()
+            try:
+                api._account().last_update = None  # pylint: disable=protected-access
+                new = get_all_devices()
+                device = [device for device in new if device.available()][0]
+                json_state = dict(device.json_state)
+                json_state["last_reading"] = dict(json_state["last_reading"], connection=False)
+                device.pubnub_update(json_state)
+            finally:
+                index.stop()
+        self.assertEqual(len(index), len(new))
+        found = index.find(object_id=[device.object_id() for device in new])
+        self.assertEqual(set(id(device) for device in found), set(id(device) for device in new))
+        self.assertIn(device, index.find(available=False))
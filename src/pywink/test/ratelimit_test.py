@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+from email.utils import formatdate
+
+from .. import api, instrumentation, ratelimit
+from ..api import WinkAPIException, wink_api_fetch
+from ..ratelimit import RateLimiter, TokenBucket
+from ..testing import FakeWinkServer, generate_account
+
+
+class _Response:
+
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class EndpointClassTests(unittest.TestCase):
+
+    def test_endpoint_classes(self):
+        self.assertEqual(ratelimit.endpoint_class("post", "oauth2/token"), ratelimit.OAUTH)
+        self.assertEqual(ratelimit.endpoint_class("get", "wink_devices"), ratelimit.INVENTORY)
+        self.assertEqual(ratelimit.endpoint_class("get", "users/me"), ratelimit.INVENTORY)
+        self.assertEqual(ratelimit.endpoint_class("get", "object"), ratelimit.READ)
+        self.assertEqual(ratelimit.endpoint_class("put", "object"), ratelimit.WRITE)
+        self.assertEqual(ratelimit.endpoint_class("post", "activate"), ratelimit.WRITE)
+
+    def test_priority(self):
+        self.assertEqual(ratelimit.current_priority(ratelimit.WRITE), ratelimit.PRIORITY_HIGH)
+        with ratelimit.priority(ratelimit.PRIORITY_LOW):
+            self.assertEqual(ratelimit.current_priority(ratelimit.WRITE), ratelimit.PRIORITY_LOW)
+        self.assertEqual(ratelimit.current_priority(ratelimit.READ), ratelimit.PRIORITY_NORMAL)
+
+    def test_retry_after(self):
+        self.assertEqual(ratelimit.retry_after(_Response({"Retry-After": "3"})), 3.0)
+        self.assertEqual(ratelimit.retry_after(_Response({})), ratelimit.DEFAULT_RETRY_AFTER)
+        self.assertEqual(ratelimit.retry_after(_Response({"Retry-After": "soon"})), ratelimit.DEFAULT_RETRY_AFTER)
+        self.assertEqual(ratelimit.retry_after(_Response({"Retry-After": "-5"})), 0.0)
+        self.assertEqual(ratelimit.retry_after(_Response({"Retry-After": "99999"})), ratelimit.MAX_RETRY_AFTER)
+        date = formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(ratelimit.retry_after(_Response({"Retry-After": date})), 30, delta=2)
+
+
+class TokenBucketTests(unittest.TestCase):
+
+    def test_burst(self):
+        bucket = TokenBucket(1, burst=3)
+        self.assertTrue(all(bucket.try_acquire() for _ in range(3)))
+        self.assertFalse(bucket.try_acquire())
+
+    def test_rate(self):
+        bucket = TokenBucket(50, burst=1)
+        bucket.acquire()
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_priority_order(self):
+        bucket = TokenBucket(10, burst=1)
+        bucket.acquire()
+        order = []
+
+        def acquire(name, level):
+            bucket.acquire(level)
+            order.append(name)
+
+        threads = []
+        for name, level in (("low-1", ratelimit.PRIORITY_LOW), ("low-2", ratelimit.PRIORITY_LOW),
+                            ("high", ratelimit.PRIORITY_HIGH)):
+            thread = threading.Thread(target=acquire, args=(name, level))
+            thread.start()
+            threads.append(thread)
+            while bucket.waiting() < len(threads):
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, ["high", "low-1", "low-2"])
+
+    def test_pause(self):
+        bucket = TokenBucket(100, burst=10)
+        bucket.pause(0.1)
+        self.assertFalse(bucket.try_acquire())
+        self.assertGreaterEqual(bucket.acquire(), 0.08)
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_unlimited_class(self):
+        limiter = RateLimiter({ratelimit.READ: None})
+        self.assertEqual(limiter.acquire(ratelimit.READ), 0.0)
+        self.assertFalse(limiter.throttle(ratelimit.READ, 1))
+        self.assertTrue(limiter.throttle(ratelimit.WRITE, 0))
+        stats = limiter.get_stats()
+        self.assertEqual(stats[ratelimit.READ]["throttled"], 1)
+        self.assertEqual(stats[ratelimit.WRITE]["throttled"], 1)
+
+
+class RateLimitedRequestTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeWinkServer(generate_account(10)).start()
+        self.fake.install()
+        instrumentation.reset_stats()
+
+    def tearDown(self):
+        api.disable_rate_limiting()
+        self.fake.uninstall()
+        self.fake.stop()
+
+    def test_429_is_sent_again(self):
+        self.fake.throttle(2, retry_after="0")
+        self.assertEqual(wink_api_fetch()["data"], self.fake.account["wink_devices"])
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 429)], 2)
+        self.assertEqual(instrumentation.get_stats()["fallbacks"][instrumentation.FALLBACK_RATE_LIMITED], 2)
+
+    def test_retry_after_pauses_the_limiter(self):
+        api.enable_rate_limiting({ratelimit.INVENTORY: (100, 10)})
+        self.fake.throttle(1, retry_after="0.2")
+        start = time.time()
+        wink_api_fetch()
+        self.assertGreaterEqual(time.time() - start, 0.18)
+        self.assertEqual(api.RATE_LIMITER.get_stats()[ratelimit.INVENTORY]["throttled"], 1)
+
+    def test_gives_up_after_retries(self):
+        self.fake.throttle(api.MAX_RATE_LIMITED_RETRIES + 1, retry_after="0")
+        with self.assertRaises(WinkAPIException) as context:
+            wink_api_fetch()
+        self.assertIn("429", str(context.exception))
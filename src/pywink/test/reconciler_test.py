@@ -0,0 +1,77 @@
+import time
+import unittest
+
+from .. import api, events
+from ..api import get_locks
+from ..reconciler import Reconciler, CONVERGED, FAILED, PENDING, mismatched_fields
+from ..testing import FakeWinkServer
+
+
+class ReconcilerTests(unittest.TestCase):
+
+    def setUp(self):
+        super(ReconcilerTests, self).setUp()
+        self.allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = False
+        self.events = []
+        events.add_listener(self._on_event)
+        self.fake = FakeWinkServer(seed=0)
+        self.fake.start()
+        self.fake.install()
+        self.lock = get_locks()[0]
+        self.reconciler = Reconciler(initial_delay=0, max_attempts=3)
+
+    def tearDown(self):
+        self.reconciler.stop()
+        self.fake.uninstall()
+        self.fake.stop()
+        events.remove_listener(self._on_event)
+        api.ALLOW_LOCAL_CONTROL = self.allow_local_control
+        super(ReconcilerTests, self).tearDown()
+
+    def _on_event(self, event):
+        if event.event in (events.RECONCILE_CONVERGED, events.RECONCILE_FAILED):
+            self.events.append(event)
+
+    def test_mismatched_fields(self):
+        self.lock.json_state["last_reading"]["locked"] = False
+        self.assertEqual(mismatched_fields(self.lock, {"locked": True, "beeper_enabled": None}), {"locked": True})
+        self.lock.json_state["last_reading"]["brightness"] = 0.504
+        self.assertEqual(mismatched_fields(self.lock, {"brightness": 0.5}), {})
+
+    def test_converged_device_is_not_refreshed(self):
+        self.reconciler.track(self.lock, {"locked": self.lock.state()})
+        self.assertEqual(self.reconciler.status(self.lock), PENDING)
+        self.reconciler.check(time.time() + 1)
+        self.assertEqual(self.reconciler.status(self.lock), CONVERGED)
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 200)], 1)
+        self.assertEqual([event.event for event in self.events], [events.RECONCILE_CONVERGED])
+
+    def test_stuck_device_fails_after_max_attempts(self):
+        self.reconciler.track(self.lock, {"locked": not self.lock.state()})
+        self.assertIsNotNone(self.reconciler.check(time.time() + 1000))
+        self.assertIsNotNone(self.reconciler.check(time.time() + 1000))
+        self.assertIsNone(self.reconciler.check(time.time() + 1000))
+        self.assertEqual(self.reconciler.status(self.lock), FAILED)
+        self.assertEqual(self.reconciler.pending(), [])
+        # One inventory read and one refresh per attempt.
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 200)], 4)
+        self.assertEqual(self.events[-1].event, events.RECONCILE_FAILED)
+
+    def test_backoff(self):
+        reconciler = Reconciler(initial_delay=1, max_delay=3, max_attempts=10)
+        reconciler.track(self.lock, {"locked": not self.lock.state()})
+        self.assertGreater(reconciler.check(), 0.5)
+        delays = []
+        for _ in range(3):
+            delays.append(round(reconciler.check(time.time() + 1000)))
+        self.assertEqual(delays, [2, 3, 3])
+
+    def test_writes_are_tracked_once_started(self):
+        self.reconciler.start()
+        self.lock.set_state(not self.lock.state())
+        for _ in range(100):
+            if self.reconciler.status(self.lock) == CONVERGED:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.reconciler.status(self.lock), CONVERGED)
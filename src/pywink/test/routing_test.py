@@ -0,0 +1,106 @@
+import unittest
+
+from .. import api
+from ..api import get_all_devices, get_hubs
+from ..devices import types as device_types
+from ..instrumentation import ROUTE_CLOUD, ROUTE_LOCAL
+from ..routing import RouteSelector
+from ..testing import FakeWinkServer, generate_account
+
+
+def _record(selector, key, seconds, count=5, ok=True, now=0):
+    for _ in range(count):
+        selector.record(key, seconds, ok, now=now)
+
+
+class RouteSelectorTests(unittest.TestCase):
+
+    def test_local_until_enough_samples(self):
+        selector = RouteSelector(min_samples=5)
+        _record(selector, ROUTE_CLOUD, 0.01)
+        _record(selector, "hub", 1.0, count=4)
+        self.assertEqual(selector.choose("hub", now=0), ROUTE_LOCAL)
+        _record(selector, "hub", 1.0, count=1)
+        self.assertEqual(selector.choose("hub", now=0), ROUTE_CLOUD)
+
+    def test_faster_route_wins(self):
+        selector = RouteSelector()
+        _record(selector, ROUTE_CLOUD, 0.2)
+        _record(selector, "fast", 0.05)
+        _record(selector, "slow", 0.8)
+        # Within the margin the hub is kept.
+        _record(selector, "close", 0.22)
+        self.assertEqual(selector.choose("fast", now=0), ROUTE_LOCAL)
+        self.assertEqual(selector.choose("slow", now=0), ROUTE_CLOUD)
+        self.assertEqual(selector.choose("close", now=0), ROUTE_LOCAL)
+
+    def test_unhealthy_route_loses(self):
+        selector = RouteSelector()
+        _record(selector, ROUTE_CLOUD, 0.5)
+        _record(selector, "hub", 0.01)
+        _record(selector, "hub", 0.01, count=10, ok=False)
+        self.assertEqual(selector.choose("hub", now=0), ROUTE_CLOUD)
+        _record(selector, ROUTE_CLOUD, 0.5, count=20, ok=False)
+        self.assertEqual(selector.choose("hub", now=0), ROUTE_LOCAL)
+
+    def test_ewma_follows_recent_latency(self):
+        selector = RouteSelector(alpha=0.5)
+        _record(selector, ROUTE_CLOUD, 0.2)
+        _record(selector, "hub", 1.0)
+        self.assertEqual(selector.choose("hub", now=0), ROUTE_CLOUD)
+        _record(selector, "hub", 0.05, count=6)
+        self.assertEqual(selector.choose("hub", now=0), ROUTE_LOCAL)
+        self.assertLess(selector.get_stats()["hub"]["latency"], 0.1)
+
+    def test_losing_hub_is_probed(self):
+        selector = RouteSelector(probe_interval=60)
+        _record(selector, ROUTE_CLOUD, 0.1, now=100)
+        _record(selector, "hub", 1.0, now=0)
+        self.assertEqual(selector.choose("hub", now=100), ROUTE_LOCAL)
+        self.assertEqual(selector.choose("hub", now=101), ROUTE_CLOUD)
+
+
+class RouteOverrideTests(unittest.TestCase):
+
+    def setUp(self):
+        self.allow_local_control = api.ALLOW_LOCAL_CONTROL
+        api.ALLOW_LOCAL_CONTROL = True
+        self.fake = FakeWinkServer(generate_account(5, hub_count=1, mix={device_types.LIGHT_BULB: 1})).start()
+        self.fake.install()
+        get_hubs()
+        self.bulb = [device for device in get_all_devices() if device.object_type() == device_types.LIGHT_BULB][0]
+
+    def tearDown(self):
+        api.disable_route_selection()
+        api.ROUTE_OVERRIDES.clear()
+        api.ALLOW_LOCAL_CONTROL = self.allow_local_control
+        self.fake.uninstall()
+        self.fake.stop()
+
+    def test_overrides(self):
+        self.assertIsNotNone(api.WinkApiInterface.local_control_hub(self.bulb))
+        api.set_route_override(ROUTE_CLOUD, object_type=device_types.LIGHT_BULB)
+        self.assertIsNone(api.WinkApiInterface.local_control_hub(self.bulb))
+        api.set_route_override(ROUTE_LOCAL, hub_id=self.bulb.hub_id())
+        self.assertIsNotNone(api.WinkApiInterface.local_control_hub(self.bulb))
+        api.set_route_override(ROUTE_CLOUD, hub_id=self.bulb.hub_id(), object_type=device_types.LIGHT_BULB)
+        self.assertIsNone(api.WinkApiInterface.local_control_hub(self.bulb))
+        api.set_route_override(None, hub_id=self.bulb.hub_id(), object_type=device_types.LIGHT_BULB)
+        self.assertEqual(api.choose_route(self.bulb), ROUTE_LOCAL)
+
+    def test_slow_hub_is_routed_to_the_cloud(self):
+        api.enable_route_selection(min_samples=3)
+        self.fake.hub_latency = 0.1
+        for _ in range(3):
+            self.bulb.api_interface.get_device_state(self.bulb)
+            self.bulb.api_interface.local_get_state(self.bulb)
+        stats = api.ROUTE_SELECTOR.get_stats()
+        self.assertGreaterEqual(stats[self.bulb.hub_id()]["samples"], 3)
+        self.assertGreaterEqual(stats[ROUTE_CLOUD]["samples"], 3)
+        self.assertIsNone(api.WinkApiInterface.local_control_hub(self.bulb))
+        hub_reads = self.fake.request_counts[("hub", "GET", 200)]
+        self.bulb.api_interface.local_get_state(self.bulb)
+        self.assertEqual(self.fake.request_counts[("hub", "GET", 200)], hub_reads)
+        # A manual override still wins.
+        api.set_route_override(ROUTE_LOCAL, object_type=device_types.LIGHT_BULB)
+        self.assertIsNotNone(api.WinkApiInterface.local_control_hub(self.bulb))
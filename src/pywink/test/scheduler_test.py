@@ -0,0 +1,124 @@
+import time
+import unittest
+from concurrent.futures import Future
+
+from ..devices import types as device_types
+from ..scheduler import PollingScheduler
+
+
+class _Device:
+
+    def __init__(self, object_id, object_type=device_types.LOCK, pubnub_channel=None):
+        self.obj_id = object_id
+        self.obj_type = object_type
+        self.pubnub_channel = pubnub_channel
+        self.state_updated_at = time.time()
+        self.json_state = {}
+        self.polls = 0
+
+    def object_id(self):
+        return self.obj_id
+
+    def object_type(self):
+        return self.obj_type
+
+    def name(self):
+        return self.obj_id
+
+    def update_state(self):
+        self.polls += 1
+        self.state_updated_at = time.time()
+        self.json_state = {"polls": self.polls}
+        return True
+
+
+class _InlineExecutor:
+
+    @staticmethod
+    def submit(device, func, *args):
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+
+class PollingSchedulerTests(unittest.TestCase):
+
+    def _scheduler(self, devices, **kwargs):
+        kwargs.setdefault("jitter", 0)
+        return PollingScheduler(devices, executor=_InlineExecutor(), seed=0, **kwargs)
+
+    def test_intervals(self):
+        lock = _Device("1")
+        tank = _Device("2", device_types.PROPANE_TANK)
+        other = _Device("3", "toaster")
+        scheduler = self._scheduler([], intervals={_Device: None, device_types.LOCK: 10}, default_interval=99)
+        self.assertIsNone(scheduler.interval(lock))
+        scheduler = self._scheduler([], intervals={device_types.LOCK: 10}, default_interval=99)
+        self.assertEqual(scheduler.interval(lock), 10)
+        self.assertEqual(scheduler.interval(tank), 6 * 3600)
+        self.assertEqual(scheduler.interval(other), 99)
+        scheduler.set_interval(lock, 5)
+        self.assertEqual(scheduler.interval(lock), 5)
+
+    def test_devices_are_polled_at_their_interval(self):
+        lock = _Device("1")
+        tank = _Device("2", device_types.PROPANE_TANK)
+        scheduler = self._scheduler([lock, tank])
+        now = time.time()
+        scheduler.poll_due(now + 31)
+        self.assertEqual((lock.polls, tank.polls), (1, 0))
+        self.assertAlmostEqual(scheduler.poll_due(now + 31), 30, delta=1)
+        scheduler.poll_due(now + 62)
+        self.assertEqual(lock.polls, 2)
+
+    def test_budget(self):
+        devices = [_Device(str(object_id)) for object_id in range(5)]
+        scheduler = self._scheduler(devices, budget=2)
+        now = time.time()
+        self.assertGreater(scheduler.poll_due(now + 31), 0)
+        self.assertEqual(sum(device.polls for device in devices), 2)
+        scheduler.poll_due(now + 95)
+        self.assertEqual(sum(device.polls for device in devices), 4)
+
+    def test_pubnub_updates_slow_polling_down(self):
+        lock = _Device("1", pubnub_channel="channel")
+        scheduler = self._scheduler([lock], pubnub_slowdown=4)
+        now = time.time()
+        scheduler.poll_due(now + 31)
+        self.assertEqual(lock.polls, 1)
+        # A pubnub update shortly before the next refresh is due.
+        lock.state_updated_at = now + 55
+        self.assertIsNotNone(scheduler.poll_due(now + 62))
+        self.assertEqual(lock.polls, 1)
+        self.assertAlmostEqual(scheduler.poll_due(now + 62), 55 + 120 - 62, delta=1)
+
+    def test_devices_sharing_an_object_are_polled_once(self):
+        first = _Device("1")
+        second = _Device("1")
+        third = _Device("1")
+        scheduler = self._scheduler([first, second, third])
+        scheduler.poll_due(time.time() + 31)
+        self.assertEqual((first.polls, second.polls, third.polls), (1, 0, 0))
+        self.assertIs(second.json_state, first.json_state)
+        self.assertIs(third.json_state, first.json_state)
+        scheduler.remove(first)
+        scheduler.poll_due(time.time() + 62)
+        self.assertEqual((first.polls, second.polls), (1, 1))
+        self.assertIs(third.json_state, second.json_state)
+
+    def test_removed_devices_leave_nothing_behind(self):
+        lock = _Device("1", pubnub_channel="channel")
+        scheduler = self._scheduler([lock])
+        scheduler.set_interval(lock, 10)
+        now = time.time()
+        scheduler.poll_due(now + 11)
+        lock.state_updated_at = now + 15
+        scheduler.poll_due(now + 21)
+        scheduler.remove(lock)
+        # pylint: disable=protected-access
+        for state in (scheduler._devices, scheduler._due, scheduler._device_intervals, scheduler._polled_at,
+                      scheduler._pushed_at):
+            self.assertEqual(state, {})
+        # A new device for the same object starts from scratch.
+        scheduler.add(_Device("1"))
+        self.assertEqual(scheduler.interval(lock), 30)
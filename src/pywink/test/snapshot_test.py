@@ -0,0 +1,69 @@
+import math
+import unittest
+from array import array
+
+from .. import snapshot as snapshot_module
+from ..api import get_devices_from_response_dict
+from ..devices import types as device_types
+from ..snapshot import MISSING_BOOL, row_key, snapshot
+from ..testing import generate_account, load_fixtures
+
+
+class SnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        super(SnapshotTests, self).setUp()
+        account = generate_account(200, seed=3)
+        self.devices = get_devices_from_response_dict({"data": account["wink_devices"]},
+                                                      device_types.ALL_SUPPORTED_DEVICES)
+
+    def test_columns_match_getters(self):
+        fleet = snapshot(self.devices, use_numpy=False)
+        self.assertEqual(len(fleet), len(self.devices))
+        self.assertIsInstance(fleet["battery"], array)
+        for device in self.devices:
+            row = fleet.row(device)
+            self.assertEqual(row["available"], int(bool(device.available())))
+            if device.battery_level() is None:
+                self.assertTrue(math.isnan(row["battery"]))
+            else:
+                self.assertEqual(row["battery"], device.battery_level())
+            if device.object_type() == device_types.LOCK:
+                self.assertEqual(row["locked"], int(device.state()))
+
+    def test_select(self):
+        fleet = snapshot(self.devices, columns=["available"], use_numpy=False)
+        offline = fleet.select(value == 0 for value in fleet["available"])
+        self.assertEqual(offline, [row_key(device) for device in self.devices if not device.available()])
+        self.assertEqual(list(fleet.columns), ["available"])
+
+    def test_missing_values(self):
+        fleet = snapshot(self.devices, use_numpy=False)
+        hub = [device for device in self.devices if device.object_type() == device_types.HUB][0]
+        self.assertEqual(fleet.row(row_key(hub))["locked"], MISSING_BOOL)
+
+    @unittest.skipIf(snapshot_module.numpy is None, "NumPy is not installed")
+    def test_numpy_columns(self):
+        fleet = snapshot(self.devices)
+        self.assertEqual(str(fleet["battery"].dtype), "float64")
+        self.assertEqual(fleet.select(fleet["available"] == 0),
+                         [row_key(device) for device in self.devices if not device.available()])
+
+    def test_sensors_of_one_pod_have_their_own_rows(self):
+        items = [item for item in load_fixtures()["wink_devices"] if item["object_type"] == device_types.SENSOR_POD]
+        sensors = get_devices_from_response_dict({"data": items}, [device_types.SENSOR_POD])
+        object_ids = [sensor.object_id() for sensor in sensors]
+        pod_id = max(object_ids, key=object_ids.count)
+        pod = [sensor for sensor in sensors if sensor.object_id() == pod_id]
+        self.assertGreater(len(pod), 1)
+        for sensor in pod:
+            sensor.json_state = dict(sensor.json_state, last_reading=dict(sensor.json_state["last_reading"]))
+        pod[0].json_state["last_reading"]["connection"] = False
+        fleet = snapshot(sensors, use_numpy=False)
+        self.assertEqual(len(fleet), len(sensors))
+        self.assertEqual(fleet.row(pod[0])["available"], 0)
+        self.assertEqual([fleet.row(sensor)["available"] for sensor in pod[1:]], [1] * (len(pod) - 1))
+        offline = fleet.select(value == 0 for value in fleet["available"])
+        self.assertEqual(offline, [row_key(pod[0])])
+        self.assertEqual([fleet.capabilities[fleet.keys.index(row_key(sensor))] for sensor in pod],
+                         [sensor.capability() for sensor in pod])
@@ -0,0 +1,93 @@
+import json
+import unittest
+
+from .. import api, instrumentation
+from ..api import get_all_devices, get_devices_from_response_dict, wink_api_fetch
+from ..devices import types as device_types
+from ..streaming import parse
+from ..testing import FakeWinkServer, generate_account
+
+DOCUMENT = {"data": [{"object_id": "1", "name": "Café ☃", "last_reading": {"brightness": 0.25}},
+                     {"object_id": "2", "values": [1, 22, 333, True, None]}],
+            "errors": [], "pagination": {"count": 12345}, "version": 1.5}
+
+
+def _chunks(content, size):
+    return [content[index:index + size] for index in range(0, len(content), size)]
+
+
+class ParseTests(unittest.TestCase):
+
+    def test_same_as_json_loads(self):
+        content = json.dumps(DOCUMENT, indent=2, ensure_ascii=False).encode("utf-8")
+        for size in (1, 2, 3, 7, 64, len(content)):
+            document, read = parse(_chunks(content, size))
+            self.assertEqual(document, DOCUMENT)
+            self.assertEqual(read, len(content))
+        self.assertEqual(parse([b'{}'])[0], {})
+        self.assertEqual(parse([b'{"data": []}'])[0], {"data": []})
+        self.assertEqual(parse([b'{"data": 1', b'2}'])[0], {"data": 12})
+        self.assertEqual(parse([b'{"a": 1', b'.', b'5e', b'-', b'1, "b": tr', b'ue}'])[0], {"a": 0.15, "b": True})
+
+    def test_items_are_handed_over_while_reading(self):
+        content = json.dumps(DOCUMENT).encode("utf-8")
+        chunks = _chunks(content, 8)
+        read = []
+        seen = []
+
+        def reader():
+            for chunk in chunks:
+                read.append(chunk)
+                yield chunk
+
+        def on_item(item):
+            seen.append((item["object_id"], len(read)))
+        parse(reader(), on_item)
+        self.assertEqual([object_id for object_id, _ in seen], ["1", "2"])
+        self.assertLess(seen[0][1], len(chunks))
+
+    def test_invalid(self):
+        for content in (b'', b'[]', b'{"data": [{"a": 1}', b'{"data": [] x', b'{"a": 1} {}', b'{1: 2}'):
+            with self.assertRaises(ValueError):
+                parse(_chunks(content, 3))
+
+
+class StreamedInventoryTests(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakeWinkServer(generate_account(30, hub_count=2)).start()
+        self.fake.install()
+        instrumentation.reset_stats()
+
+    def tearDown(self):
+        api.disable_conditional_requests()
+        self.fake.uninstall()
+        self.fake.stop()
+
+    def _names(self, devices):
+        return sorted((device.object_type(), device.object_id(), device.name()) for device in devices)
+
+    def test_compressed_inventory(self):
+        self.fake.compress = True
+        devices = get_all_devices()
+        expected = get_devices_from_response_dict({"data": self.fake.account["wink_devices"]},
+                                                  device_types.ALL_SUPPORTED_DEVICES)
+        self.assertEqual(self._names(devices), self._names(expected))
+        stats = instrumentation.get_stats()["requests"]
+        self.assertLess(stats["cloud:wink_devices"]["bytes"], len(json.dumps(self.fake.account["wink_devices"])))
+
+    def test_devices_of_one_type(self):
+        bulbs = api.get_light_bulbs()
+        self.assertTrue(bulbs)
+        self.assertTrue(all(bulb.object_type() == device_types.LIGHT_BULB for bulb in bulbs))
+        # The cached inventory gives the same devices.
+        self.assertEqual(self._names(api.get_light_bulbs()), self._names(bulbs))
+
+    def test_not_modified_inventory_builds_devices(self):
+        api.enable_conditional_requests()
+        first = get_all_devices()
+        api._account().last_update = None  # pylint: disable=protected-access
+        second = get_all_devices()
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 304)], 1)
+        self.assertEqual(self._names(second), self._names(first))
+        self.assertEqual(wink_api_fetch(), api._account().all_devices)  # pylint: disable=protected-access
@@ -0,0 +1,99 @@
+import time
+import unittest
+
+import requests
+
+from .. import api, instrumentation, timeouts
+from ..api import WinkAPIException, get_all_devices, get_hubs, wink_api_fetch
+from ..devices import types as device_types
+from ..testing import FakeWinkServer, generate_account
+
+
+class DeadlineTests(unittest.TestCase):
+
+    def test_no_deadline(self):
+        self.assertIsNone(timeouts.remaining())
+        self.assertEqual(timeouts.timeout(5), 5)
+        self.assertTrue(timeouts.allows(1000))
+
+    def test_nested_deadline_can_not_extend(self):
+        with timeouts.deadline(1):
+            with timeouts.deadline(60):
+                self.assertLessEqual(timeouts.remaining(), 1)
+            with timeouts.deadline(0.5):
+                self.assertLessEqual(timeouts.remaining(), 0.5)
+            with timeouts.deadline(None):
+                self.assertLessEqual(timeouts.remaining(), 1)
+            self.assertGreater(timeouts.remaining(), 0.5)
+            self.assertLessEqual(timeouts.timeout(10), 1)
+            self.assertEqual(timeouts.timeout(0.1), 0.1)
+            self.assertFalse(timeouts.allows(2))
+        self.assertIsNone(timeouts.remaining())
+
+    def test_expired_deadline(self):
+        with timeouts.deadline(0):
+            with self.assertRaises(timeouts.DeadlineExceeded):
+                timeouts.timeout(5)
+
+
+class RequestDeadlineTests(unittest.TestCase):
+
+    def setUp(self):
+        self.saved = (api.CLOUD_TIMEOUT, api.LOCAL_TIMEOUT, api.DEADLINE, api.READ_RETRIES, api.RETRY_BACKOFF,
+                      api.ALLOW_LOCAL_CONTROL)
+        api.set_timeouts(retry_backoff=0.01)
+        account = generate_account(10, hub_count=1, mix={device_types.LIGHT_BULB: 1})
+        self.fake = FakeWinkServer(account).start()
+        self.fake.install()
+        instrumentation.reset_stats()
+
+    def tearDown(self):
+        (api.CLOUD_TIMEOUT, api.LOCAL_TIMEOUT, api.DEADLINE, api.READ_RETRIES, api.RETRY_BACKOFF,
+         api.ALLOW_LOCAL_CONTROL) = self.saved
+        self.fake.uninstall()
+        self.fake.stop()
+
+    def test_cloud_timeout(self):
+        self.fake.latency = 0.5
+        api.set_timeouts(cloud_timeout=0.1, read_retries=0)
+        start = time.time()
+        with self.assertRaises(requests.exceptions.Timeout):
+            wink_api_fetch()
+        self.assertLess(time.time() - start, 0.4)
+
+    def test_deadline_holds_over_retries(self):
+        self.fake.latency = 0.2
+        api.set_timeouts(cloud_timeout=0.15, deadline=0.5, read_retries=10)
+        start = time.time()
+        with self.assertRaises(requests.exceptions.Timeout):
+            wink_api_fetch()
+        self.assertLess(time.time() - start, 0.8)
+
+    def test_reads_are_retried(self):
+        api.set_timeouts(read_retries=2)
+        self.fake.error_rate = 1.0
+        with self.assertRaises(WinkAPIException):
+            wink_api_fetch()
+        self.assertEqual(self.fake.request_counts[("cloud", "GET", 500)], 3)
+        self.assertEqual(instrumentation.get_stats()["fallbacks"][instrumentation.FALLBACK_RETRY], 2)
+
+    def test_writes_are_not_retried(self):
+        api.ALLOW_LOCAL_CONTROL = False
+        bulb = get_all_devices()[-1]
+        self.fake.error_rate = 1.0
+        bulb.api_interface.set_device_state(bulb, {"desired_state": {"powered": True}})
+        self.assertEqual(self.fake.request_counts[("cloud", "PUT", 500)], 1)
+
+    def test_deadline_covers_local_attempt_and_cloud_fallback(self):
+        api.ALLOW_LOCAL_CONTROL = True
+        get_hubs()
+        bulb = [device for device in get_all_devices() if device.object_type() == device_types.LIGHT_BULB][0]
+        self.fake.hub_latency = 0.5
+        self.fake.latency = 0.5
+        # The hub times out after 0.25 seconds, which leaves the cloud 0.15.
+        api.set_timeouts(local_timeout=0.25, deadline=0.4, read_retries=0)
+        start = time.time()
+        with self.assertRaises(requests.exceptions.Timeout):
+            bulb.api_interface.local_get_state(bulb)
+        self.assertLess(time.time() - start, 0.7)
+        self.assertEqual(instrumentation.get_stats()["fallbacks"][instrumentation.FALLBACK_LOCAL_ERROR], 1)
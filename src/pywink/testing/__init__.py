@@ -0,0 +1,7 @@
+"""
+Offline stand-ins for the Wink APIs, for load testing and benchmarking.
+"""
+from pywink.testing.server import FakeWinkServer, load_fixtures
+from pywink.testing.accounts import AccountGenerator, generate_account
+
+__all__ = ["FakeWinkServer", "load_fixtures", "AccountGenerator", "generate_account"]
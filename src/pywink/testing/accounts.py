@@ -0,0 +1,200 @@
+"""
+Generate large synthetic Wink accounts from the fixture corpus.
+"""
+import copy
+import hashlib
+import random
+
+from ..devices import types as device_types
+from .server import load_fixtures
+
+# Hubs that support the local API, used as the template for generated hubs.
+HUB_TEMPLATE_MODEL = "wink_hub2"
+DEVICES_PER_HUB = 100
+FIRST_OBJECT_ID = 1000000
+
+
+class AccountGenerator:
+    """
+    Clones fixture objects into an account of the requested size.
+
+    Every clone gets a unique object_id, pubnub channel and name. Hub
+    attached clones are spread over the generated hubs and numbered with
+    local_ids that are unique per hub. Readings that vary between real
+    devices (power, brightness, battery, connection) are randomized from
+    the seed, so the same arguments always produce the same account.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, fixtures=None, seed=0, user_id="100000", offline_rate=0.02):
+        self.fixtures = fixtures if fixtures is not None else load_fixtures()
+        self.user_id = user_id
+        self.offline_rate = offline_rate
+        self._random = random.Random(seed)
+        self._next_id = FIRST_OBJECT_ID
+        self._local_ids = {}
+        self._gang_ids = {}
+        self._templates = {}
+        self._hub_template = None
+        for item in self.fixtures.get("wink_devices", []):
+            if item.get("object_type") == device_types.HUB:
+                if self._hub_template is None or item.get("manufacturer_device_model") == HUB_TEMPLATE_MODEL:
+                    self._hub_template = item
+                continue
+            self._templates.setdefault(item.get("object_type"), []).append(item)
+
+    # pylint: disable=too-many-arguments, too-many-locals
+    def generate(self, device_count, hub_count=None, mix=None, group_count=None,
+                 scene_count=None, robot_count=None):
+        """
+        Args:
+            device_count (Int): Number of non hub objects in wink_devices.
+            hub_count (Int, optional): Number of hubs, defaults to one per
+                DEVICES_PER_HUB devices.
+            mix (Dict, optional): Relative weight of each object_type, defaults
+                to every fixture being equally likely.
+            group_count, scene_count, robot_count (Int, optional): Defaults to
+                one for every 50 devices.
+        Returns:
+            account (Dict): Lists of objects keyed by users/me end point, in
+                the layout returned by load_fixtures.
+        """
+        if hub_count is None:
+            hub_count = max(1, -(-device_count // DEVICES_PER_HUB))
+        default_count = device_count // 50
+        hubs = [self._clone_hub() for _ in range(hub_count)]
+        hub_ids = [hub["object_id"] for hub in hubs]
+        types, weights = self._weights(mix)
+        devices = []
+        for _ in range(device_count):
+            object_type = self._choice(types, weights)
+            template = self._random.choice(self._templates[object_type])
+            devices.append(self._clone_device(template, hub_ids))
+        by_type = {}
+        for device in devices:
+            by_type.setdefault(device["object_type"], []).append(device)
+        return {
+            "wink_devices": hubs + devices,
+            "groups": self._clone_all("groups", _default(group_count, default_count), by_type),
+            "scenes": self._clone_all("scenes", _default(scene_count, default_count), by_type),
+            "robots": self._clone_all("robots", _default(robot_count, default_count), by_type)
+        }
+
+    def _weights(self, mix):
+        if mix is None:
+            types = sorted(self._templates)
+            return types, [len(self._templates[_type]) for _type in types]
+        unknown = [_type for _type in mix if _type not in self._templates]
+        if unknown:
+            raise ValueError("No fixtures for object types {}".format(", ".join(sorted(unknown))))
+        types = sorted(mix)
+        return types, [mix[_type] for _type in types]
+
+    def _choice(self, types, weights):
+        point = self._random.uniform(0, sum(weights))
+        for _type, weight in zip(types, weights):
+            point -= weight
+            if point <= 0:
+                return _type
+        return types[-1]
+
+    def _new_id(self):
+        object_id = str(self._next_id)
+        self._next_id += 1
+        return object_id
+
+    def _identify(self, item, object_id):
+        object_type = item.get("object_type")
+        item["object_id"] = object_id
+        if "{}_id".format(object_type) in item:
+            item["{}_id".format(object_type)] = object_id
+        if item.get("name"):
+            item["name"] = "{} {}".format(item["name"], object_id)
+        subscription = item.get("subscription")
+        if subscription and subscription.get("pubnub"):
+            digest = hashlib.sha1("{}-{}".format(object_type, object_id).encode("utf-8")).hexdigest()
+            subscription["pubnub"]["channel"] = "{}|{}-{}|user-{}".format(digest, object_type, object_id,
+                                                                          self.user_id)
+
+    def _clone_hub(self):
+        hub = copy.deepcopy(self._hub_template)
+        object_id = self._new_id()
+        self._identify(hub, object_id)
+        hub["hub_id"] = object_id
+        reading = hub.setdefault("last_reading", {})
+        reading["local_control_id"] = "{:032x}".format(self._random.getrandbits(128))
+        reading["ip_address"] = "10.{}.{}.{}".format(*self._random.sample(range(1, 255), 3))
+        reading["connection"] = True
+        return hub
+
+    def _clone_device(self, template, hub_ids):
+        device = copy.deepcopy(template)
+        object_id = self._new_id()
+        self._identify(device, object_id)
+        for key in ("outlets", "dials", "alarms"):
+            for child in device.get(key) or []:
+                self._identify(child, self._new_id())
+                if "parent_object_id" in child:
+                    child["parent_object_id"] = object_id
+        if template.get("hub_id") is not None or template.get("local_id") is not None:
+            hub_id = self._random.choice(hub_ids)
+            device["hub_id"] = hub_id
+            if template.get("local_id") is not None:
+                device["local_id"] = self._local_id(hub_id, template["local_id"])
+            if template.get("gang_id") is not None:
+                device["gang_id"] = self._gang_ids.setdefault((hub_id, template["gang_id"]), self._new_id())
+        self._vary(device.get("last_reading"))
+        return device
+
+    def _local_id(self, hub_id, template_local_id):
+        number = self._local_ids.get(hub_id, 0) + 1
+        self._local_ids[hub_id] = number
+        if "." in str(template_local_id):
+            # Gang members keep the "gang.member" format.
+            return "{}.{}".format(number, str(template_local_id).split(".")[1])
+        return str(number)
+
+    def _vary(self, reading):
+        if not reading:
+            return
+        if "connection" in reading:
+            reading["connection"] = self._random.random() >= self.offline_rate
+        if isinstance(reading.get("powered"), bool):
+            reading["powered"] = self._random.random() < 0.5
+        if isinstance(reading.get("brightness"), (int, float)):
+            reading["brightness"] = round(self._random.random(), 2)
+        if isinstance(reading.get("battery"), (int, float)):
+            reading["battery"] = round(self._random.uniform(0.05, 1.0), 2)
+        if isinstance(reading.get("temperature"), (int, float)):
+            reading["temperature"] = round(reading["temperature"] + self._random.uniform(-5, 5), 1)
+
+    def _clone_all(self, end_point, count, by_type):
+        templates = self.fixtures.get(end_point) or []
+        if not templates:
+            return []
+        clones = []
+        for _ in range(count):
+            clone = copy.deepcopy(self._random.choice(templates))
+            self._identify(clone, self._new_id())
+            for member in clone.get("members") or []:
+                candidates = by_type.get(member.get("object_type"))
+                if candidates:
+                    target = self._random.choice(candidates)
+                    member["object_id"] = target["object_id"]
+                    if "hub_id" in member:
+                        member["hub_id"] = target.get("hub_id")
+                    if "local_id" in member:
+                        member["local_id"] = target.get("local_id")
+            clones.append(clone)
+        return clones
+
+
+def _default(value, default):
+    return default if value is None else value
+
+
+def generate_account(device_count, hub_count=None, mix=None, seed=0, fixtures=None):
+    """
+    Generate an account with device_count devices, see AccountGenerator.
+    """
+    return AccountGenerator(fixtures=fixtures, seed=seed).generate(device_count, hub_count=hub_count, mix=mix)
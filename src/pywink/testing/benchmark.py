@@ -0,0 +1,256 @@
+"""
+Benchmarks for the inventory parse, device build and dispatch hot paths.
+
+Run with "python -m pywink.testing.benchmark", see --help for options.
+Accounts are generated from a fixed seed and every benchmark reports the
+best of several runs, so results are comparable between commits.
+"""
+import argparse
+import copy
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from .. import api
+from ..devices import types as device_types
+from ..devices.factory import build_device
+from .accounts import generate_account
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+# The getters served from the cached /users/me/wink_devices response.
+GETTERS = ["get_all_devices", "get_light_bulbs", "get_switches", "get_sensors", "get_locks",
+           "get_eggtrays", "get_garage_doors", "get_shades", "get_powerstrips", "get_sirens",
+           "get_keys", "get_piggy_banks", "get_smoke_and_co_detectors", "get_thermostats",
+           "get_fans", "get_door_bells", "get_remotes", "get_sprinklers", "get_buttons",
+           "get_gangs", "get_cameras", "get_air_conditioners", "get_propane_tanks",
+           "get_water_heaters", "get_cloud_clocks"]
+
+# Capability lookups per device class, called on every device that has them.
+CAPABILITY_METHODS = ["supports_hue_saturation", "supports_xy_color", "supports_temperature",
+                      "binary_state_name", "fan_speeds", "fan_directions", "fan_timer_range",
+                      "fan_modes", "hvac_modes", "has_fan", "capability"]
+
+
+class BenchmarkContext:
+    """
+    An account and the devices built from it, shared by the benchmarks of
+    one size.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.account = generate_account(size, seed=seed)
+        self.items = self.account["wink_devices"]
+        self.response = {"data": self.items}
+        self.devices = api.get_devices_from_response_dict(self.response, device_types.ALL_SUPPORTED_DEVICES)
+
+
+def _bench_parse(context):
+    def run():
+        api.get_devices_from_response_dict(context.response, device_types.ALL_SUPPORTED_DEVICES)
+    return run, len(context.items)
+
+
+def _bench_build(object_type):
+    def setup(context):
+        items = [item for item in context.items if item.get("object_type") == object_type]
+        api_interface = api.WinkApiInterface()
+
+        def run():
+            for item in items:
+                build_device(item, api_interface)
+        return run, len(items)
+    return setup
+
+
+def _bench_getter(name):
+    getter = getattr(api, name)
+
+    def setup(context):
+        def run():
+            api.ALL_DEVICES = context.response
+            api.LAST_UPDATE = time.time()
+            getter()
+        return run, len(context.items)
+    return setup
+
+
+def _bench_pubnub(context):
+    channels = {}
+    for device in context.devices:
+        if device.pubnub_channel is not None:
+            channels.setdefault(device.pubnub_channel, []).append(device)
+    messages = []
+    for item in context.items:
+        channel = ((item.get("subscription") or {}).get("pubnub") or {}).get("channel")
+        if channel in channels:
+            message = copy.deepcopy(item)
+            # Sub devices (outlets, dials) read their parent from "data".
+            message["data"] = copy.deepcopy(item)
+            messages.append((channel, message))
+
+    def run():
+        for channel, message in messages:
+            for device in channels[channel]:
+                device.pubnub_update(message)
+    return run, len(messages)
+
+
+def _bench_capabilities(context):
+    calls = []
+    for device in context.devices:
+        for method in CAPABILITY_METHODS:
+            if hasattr(device, method):
+                calls.append(getattr(device, method))
+
+    def run():
+        for call in calls:
+            call()
+    return run, len(calls)
+
+
+def _bench_local_merge(context):
+    merges = []
+    for device in context.devices:
+        if device.local_id() is not None and device.json_state.get("last_reading") is not None:
+            reading = dict(device.json_state["last_reading"])
+            merges.append((device, {"data": {"last_reading": reading}}))
+
+    def run():
+        for device, response in merges:
+            api.merge_local_state(device, response)
+    return run, len(merges)
+
+
+def benchmarks():
+    """
+    Returns:
+        benchmarks (List): (name, setup) pairs, setup takes a BenchmarkContext
+            and returns the callable to time and the number of operations it
+            performs.
+    """
+    _benchmarks = [("get_devices_from_response_dict", _bench_parse)]
+    for object_type in device_types.ALL_SUPPORTED_DEVICES:
+        if object_type not in (device_types.GROUP, device_types.SCENE, device_types.ROBOT):
+            _benchmarks.append(("build_device[{}]".format(object_type), _bench_build(object_type)))
+    for name in GETTERS:
+        _benchmarks.append((name, _bench_getter(name)))
+    _benchmarks.append(("pubnub_update", _bench_pubnub))
+    _benchmarks.append(("capabilities", _bench_capabilities))
+    _benchmarks.append(("merge_local_state", _bench_local_merge))
+    return _benchmarks
+
+
+def _time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def _peak_memory(func):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes=None, repeat=5, seed=0, select=None):
+    """
+    Run the benchmarks.
+
+    Args:
+        sizes (List, optional): Account sizes in devices, DEFAULT_SIZES by default.
+        repeat (Int, optional): Runs per benchmark, the fastest is reported.
+        seed (Int, optional): Seed of the generated accounts.
+        select (String, optional): Only run benchmarks whose name contains it.
+    Returns:
+        results (List): One dict per benchmark and size with the keys name,
+            size, operations, seconds and peak_bytes.
+    """
+    results = []
+    saved_cache = api.LAST_UPDATE, api.ALL_DEVICES
+    try:
+        for size in sizes or DEFAULT_SIZES:
+            context = BenchmarkContext(size, seed)
+            for name, setup in benchmarks():
+                if select is not None and select not in name:
+                    continue
+                func, operations = setup(context)
+                results.append({"name": name, "size": size, "operations": operations,
+                                "seconds": _time(func, repeat), "peak_bytes": _peak_memory(func)})
+    finally:
+        api.LAST_UPDATE, api.ALL_DEVICES = saved_cache
+    return results
+
+
+def compare(results, baseline, threshold=1.2):
+    """
+    Find benchmarks that got slower than a previous run.
+
+    Args:
+        results (List): The output of run().
+        baseline (List): An earlier output of run().
+        threshold (Float, optional): Slowdown ratio that counts as a regression.
+    Returns:
+        regressions (List): (name, size, ratio) for every regression.
+    """
+    previous = {(result["name"], result["size"]): result["seconds"] for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get((result["name"], result["size"]))
+        if before and result["seconds"] / before > threshold:
+            regressions.append((result["name"], result["size"], result["seconds"] / before))
+    return regressions
+
+
+def format_results(results):
+    lines = ["{:<42} {:>6} {:>8} {:>12} {:>12} {:>12}".format(
+        "benchmark", "size", "ops", "total ms", "us/op", "peak KiB")]
+    for result in results:
+        per_op = result["seconds"] / result["operations"] * 1e6 if result["operations"] else 0
+        lines.append("{:<42} {:>6} {:>8} {:>12.3f} {:>12.3f} {:>12.1f}".format(
+            result["name"], result["size"], result["operations"], result["seconds"] * 1e3,
+            per_op, result["peak_bytes"] / 1024.0))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--select", help="only run benchmarks whose name contains this")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat, args.seed, args.select)
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for name, size, ratio in regressions:
+            print("REGRESSION {} size {}: {:.2f}x slower".format(name, size, ratio))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,470 @@
+"""
+An in-process stand-in for the Wink cloud API and the hubs' local API.
+"""
+import copy
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from .. import api
+from ..devices import types as device_types
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "test", "devices", "api_responses")
+CLIENT_ID = "fake_client_id"
+CLIENT_SECRET = "fake_client_secret"
+
+CLOUD = "cloud"
+HUB = "hub"
+
+_OBJECT_PATTERN = re.compile(r'^/([a-z_]+)/([^/]+)(/activate)?$')
+_USERS_ME_PATTERN = re.compile(r'^/users/me/([a-z_]+)$')
+
+
+def load_fixtures(fixture_dir=FIXTURE_DIR):
+    """
+    Load the API response fixtures into the account layout served by the
+    Wink API.
+
+    Args:
+        fixture_dir (String, optional): Directory holding one JSON object per
+            file, groups are read from its "groups" sub directory.
+    Returns:
+        account (Dict): Lists of objects keyed by the users/me end point
+            that returns them, "wink_devices", "groups", "scenes" and "robots".
+    """
+    account = {"wink_devices": [], "groups": [], "scenes": [], "robots": []}
+    for directory in (fixture_dir, os.path.join(fixture_dir, "groups")):
+        if not os.path.isdir(directory):
+            continue
+        for json_file in sorted(os.listdir(directory)):
+            path = os.path.join(directory, json_file)
+            if not os.path.isfile(path) or not json_file.endswith(".json"):
+                continue
+            with open(path) as _json_file:
+                item = json.load(_json_file)
+            account[_end_point_for(item)].append(item)
+    return account
+
+
+def _end_point_for(item):
+    object_type = item.get("object_type")
+    if object_type == device_types.GROUP:
+        return "groups"
+    if object_type == device_types.SCENE:
+        return "scenes"
+    if object_type == device_types.ROBOT:
+        return "robots"
+    return "wink_devices"
+
+
+def _get_free_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("localhost", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def _apply_state(obj, state):
+    """
+    Merge a PUT body into a stored object. Desired state is reported back as
+    the new reading, as if the device had reached it.
+    """
+    for key, value in state.items():
+        if key == "desired_state" and isinstance(value, dict):
+            obj.setdefault("desired_state", {}).update(value)
+            obj.setdefault("last_reading", {}).update(value)
+        elif isinstance(value, list) and isinstance(obj.get(key), list):
+            for item, change in zip(obj[key], value):
+                if isinstance(item, dict) and isinstance(change, dict):
+                    _apply_state(item, change)
+        elif isinstance(value, dict) and isinstance(obj.get(key), dict):
+            _apply_state(obj[key], value)
+        else:
+            obj[key] = value
+
+
+def _apply_group_state(group, state):
+    aggregation = group.get("reading_aggregation") or {}
+    member_count = max(len(group.get("members") or []), 1)
+    for key, value in (state.get("desired_state") or {}).items():
+        reading = aggregation.get(key)
+        if not isinstance(reading, dict):
+            continue
+        if "true_count" in reading:
+            reading["true_count"] = member_count if value else 0
+            reading["false_count"] = 0 if value else member_count
+        if "average" in reading:
+            reading["average"] = value
+        if "mode" in reading:
+            reading["mode"] = value
+
+
+class FakeWinkServer:
+    """
+    Serves an account's devices over HTTP the way the Wink cloud and the
+    local API of its hubs do.
+
+    Latency can be a number of seconds or a callable returning one. Error
+    rates are the share of requests answered with a 500 (cloud) or a
+    dropped connection (hub); unauthorized_rate is the share of cloud
+    requests answered with a 401 regardless of the token sent. throttle()
+    answers the next cloud requests with a 429. With compress set, bodies
+    are gzipped for clients that accept it.
+    """
+
+    # pylint: disable=too-many-arguments, too-many-instance-attributes
+    def __init__(self, account=None, latency=0, hub_latency=0, error_rate=0.0,
+                 hub_error_rate=0.0, unauthorized_rate=0.0, seed=None):
+        self.account = copy.deepcopy(account) if account is not None else load_fixtures()
+        self.latency = latency
+        self.hub_latency = hub_latency
+        self.error_rate = error_rate
+        self.hub_error_rate = hub_error_rate
+        self.unauthorized_rate = unauthorized_rate
+        self.request_counts = Counter()
+        self.throttled_requests = 0
+        self.retry_after = None
+        self.compress = False
+        self.offline_hubs = set()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._access_tokens = set()
+        self._refresh_tokens = set()
+        self._local_tokens = {}
+        self._token_count = 0
+        self._objects = {}
+        self._local_objects = {}
+        self._servers = []
+        self._saved = None
+        self.port = None
+        self.hub_port = None
+        self._index()
+
+    @property
+    def url(self):
+        return "http://localhost:{}".format(self.port)
+
+    def _index(self):
+        for end_point, items in self.account.items():
+            for item in items:
+                self._index_item(item)
+                if end_point == "wink_devices" and item.get("object_type") == device_types.HUB:
+                    # All hubs are served by the local stand-in.
+                    item.setdefault("last_reading", {})["ip_address"] = "127.0.0.1"
+
+    def _index_item(self, item):
+        object_type = item.get("object_type")
+        self._objects[(object_type, str(item.get("object_id")))] = item
+        local_id = item.get("local_id")
+        if local_id is not None:
+            key = (str(item.get("hub_id")), object_type, str(local_id).split(".")[0])
+            self._local_objects.setdefault(key, item)
+
+    def start(self):
+        self.port = _get_free_port()
+        self.hub_port = _get_free_port()
+        for port, handler in ((self.port, _CloudRequestHandler), (self.hub_port, _HubRequestHandler)):
+            server = _ThreadingHTTPServer(("localhost", port), handler)
+            server.fake = self
+            thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+            thread.daemon = True
+            thread.start()
+            self._servers.append(server)
+        return self
+
+    def stop(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def install(self):
+        """
+        Point pywink at this server and log in with a fresh token. The
+        previous URLs and credentials are restored by uninstall.
+        """
+        self._saved = (api.WinkApiInterface.BASE_URL, api.WinkApiInterface.LOCAL_BASE_URL,
+                       api.CLIENT_ID, api.CLIENT_SECRET, api.REFRESH_TOKEN, dict(api.API_HEADERS),
+                       dict(api.LOCAL_API_HEADERS))
+        api.WinkApiInterface.BASE_URL = self.url
+        api.WinkApiInterface.LOCAL_BASE_URL = "http://{}:" + str(self.hub_port)
+        api.LAST_UPDATE = None
+        api.HUBS.clear()
+        access_token, refresh_token = self.issue_tokens()
+        api.set_wink_credentials(CLIENT_ID, CLIENT_SECRET, access_token, refresh_token)
+
+    def uninstall(self):
+        if self._saved is not None:
+            (api.WinkApiInterface.BASE_URL, api.WinkApiInterface.LOCAL_BASE_URL,
+             api.CLIENT_ID, api.CLIENT_SECRET, api.REFRESH_TOKEN, api_headers, local_api_headers) = self._saved
+            api.API_HEADERS.clear()
+            api.API_HEADERS.update(api_headers)
+            api.LOCAL_API_HEADERS = local_api_headers
+            self._saved = None
+        api.LAST_UPDATE = None
+        api.HUBS.clear()
+
+    def __enter__(self):
+        self.start()
+        self.install()
+        return self
+
+    def __exit__(self, *args):
+        self.uninstall()
+        self.stop()
+
+    def issue_tokens(self):
+        with self._lock:
+            self._token_count += 1
+            access_token = "access-{}".format(self._token_count)
+            refresh_token = "refresh-{}".format(self._token_count)
+            self._access_tokens.add(access_token)
+            self._refresh_tokens.add(refresh_token)
+        return access_token, refresh_token
+
+    def expire_tokens(self):
+        """
+        Invalidate every access token, the next cloud request gets a 401.
+        """
+        with self._lock:
+            self._access_tokens.clear()
+
+    def throttle(self, count, retry_after=None):
+        """
+        Answer the next count cloud requests with 429 Too Many Requests.
+
+        Args:
+            count (Int): Requests to throttle.
+            retry_after (String, optional): Sent as the Retry-After header.
+        """
+        with self._lock:
+            self.throttled_requests = count
+            self.retry_after = retry_after
+
+    def set_hub_online(self, hub_id, online=True):
+        if online:
+            self.offline_hubs.discard(str(hub_id))
+        else:
+            self.offline_hubs.add(str(hub_id))
+
+    def get_object(self, object_type, object_id):
+        return self._objects.get((object_type, str(object_id)))
+
+    def _sleep(self, latency):
+        delay = latency() if callable(latency) else latency
+        if delay:
+            time.sleep(delay)
+
+    def _roll(self, rate):
+        if not rate:
+            return False
+        with self._lock:
+            return self._random.random() < rate
+
+    def _find(self, collection, object_id, lookup):
+        for object_type in _types_for_collection(collection):
+            item = lookup(object_type, object_id)
+            if item is not None:
+                return item
+        return None
+
+    # pylint: disable=too-many-return-statements, too-many-branches
+    def handle_cloud(self, method, path, headers, body):
+        self._sleep(self.latency)
+        if self._roll(self.error_rate):
+            return 500, {"errors": ["Injected error"]}
+        with self._lock:
+            if self.throttled_requests:
+                self.throttled_requests -= 1
+                return 429, {"errors": ["Too many requests"]}
+        if path == "/oauth2/token":
+            return self._handle_token(body or {})
+        token = (headers.get("Authorization") or "").replace("Bearer ", "")
+        with self._lock:
+            authorized = token in self._access_tokens
+        if not authorized or self._roll(self.unauthorized_rate):
+            return 401, {"errors": ["Unauthorized"]}
+        with self._lock:
+            if path == "/users/me":
+                return 200, {"data": {"user_id": "1", "email": "fake@example.com"}}
+            if path == "/users/me/session":
+                return 200, {"data": body or {}}
+            match = _USERS_ME_PATTERN.match(path)
+            if match is not None and method == "GET":
+                items = self.account.get(match.group(1))
+                if items is None:
+                    return 404, {"errors": ["Not found"]}
+                return 200, {"data": items, "errors": [], "pagination": {}}
+            match = _OBJECT_PATTERN.match(path)
+            if match is None:
+                return 404, {"errors": ["Not found"]}
+            collection, object_id, activate = match.groups()
+            item = self._find(collection, object_id, self.get_object)
+            if item is None:
+                return 404, {"errors": ["Not found"]}
+            if method == "DELETE":
+                self._delete(item)
+                return 204, None
+            if activate:
+                if item.get("object_type") == device_types.GROUP and body:
+                    _apply_group_state(item, body)
+            elif method == "PUT" and body:
+                _apply_state(item, body)
+            return 200, {"data": item}
+
+    def handle_hub(self, method, path, headers, body):
+        self._sleep(self.hub_latency)
+        token = (headers.get("Authorization") or "").replace("Bearer ", "")
+        with self._lock:
+            hub_id = self._local_tokens.get(token)
+        if hub_id is None:
+            return 401, {"errors": ["Unauthorized"]}
+        if hub_id in self.offline_hubs or self._roll(self.hub_error_rate):
+            return None, None
+        match = _OBJECT_PATTERN.match(path)
+        if match is None:
+            return 404, {"errors": ["Not found"]}
+        collection, local_id, _ = match.groups()
+        with self._lock:
+            item = self._find(collection, local_id,
+                              lambda object_type, _id: self._local_objects.get((hub_id, object_type, _id)))
+            if item is None:
+                return 404, {"errors": ["Not found"]}
+            if method == "PUT" and body:
+                _apply_state(item, {"desired_state": body.get("desired_state") or {}})
+            return 200, {"data": {"last_reading": item.get("last_reading", {}),
+                                  "desired_state": item.get("desired_state", {})}}
+
+    def _handle_token(self, body):
+        if body.get("client_id") != CLIENT_ID or body.get("client_secret") != CLIENT_SECRET:
+            return 401, {"errors": ["Invalid client"]}
+        with self._lock:
+            if body.get("grant_type") == "refresh_token" and body.get("refresh_token") not in self._refresh_tokens:
+                return 401, {"errors": ["Invalid refresh token"]}
+        if body.get("scope") == "local_control":
+            return self._handle_local_token(body.get("local_control_id"))
+        access_token, refresh_token = self.issue_tokens()
+        return 200, {"access_token": access_token, "refresh_token": refresh_token,
+                     "token_type": "bearer"}
+
+    def _handle_local_token(self, local_control_id):
+        with self._lock:
+            for hub in self.account.get("wink_devices", []):
+                if hub.get("object_type") != device_types.HUB:
+                    continue
+                if (hub.get("last_reading") or {}).get("local_control_id") == local_control_id:
+                    token = "local-{}".format(hub.get("object_id"))
+                    self._local_tokens[token] = str(hub.get("object_id"))
+                    return 200, {"access_token": token, "token_type": "bearer"}
+        return 404, {"errors": ["Unknown hub"]}
+
+    def _delete(self, item):
+        for items in self.account.values():
+            if item in items:
+                items.remove(item)
+        self._objects.pop((item.get("object_type"), str(item.get("object_id"))), None)
+
+
+def _types_for_collection(collection):
+    # The library pluralizes object types by appending "s", the API also
+    # accepts the proper plural (binary_switches).
+    types = [collection[:-1]]
+    if collection.endswith("es"):
+        types.append(collection[:-2])
+    return types
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    fake = None
+
+
+class _FakeRequestHandler(BaseHTTPRequestHandler):
+    route = None
+
+    def _handle(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw_body = self.rfile.read(length) if length else b""
+        try:
+            body = json.loads(raw_body.decode("utf-8")) if raw_body else None
+        except ValueError:
+            body = None
+        status, response = self._dispatch(method, self.path, self.headers, body)
+        fake = self.server.fake
+        content = json.dumps(response).encode("utf-8") if response is not None else None
+        etag = None
+        if method == "GET" and status == 200:
+            etag = '"{}"'.format(hashlib.sha1(content).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                status, content = 304, None
+        with fake._lock:  # pylint: disable=protected-access
+            fake.request_counts[(self.route, method, status)] += 1
+        if status is None:
+            # Simulate an unreachable hub by dropping the connection.
+            self.close_connection = True
+            try:
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return
+        if content is None:
+            self.send_response(status)
+            if etag is not None:
+                self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if fake.compress and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+            content = gzip.compress(content)
+            self.send_header("Content-Encoding", "gzip")
+        if status == 429 and fake.retry_after is not None:
+            self.send_header("Retry-After", fake.retry_after)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _dispatch(self, method, path, headers, body):
+        raise NotImplementedError
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class _CloudRequestHandler(_FakeRequestHandler):
+    route = CLOUD
+
+    def _dispatch(self, method, path, headers, body):
+        return self.server.fake.handle_cloud(method, path, headers, body)
+
+
+class _HubRequestHandler(_FakeRequestHandler):
+    route = HUB
+
+    def _dispatch(self, method, path, headers, body):
+        return self.server.fake.handle_hub(method, path, headers, body)
@@ -0,0 +1,77 @@
+"""
+Deadlines shared by all requests made for one call.
+
+A deadline is set per thread with deadline(). Every request made inside
+it gets the smaller of its own timeout and the time left, so a local
+attempt, the cloud fallback after it and the retry after a token refresh
+all fit in the time the caller allowed. Nested deadlines can only make
+the time left shorter.
+"""
+import contextlib
+import threading
+import time
+
+import requests
+
+_CONTEXT = threading.local()
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """
+    The deadline passed before the request could be sent or completed.
+    """
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """
+    Args:
+        seconds (Float): Time allowed for the requests made in this block,
+            None to only keep an outer deadline.
+    """
+    previous = getattr(_CONTEXT, "expires", None)
+    if seconds is not None:
+        expires = time.time() + seconds
+        _CONTEXT.expires = expires if previous is None else min(previous, expires)
+    try:
+        yield
+    finally:
+        _CONTEXT.expires = previous
+
+
+def remaining():
+    """
+    Returns:
+        remaining (Float): Seconds left before the deadline, None without one.
+    """
+    expires = getattr(_CONTEXT, "expires", None)
+    if expires is None:
+        return None
+    return expires - time.time()
+
+
+def allows(seconds):
+    """
+    Returns:
+        allows (Bool): True if waiting seconds still leaves time to send.
+    """
+    left = remaining()
+    return left is None or seconds < left
+
+
+def timeout(default):
+    """
+    Args:
+        default (Float): The timeout of the request without a deadline,
+            None to wait forever.
+    Returns:
+        timeout (Float): The timeout to send the request with.
+    Raises:
+        DeadlineExceeded: When the deadline has passed.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Deadline exceeded")
+    return left if default is None else min(default, left)
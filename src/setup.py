@@ -7,6 +7,7 @@ setup(name='python-wink',
       author='Brad Johnson, William Scanlon',
       license='MIT',
       install_requires=['requests>=2.0'],
+      extras_require={'numpy': ['numpy']},
       tests_require=['mock'],
       test_suite='tests',
       packages=find_packages(exclude=["dist", "*.test", "*.test.*", "test.*", "test"]),